@@ -0,0 +1,105 @@
+"""
+This script compares the double estimator variants of the tabular agents
+with their single estimator versions: the time of an update, on random
+transitions of SixArms, and the memory of the action values, i.e. the
+table read by the policy and, for the double estimators, the two
+estimates.
+
+    python -m benchmarks.double [--n-approximators 10 30]
+
+"""
+import argparse
+import os
+import sys
+
+if __package__ in [None, '']:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+from benchmarks.run import time_function
+from benchmarks.suite import _cycle, _transitions
+
+
+def _nbytes(agent):
+    nbytes = agent.Q.table.nbytes
+    if hasattr(agent, 'Qs'):
+        nbytes += agent.Qs.table.nbytes
+
+    return nbytes
+
+
+def agents(mdp, n_approximators):
+    """
+    Returns:
+        The list of the (name, single agent, double agent) triples to be
+        compared.
+
+    """
+    from mushroom.utils.parameters import ExponentialDecayParameter
+    from boot_q_learning import BootstrappedDoubleQLearning, \
+        BootstrappedQLearning
+    from particle_q_learning import ParticleDoubleQLearning, \
+        ParticleQLearning
+    from wq_learning import GaussianDoubleQLearning, GaussianQLearning
+    from policy import BootPolicy, WeightedGaussianPolicy, WeightedPolicy
+
+    def learning_rate():
+        return ExponentialDecayParameter(value=1., decay_exp=.2,
+                                         size=mdp.info.size)
+
+    triples = list()
+    for n in n_approximators:
+        for update_type in ['mean', 'weighted']:
+            triples.append((
+                'particle/%s/N=%d' % (update_type, n),
+                ParticleQLearning(WeightedPolicy(n), mdp.info,
+                                  learning_rate(), n_approximators=n,
+                                  update_type=update_type, q_min=0,
+                                  q_max=100),
+                ParticleDoubleQLearning(WeightedPolicy(n), mdp.info,
+                                        learning_rate(), n_approximators=n,
+                                        update_type=update_type, q_min=0,
+                                        q_max=100)))
+        triples.append((
+            'boot/N=%d' % n,
+            BootstrappedQLearning(BootPolicy(n), mdp.info, learning_rate(),
+                                  n_approximators=n, p=1.),
+            BootstrappedDoubleQLearning(BootPolicy(n), mdp.info,
+                                        learning_rate(), n_approximators=n)))
+
+    for update_type in ['mean', 'weighted']:
+        triples.append((
+            'gaussian/%s' % update_type,
+            GaussianQLearning(WeightedGaussianPolicy(), mdp.info,
+                              learning_rate(), update_type=update_type,
+                              init_values=(50., 30.), q_max=100.),
+            GaussianDoubleQLearning(WeightedGaussianPolicy(), mdp.info,
+                                    learning_rate(), update_type=update_type,
+                                    init_values=(50., 30.))))
+
+    return triples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n-approximators', type=int, nargs='+',
+                        default=[10, 30],
+                        help='Numbers of models of the ensembles.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of measures of each update.')
+    args = parser.parse_args()
+
+    from envs.six_arms import generate_arms
+
+    mdp = generate_arms(horizon=100, gamma=0.99)
+    transitions = _transitions(mdp, 1000)
+
+    print('%-25s %12s %12s %8s %12s %12s' % ('agent', 'single us',
+                                             'double us', 'ratio',
+                                             'single KB', 'double KB'))
+    for name, single, double in agents(mdp, args.n_approximators):
+        times = [time_function(_cycle(agent._update, transitions),
+                               repeat=args.repeat)['median']
+                 for agent in [single, double]]
+        print('%-25s %12.1f %12.1f %8.2f %12.1f %12.1f' % (
+            name, times[0] * 1e6, times[1] * 1e6, times[1] / times[0],
+            _nbytes(single) / 2 ** 10, _nbytes(double) / 2 ** 10))
@@ -0,0 +1,69 @@
+"""
+This script checks the startup cost of the tabular experiments: each module
+is imported in a fresh interpreter, from its folder as when it is run, and
+the import must take less than the budget and must not import TensorFlow.
+The exit code is the number of failed checks.
+
+    python -m benchmarks.import_time [--budget 1.0]
+
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules of the tabular code paths, as (folder, module) pairs
+MODULES = [('q_learning', 'run'), ('q_learning', 'run_wq'),
+           ('', 'policy')]
+
+_CHECK = '''
+import json, sys, time
+sys.path.insert(0, '.')
+start = time.perf_counter()
+import %s
+print(json.dumps(dict(time=time.perf_counter() - start,
+                      tensorflow='tensorflow' in sys.modules)))
+'''
+
+
+def measure(folder, module):
+    """
+    Returns:
+        The dictionary with the import time, in seconds, of the module and
+        whether TensorFlow was imported.
+
+    """
+    out = subprocess.check_output([sys.executable, '-c', _CHECK % module],
+                                  cwd=os.path.join(_ROOT, folder))
+
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', type=float, default=1.,
+                        help='Maximum import time in seconds.')
+    args = parser.parse_args()
+
+    n_failures = 0
+    for folder, module in MODULES:
+        name = os.path.join(folder, module)
+        try:
+            result = measure(folder, module)
+        except subprocess.CalledProcessError:
+            print('%-30s import failed' % name)
+            n_failures += 1
+            continue
+
+        failed = result['time'] > args.budget or result['tensorflow']
+        n_failures += failed
+        print('%-30s %8.3f s %s%s' % (
+            name, result['time'],
+            'tensorflow imported ' if result['tensorflow'] else '',
+            'FAILED' if failed else ''))
+
+    sys.exit(n_failures)
@@ -0,0 +1,110 @@
+"""
+This script quantifies the deviation of the scores of the tabular agents
+when their action values are stored in float32 instead of float64. The same
+runs (environments, algorithm and seeds) are executed with both precisions
+through q_learning/run.py, their evaluation scores are stored in a result
+store and the mean scores of the last epoch are compared. The exit code is
+the number of configurations whose relative deviation exceeds the
+tolerance. Other arguments are passed to q_learning/run.py.
+
+    python -m benchmarks.precision [--envs Chain RiverSwim ...]
+        [--algorithm particle-ql] [--n-experiments 5] [--tolerance 0.05]
+
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+if __package__ in [None, '']:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+from utils.result_store import ResultStore
+
+
+_Q_LEARNING_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'q_learning')
+
+ENVS = ['Chain', 'Loop', 'RiverSwim', 'SixArms', 'ThreeArms']
+
+
+def _run(env, precision, args, extra_args, store_path, out_dir):
+    command = [sys.executable, 'run.py', '--name', env,
+               '--algorithm', args.algorithm,
+               '--n-experiments', str(args.n_experiments),
+               '--precision', precision, '--store', store_path,
+               '--dir', out_dir] + extra_args
+    subprocess.check_call(command, cwd=_Q_LEARNING_DIR)
+
+
+def compare(store, tolerance):
+    """
+    Compare the evaluation scores of the float32 runs of a result store with
+    the ones of the float64 runs with the same configuration.
+
+    Returns:
+        The number of configurations whose last mean score deviates by more
+        than ``tolerance``, relatively to the float64 score.
+
+    """
+    n_failures = 0
+    print('%-50s %12s %12s %10s %10s' % ('configuration', 'float64',
+                                         'float32', 'rel. dev.',
+                                         'mean dev.'))
+    for config in store.configs():
+        if config.get('precision') != 'float32':
+            continue
+        config_64 = dict(config, precision=None)
+        _, scores_32 = store.query(**config)
+        _, scores_64 = store.query(**config_64)
+        if scores_32.size == 0 or scores_64.size == 0:
+            continue
+
+        curve_32 = np.nanmean(scores_32, axis=0)
+        curve_64 = np.nanmean(scores_64, axis=0)
+        n = min(len(curve_32), len(curve_64))
+        scale = np.maximum(np.abs(curve_64[:n]), 1e-8)
+        relative = np.abs(curve_32[n - 1] - curve_64[n - 1]) / scale[-1]
+        # Mean relative deviation over the whole learning curve
+        mean_relative = np.mean(np.abs(curve_32[:n] - curve_64[:n]) / scale)
+
+        failed = relative > tolerance
+        n_failures += failed
+        name = '%s/%s/%s' % (config['name'], config['algorithm'],
+                             config['update_type'])
+        print('%-50s %12.4f %12.4f %10.4f %10.4f %s' % (
+            name, curve_64[n - 1], curve_32[n - 1], relative, mean_relative,
+            'DEVIATION' if failed else ''))
+
+    return n_failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--envs', type=str, nargs='+', default=ENVS,
+                        help='Environments to run.')
+    parser.add_argument('--algorithm', type=str, default='particle-ql',
+                        choices=['boot-ql', 'particle-ql', 'gaussian-ql'],
+                        help='Algorithm to run.')
+    parser.add_argument('--n-experiments', type=int, default=5,
+                        help='Number of seeds of each configuration.')
+    parser.add_argument('--tolerance', type=float, default=.05,
+                        help='Relative deviation of the last mean score '
+                             'flagged as an error.')
+    parser.add_argument('--store', type=str,
+                        help='Path of the result store. By default, a '
+                             'temporary one. The runs already in the store '
+                             'are not executed again.')
+    args, extra_args = parser.parse_known_args()
+
+    out_dir = tempfile.mkdtemp()
+    store_path = args.store if args.store is not None else \
+        os.path.join(out_dir, 'precision.db')
+    for env in args.envs:
+        for precision in ['float64', 'float32']:
+            _run(env, precision, args, extra_args, store_path, out_dir)
+
+    sys.exit(compare(ResultStore(store_path), args.tolerance))
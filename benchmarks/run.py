@@ -0,0 +1,168 @@
+"""
+This script can be used to time the hot paths of the agents and to compare
+the timings of two commits. Results are saved as JSON, one file for each
+commit, in the results folder.
+
+    python -m benchmarks.run run [--groups prob_max update ...]
+    python -m benchmarks.run compare BASE.json [NEW.json] [--threshold 0.1]
+
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy as np
+
+if __package__ in [None, '']:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+from benchmarks.suite import GROUPS
+
+_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'results')
+
+
+def get_commit():
+    """
+    Returns:
+        The short hash of the current commit, followed by ``-dirty`` if the
+        tracked files have uncommitted changes, or 'unknown' outside of git.
+
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+            stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=root,
+                                stderr=subprocess.DEVNULL) != 0
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+    return commit + ('-dirty' if dirty else '')
+
+
+def time_function(fun, repeat=5, min_time=.2):
+    """
+    Time a function, calling it enough times for each measure to last at
+    least ``min_time`` seconds.
+
+    Returns:
+        The dictionary with the median and minimum time of a call, in
+        seconds, and the number of calls of each measure.
+
+    """
+    timer = timeit.Timer(fun)
+    n = 1
+    while timer.timeit(n) < min_time:
+        n *= 2 if n < 1000 else 10
+    times = np.array(timer.repeat(repeat=repeat, number=n)) / n
+
+    return dict(median=float(np.median(times)), min=float(np.min(times)),
+                number=n)
+
+
+def run(groups, repeat, min_time, out_dir):
+    results = dict()
+    for group in groups:
+        for name, fun in GROUPS[group]():
+            results[name] = time_function(fun, repeat, min_time)
+            print('%-60s %12.3f us' % (name, results[name]['median'] * 1e6))
+
+    commit = get_commit()
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    path = os.path.join(out_dir, commit + '.json')
+    if os.path.exists(path):
+        # Groups run separately on the same commit are merged
+        with open(path) as f:
+            previous = json.load(f)['results']
+        previous.update(results)
+        results = previous
+    with open(path, 'w') as f:
+        json.dump(dict(commit=commit, time=time.time(),
+                       python=platform.python_version(),
+                       numpy=np.__version__, machine=platform.node(),
+                       results=results), f, indent=1, sort_keys=True)
+    print('Saved: ', path)
+
+
+def compare(base_path, new_path, threshold):
+    """
+    Compare the median times of the benchmarks of two result files.
+
+    Returns:
+        The number of benchmarks slower than ``1 + threshold`` times their
+        base time.
+
+    """
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print('Base: %s - New: %s' % (base['commit'], new['commit']))
+    n_regressions = 0
+    for name in sorted(set(base['results']) & set(new['results'])):
+        ratio = new['results'][name]['median'] / \
+            base['results'][name]['median']
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            n_regressions += 1
+        elif ratio < 1 - threshold:
+            flag = 'improved'
+        else:
+            flag = ''
+        print('%-60s %12.3f us %12.3f us %7.2fx %s' % (
+            name, base['results'][name]['median'] * 1e6,
+            new['results'][name]['median'] * 1e6, ratio, flag))
+    print('%d regressions' % n_regressions)
+
+    return n_regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command')
+
+    arg_run = subparsers.add_parser('run', help='Run the benchmarks.')
+    arg_run.add_argument('--groups', type=str, nargs='+',
+                         choices=sorted(GROUPS), default=sorted(GROUPS),
+                         help='Groups of benchmarks to run.')
+    arg_run.add_argument('--repeat', type=int, default=5,
+                         help='Number of measures of each benchmark.')
+    arg_run.add_argument('--min-time', type=float, default=.2,
+                         help='Minimum duration in seconds of each measure.')
+    arg_run.add_argument('--dir', type=str, default=_RESULTS_DIR,
+                         help='Directory where to save the results.')
+
+    arg_compare = subparsers.add_parser(
+        'compare', help='Compare the results of two commits.')
+    arg_compare.add_argument('base', type=str,
+                             help='Result file of the base commit.')
+    arg_compare.add_argument('new', type=str, nargs='?',
+                             help='Result file of the new commit. By default, '
+                                  'the latest result file.')
+    arg_compare.add_argument('--threshold', type=float, default=.1,
+                             help='Relative slowdown flagged as a '
+                                  'regression.')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args.groups, args.repeat, args.min_time, args.dir)
+    elif args.command == 'compare':
+        new_path = args.new
+        if new_path is None:
+            new_path = max(glob.glob(os.path.join(_RESULTS_DIR, '*.json')),
+                           key=os.path.getmtime)
+        sys.exit(1 if compare(args.base, new_path, args.threshold) > 0
+                 else 0)
+    else:
+        parser.print_help()
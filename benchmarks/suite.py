@@ -0,0 +1,336 @@
+"""
+Microbenchmarks of the hot paths of the tabular and deep agents. Each group
+is a function returning the list of the (name, function) pairs to be timed,
+where the function takes no arguments and performs one call of the
+benchmarked code. Networks are replaced by stub approximators returning
+fixed action values, so no GPU, ROM or trained model is needed.
+
+"""
+import os
+import sys
+from functools import partial
+
+import numpy as np
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in [_ROOT, os.path.join(_ROOT, 'dqn'),
+             os.path.join(_ROOT, 'q_learning')]:
+    if path not in sys.path:
+        sys.path.append(path)
+
+N_PARTICLES = [10, 30, 100]
+N_ACTIONS = [2, 6, 18]
+BATCH_SIZES = [1, 32]
+REPLAY_SIZES = [100000, 1000000]
+ATARI_SHAPE = (84, 84, 4)
+
+
+class StubNet(object):
+    """
+    Approximator returning fixed action values with the output format of the
+    ensemble networks, i.e. (1, n_heads, n_states, n_actions) when all the
+    heads are predicted and (n_states, n_actions) for a single head.
+
+    """
+    def __init__(self, n_heads, n_actions, max_batch=32, sigma=False,
+                 seed=0):
+        rng = np.random.RandomState(seed)
+        self._q = rng.uniform(-1., 1., size=(n_heads, max_batch, n_actions))
+        if sigma:
+            self._q[1] = np.abs(self._q[1]) + .1
+        self.n_actions = n_actions
+        self.model = self
+
+    def predict(self, s, idx=None):
+        n = len(s)
+        if idx is not None:
+            return self._q[idx, :n].copy()
+
+        return self._q[None, :, :n].copy()
+
+
+def _prob_max():
+    from particle_q_learning import ParticleQLearning
+    from wq_learning import GaussianQLearning
+    from policy import WeightedGaussianPolicy
+
+    rng = np.random.RandomState(0)
+    benchmarks = list()
+    for a in N_ACTIONS:
+        for b in BATCH_SIZES:
+            for n in N_PARTICLES:
+                qs = [np.sort(rng.uniform(size=(n, a)), axis=0)
+                      for _ in range(b)]
+
+                def particle(qs=qs):
+                    for q in qs:
+                        ParticleQLearning._compute_prob_max(q)
+
+                benchmarks.append(('prob_max/particle/N=%d,A=%d,batch=%d' %
+                                   (n, a, b), particle))
+
+            means = rng.uniform(size=(b, a))
+            sigmas = rng.uniform(.1, 1., size=(b, a))
+
+            def gaussian(means=means, sigmas=sigmas):
+                for m, s in zip(means, sigmas):
+                    GaussianQLearning._compute_prob_max(m, s)
+
+            def gaussian_policy(means=means, sigmas=sigmas):
+                for m, s in zip(means, sigmas):
+                    WeightedGaussianPolicy._compute_prob_max([m, s])
+
+            benchmarks.append(('prob_max/gaussian/A=%d,batch=%d' % (a, b),
+                               gaussian))
+            benchmarks.append(('prob_max/gaussian_policy/A=%d,batch=%d' %
+                               (a, b), gaussian_policy))
+
+    return benchmarks
+
+
+def _transitions(mdp, n, seed=0):
+    rng = np.random.RandomState(seed)
+    n_states, n_actions = mdp.info.size
+
+    return [(np.array([rng.randint(n_states)]),
+             np.array([rng.randint(n_actions)]), rng.uniform(),
+             np.array([rng.randint(n_states)]), rng.uniform() < .05)
+            for _ in range(n)]
+
+
+def _cycle(fun, args):
+    # Each call uses the next argument tuple, so that different states are
+    # updated
+    it = [0]
+
+    def call():
+        fun(*args[it[0] % len(args)])
+        it[0] += 1
+
+    return call
+
+
+def _tabular_update():
+    from mushroom.utils.parameters import ExponentialDecayParameter
+    from envs.six_arms import generate_arms
+    from boot_q_learning import BootstrappedQLearning
+    from delayed_q_learning import DelayedQLearning
+    from particle_q_learning import ParticleQLearning
+    from wq_learning import GaussianQLearning
+    from policy import BootPolicy, WeightedGaussianPolicy, WeightedPolicy
+
+    mdp = generate_arms(horizon=100, gamma=0.99)
+    transitions = _transitions(mdp, 1000)
+
+    def learning_rate():
+        return ExponentialDecayParameter(value=1., decay_exp=.2,
+                                         size=mdp.info.size)
+
+    benchmarks = list()
+    for update_type in ['mean', 'weighted', 'optimistic', 'distributional']:
+        for n in [10, 30]:
+            agent = ParticleQLearning(WeightedPolicy(n), mdp.info,
+                                      learning_rate(), n_approximators=n,
+                                      update_type=update_type, q_min=0,
+                                      q_max=100)
+            benchmarks.append(('update/particle/%s/N=%d' % (update_type, n),
+                               _cycle(agent._update, transitions)))
+
+    for n in [10, 30]:
+        agent = BootstrappedQLearning(BootPolicy(n), mdp.info, learning_rate(),
+                                      n_approximators=n)
+        benchmarks.append(('update/boot/N=%d' % n,
+                           _cycle(agent._update, transitions)))
+
+    for update_type in ['mean', 'weighted']:
+        agent = GaussianQLearning(WeightedGaussianPolicy(), mdp.info,
+                                  learning_rate(), update_type=update_type,
+                                  init_values=(50., 30.), q_max=100.)
+        benchmarks.append(('update/gaussian/%s' % update_type,
+                           _cycle(agent._update, transitions)))
+    # The theoretical version, with two variances, supports only the
+    # optimistic update
+    agent = GaussianQLearning(WeightedGaussianPolicy(), mdp.info,
+                              learning_rate(),
+                              sigma_1_learning_rate=learning_rate(),
+                              update_type='optimistic',
+                              init_values=(100., 0., 50.))
+    benchmarks.append(('update/gaussian/optimistic',
+                       _cycle(agent._update, transitions)))
+
+    for m in [1, 100]:
+        agent = DelayedQLearning(mdp.info, None, m=m, R=6000.)
+        benchmarks.append(('update/delayed/m=%d' % m,
+                           _cycle(agent._update, transitions)))
+
+    return benchmarks
+
+
+def _tabular_fit():
+    from mushroom.utils.parameters import ExponentialDecayParameter
+    from envs.six_arms import generate_arms
+    from delayed_q_learning import DelayedQLearning
+    from particle_q_learning import ParticleQLearning
+    from wq_learning import GaussianQLearning
+    from policy import WeightedGaussianPolicy, WeightedPolicy
+
+    mdp = generate_arms(horizon=100, gamma=0.99)
+    dataset = [t + (False,) for t in _transitions(mdp, 1000)]
+
+    def learning_rate():
+        return ExponentialDecayParameter(value=1., decay_exp=.2,
+                                         size=mdp.info.size)
+
+    # Each call fits a block of transitions, the first one sequentially
+    benchmarks = list()
+    for block in [1, 100]:
+        blocks = [(dataset[i:i + block],)
+                  for i in range(0, len(dataset), block)]
+        for update_type in ['mean', 'weighted', 'optimistic', 'distributional']:
+            agent = ParticleQLearning(WeightedPolicy(10), mdp.info,
+                                      learning_rate(), n_approximators=10,
+                                      update_type=update_type, q_min=0,
+                                      q_max=100)
+            benchmarks.append(('fit/particle/%s/N=10,block=%d' %
+                               (update_type, block),
+                               _cycle(agent.fit, blocks)))
+
+        for update_type in ['mean', 'weighted', 'optimistic']:
+            agent = GaussianQLearning(WeightedGaussianPolicy(), mdp.info,
+                                      learning_rate(), update_type=update_type,
+                                      init_values=(50., 30.), q_max=100.)
+            benchmarks.append(('fit/gaussian/%s/block=%d' % (update_type, block),
+                               _cycle(agent.fit, blocks)))
+
+        for m in [1, 100]:
+            agent = DelayedQLearning(mdp.info, None, m=m, R=6000.)
+            benchmarks.append(('fit/delayed/m=%d,block=%d' % (m, block),
+                               _cycle(agent.fit, blocks)))
+
+    return benchmarks
+
+
+def _policies():
+    from mushroom.utils.parameters import Parameter
+    from mushroom.utils.table import Table
+    from policy import BootPolicy, EpsGreedy, UCBPolicy, VPIPolicy, \
+        WeightedGaussianPolicy, WeightedPolicy
+    from utils.table import StackedEnsembleTable
+
+    rng = np.random.RandomState(0)
+    n_states = 100
+    states = [np.array([s]) for s in rng.randint(n_states, size=1000)]
+
+    def table(n_heads, n_actions):
+        q = StackedEnsembleTable(n_heads, (n_states, n_actions))
+        q.table[:] = rng.uniform(size=q.table.shape)
+
+        return q
+
+    benchmarks = list()
+    for a in [2, 18]:
+        q = Table((n_states, a))
+        q.table[:] = rng.uniform(size=q.table.shape)
+        pi = EpsGreedy(Parameter(.1))
+        pi.set_q(q)
+        benchmarks.append(('draw_action/eps_greedy/A=%d' % a,
+                           _cycle(pi.draw_action, [(s,) for s in states])))
+
+        for n in [10, 30]:
+            q = table(n, a)
+            policies = [('boot', BootPolicy(n)),
+                        ('weighted', WeightedPolicy(n)),
+                        ('vpi', VPIPolicy(n))]
+            scores = partial(lambda q, s: (np.mean(q.predict_all(s), axis=0),
+                                           q.predict_all(s)[-1]), q)
+            policies.append(('ucb', UCBPolicy(scores_func=scores)))
+            for name, pi in policies:
+                pi.set_q(q)
+                pi.set_idx(0)
+                benchmarks.append(('draw_action/%s/N=%d,A=%d' % (name, n, a),
+                                   _cycle(pi.draw_action,
+                                          [(s,) for s in states])))
+
+        q = table(2, a)
+        q.table[1] += .1
+        pi = WeightedGaussianPolicy()
+        pi.set_q(q)
+        benchmarks.append(('draw_action/weighted_gaussian/A=%d' % a,
+                           _cycle(pi.draw_action, [(s,) for s in states])))
+
+    return benchmarks
+
+
+def _replay_memory():
+    from replay_memory import ReplayMemory
+
+    rng = np.random.RandomState(0)
+    # States are shared among the samples, as the stacked frames of Atari
+    frames = [rng.randint(256, size=ATARI_SHAPE).astype(np.uint8)
+              for _ in range(100)]
+    dataset = [(frames[i % 100], np.array([rng.randint(18)]), rng.uniform(),
+                frames[(i + 1) % 100], False, False) for i in range(1000)]
+    masks = np.ones((len(dataset), 10))
+
+    benchmarks = list()
+    for size in REPLAY_SIZES:
+        memory = ReplayMemory(size, size)
+        for i in range(0, size, len(dataset)):
+            memory.add(dataset, masks)
+
+        benchmarks.append(('replay/add/size=%d' % size,
+                           _cycle(memory.add, [([d], masks[:1])
+                                               for d in dataset])))
+        benchmarks.append(('replay/get/size=%d,batch=32' % size,
+                           partial(memory.get, 32)))
+
+    return benchmarks
+
+
+def _next_q():
+    from particle_dqn import ParticleDQN, ParticleDoubleDQN
+    from gaussian_dqn import GaussianDQN
+
+    rng = np.random.RandomState(0)
+    states = np.zeros((32, 1))
+    absorbing = rng.uniform(size=32) < .05
+
+    def particle(q, tq, update_type):
+        # The action values are copied as they would be by a prediction
+        return ParticleDQN._compute_max_q(tq.copy(), absorbing, update_type,
+                                          9, 100)
+
+    def particle_double(q, tq, update_type):
+        return ParticleDoubleDQN._compute_double_max_q(q.copy(), tq.copy(),
+                                                       absorbing)
+
+    def gaussian(q_and_sigma, update_type):
+        return GaussianDQN._compute_max_q(q_and_sigma.copy(), absorbing,
+                                          update_type, 1.28, 100, 1e-7)
+
+    benchmarks = list()
+    for a in [4, 18]:
+        q = StubNet(10, a, seed=1).predict(states)[0]
+        tq = StubNet(10, a, seed=2).predict(states)[0]
+        q_and_sigma = StubNet(2, a, sigma=True).predict(states)[0]
+        for update_type in ['mean', 'weighted', 'optimistic']:
+            for cls, fun in [(ParticleDQN, particle),
+                             (ParticleDoubleDQN, particle_double)]:
+                benchmarks.append(('next_q/%s/%s/N=10,A=%d' %
+                                   (cls.__name__, update_type, a),
+                                   partial(fun, q, tq, update_type)))
+
+            benchmarks.append(('next_q/GaussianDQN/%s/A=%d' % (update_type, a),
+                               partial(gaussian, q_and_sigma, update_type)))
+
+    return benchmarks
+
+
+GROUPS = dict(
+    prob_max=_prob_max,
+    update=_tabular_update,
+    fit=_tabular_fit,
+    draw_action=_policies,
+    replay=_replay_memory,
+    next_q=_next_q
+)
@@ -0,0 +1,154 @@
+"""
+This script measures the end-to-end speed of the deep agents on a synthetic
+environment with the shape of Atari (stacks of 84x84 uint8 frames, episodes
+with lives), so that no ROM is needed. Each algorithm is run through
+dqn/atari/run.py with ``--synthetic --profile`` in a separate process, and
+the acting and learning throughputs, the peak resident memory of the process
+and the size of the replay memory are reported.
+
+    python -m benchmarks.synthetic_atari [--algs particle dqn ...]
+
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+if __package__ in [None, '']:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))))
+from benchmarks.run import get_commit
+
+_ATARI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), 'dqn', 'atari')
+_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'results')
+
+
+def _run(alg, args, extra_args):
+    """
+    Run an algorithm on the synthetic environment.
+
+    Returns:
+        The exit code and the peak resident memory, in bytes, of the process.
+
+    """
+    command = [sys.executable, 'run.py', '--synthetic', '--profile',
+               '--quiet', '--name', 'Synthetic', '--alg', alg,
+               '--max-steps', str(args.max_steps),
+               '--evaluation-frequency', str(args.evaluation_frequency),
+               '--test-samples', str(args.test_samples),
+               '--initial-replay-size', str(args.initial_replay_size),
+               '--max-replay-size', str(args.max_replay_size)] + extra_args
+    process = subprocess.Popen(command, cwd=_ATARI_DIR)
+    # The usage of the child alone is needed, not the one of all the children
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) \
+        else -1
+
+    # ru_maxrss is in kilobytes on Linux
+    return process.returncode, usage.ru_maxrss * 1024
+
+
+def _find_profile(alg, start):
+    paths = [p for p in glob.glob(os.path.join(_ATARI_DIR, 'logs', alg, '**',
+                                               'profile.json'),
+                                  recursive=True)
+             if os.path.getmtime(p) >= start]
+
+    return max(paths, key=os.path.getmtime) if len(paths) > 0 else None
+
+
+def _phase_total(epochs, phase):
+    calls = sum(e['phases'][phase]['n_calls'] for e in epochs
+                if phase in e['phases'])
+    total = sum(e['phases'][phase]['total'] for e in epochs
+                if phase in e['phases'])
+
+    return calls, total
+
+
+def summarize(profile, evaluation_frequency):
+    """
+    Args:
+        profile (list): the statistics of the epochs saved by the profiler;
+        evaluation_frequency (int): the number of learning steps of an epoch.
+
+    Returns:
+        The dictionary of the throughputs of the learning epochs, i.e. all but
+        the initial evaluation, and of the size of the replay memory.
+
+    """
+    epochs = [e for e in profile if e['epoch'] > 0]
+    step_calls, step_time = _phase_total(epochs, 'env_step')
+    action_calls, action_time = _phase_total(epochs, 'draw_action')
+    fit_calls, fit_time = _phase_total(epochs, 'fit')
+    _, learn_time = _phase_total(epochs, 'learn')
+
+    return dict(
+        acting_steps_per_second=step_calls / (step_time + action_time)
+        if step_time + action_time > 0 else np.nan,
+        fits_per_second=fit_calls / fit_time if fit_time > 0 else np.nan,
+        learning_steps_per_second=len(epochs) * evaluation_frequency /
+        learn_time if learn_time > 0 else np.nan,
+        replay_bytes=max([e.get('replay_bytes', 0) for e in epochs] + [0])
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--algs', type=str, nargs='+',
+                        choices=['particle', 'gaussian', 'boot', 'dqn'],
+                        default=['particle', 'gaussian', 'boot', 'dqn'],
+                        help='Algorithms to run.')
+    parser.add_argument('--max-steps', type=int, default=30000,
+                        help='Total number of learning steps.')
+    parser.add_argument('--evaluation-frequency', type=int, default=10000,
+                        help='Number of learning steps of an epoch.')
+    parser.add_argument('--test-samples', type=int, default=1000,
+                        help='Number of steps of each evaluation.')
+    parser.add_argument('--initial-replay-size', type=int, default=5000,
+                        help='Initial size of the replay memory.')
+    parser.add_argument('--max-replay-size', type=int, default=100000,
+                        help='Maximum size of the replay memory.')
+    parser.add_argument('--save', action='store_true',
+                        help='Whether to save the results in the results '
+                             'folder.')
+    args, extra_args = parser.parse_known_args()
+
+    results = dict()
+    for alg in args.algs:
+        start = time.time()
+        returncode, peak_rss = _run(alg, args, extra_args)
+        path = _find_profile(alg, start)
+        if returncode != 0 or path is None:
+            print('%s: failed with exit code %d' % (alg, returncode))
+            continue
+        with open(path) as f:
+            results[alg] = summarize(json.load(f), args.evaluation_frequency)
+        results[alg]['peak_rss_bytes'] = peak_rss
+
+    print('%-10s %14s %14s %14s %14s %14s' % ('alg', 'act steps/s',
+                                              'fits/s', 'learn steps/s',
+                                              'peak RSS MB', 'replay MB'))
+    for alg, r in results.items():
+        print('%-10s %14.1f %14.1f %14.1f %14.1f %14.1f' % (
+            alg, r['acting_steps_per_second'], r['fits_per_second'],
+            r['learning_steps_per_second'], r['peak_rss_bytes'] / 2 ** 20,
+            r['replay_bytes'] / 2 ** 20))
+
+    if args.save:
+        if not os.path.exists(_RESULTS_DIR):
+            os.makedirs(_RESULTS_DIR)
+        path = os.path.join(_RESULTS_DIR,
+                            'synthetic_atari_%s.json' % get_commit())
+        with open(path, 'w') as f:
+            json.dump(dict(commit=get_commit(), time=time.time(),
+                           args=vars(args), extra_args=extra_args,
+                           results=results), f, indent=1, sort_keys=True)
+        print('Saved: ', path)
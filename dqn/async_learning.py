@@ -0,0 +1,316 @@
+import multiprocessing as mp
+import os
+import time
+from copy import deepcopy
+from queue import Empty, Full
+
+import numpy as np
+
+
+class _SharedParameter(object):
+    """
+    Exploration parameter of an actor, whose value is set by the learner in
+    shared memory.
+
+    """
+    def __init__(self, value):
+        self._value = value
+
+    def __call__(self, *idx, **kwargs):
+        return self._value.value
+
+    def get_value(self, *idx, **kwargs):
+        return self._value.value
+
+    def update(self, *idx, **kwargs):
+        pass
+
+
+def _actor(idx, env_fn, approximator, approximator_params, policy_fn,
+           weights, shapes, dtypes, version, lock, queue, running, stats,
+           chunk_size, weight_sync_steps, frame_stack, epsilon):
+    # The actors run their network on the CPU, leaving the GPU to the learner
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    from mushroom.approximators.regressor import Regressor
+
+    np.random.seed()
+
+    mdp = env_fn()
+    params = deepcopy(approximator_params)
+    params['name'] = 'target'
+    params['folder_name'] = None
+    params.pop('load_path', None)
+    q = Regressor(approximator, **params)
+    policy = policy_fn()
+    policy.set_q(q)
+    if epsilon is not None:
+        policy.set_epsilon(_SharedParameter(epsilon))
+
+    sizes = [int(np.prod(s)) for s in shapes]
+    local_version = -1
+
+    def episode_start():
+        if hasattr(policy, 'get_idx'):
+            policy.set_idx(np.random.randint(policy._n_approximators))
+
+        return mdp.reset(), True
+
+    state, first = episode_start()
+    episode_steps = 0
+    n_steps = 0
+    chunk = list()
+    busy = 0.
+    wait = 0.
+    t = time.time()
+    while running.value:
+        if n_steps % weight_sync_steps == 0 and version.value != local_version:
+            with lock:
+                local_version = version.value
+                flat = np.frombuffer(weights, dtype=np.float32).copy()
+            w = np.split(flat, np.cumsum(sizes)[:-1])
+            q.model.set_weights([x.reshape(s).astype(d)
+                                 for x, s, d in zip(w, shapes, dtypes)])
+
+        action = policy.draw_action(np.array(state))
+        next_state, reward, absorbing, _ = mdp.step(action)
+        episode_steps += 1
+        n_steps += 1
+        last = not (episode_steps < mdp.info.horizon and not absorbing)
+
+        if frame_stack:
+            chunk.append((np.asarray(state) if first else None,
+                          np.asarray(next_state)[..., -1], action, reward,
+                          absorbing, last))
+        else:
+            chunk.append((state, action, reward, next_state, absorbing,
+                          last))
+
+        if last:
+            state, first = episode_start()
+            episode_steps = 0
+        else:
+            state, first = next_state, False
+
+        if len(chunk) == chunk_size:
+            t_put = time.time()
+            busy += t_put - t
+            while running.value:
+                try:
+                    queue.put((idx, chunk), timeout=1.)
+                    break
+                except Full:
+                    pass
+            chunk = list()
+            t = time.time()
+            wait += t - t_put
+            stats[2 * idx] = busy
+            stats[2 * idx + 1] = wait
+
+    mdp.stop()
+
+
+class AsyncLearner(object):
+    """
+    Asynchronous actor/learner architecture for the DQN agents. A set of
+    actor processes move in their own copy of the environment, following
+    the policy of a local network whose weights are periodically pulled from
+    a shared-memory snapshot of the learner network, and send the collected
+    transitions to the learner. The learner adds them to the replay memory
+    of the agent and fits the agent without waiting for the environment
+    steps.
+
+    By default, the learner performs one update every ``train_frequency``
+    collected samples, as in the synchronous runs; when the actors are too
+    slow to keep this ratio, the learner waits for new samples. The time
+    spent working and waiting by the actors and the learner is reported by
+    ``utilization``.
+
+    """
+    def __init__(self, agent, env_fn, approximator, approximator_params,
+                 policy_fn, n_actors, initial_replay_size, train_frequency,
+                 throttle=True, weight_sync_updates=100,
+                 weight_sync_steps=100, chunk_size=32, queue_size=64,
+                 frames_wrapper=None, epsilon=None):
+        """
+        Constructor.
+
+        Args:
+            agent (Agent): the DQN agent to fit;
+            env_fn (function): picklable function building an environment;
+            approximator (class): the network class of the agent;
+            approximator_params (dict): the parameters of the network;
+            policy_fn (function): picklable function building the policy of
+                an actor;
+            n_actors (int): number of actor processes;
+            initial_replay_size (int): number of samples to collect before
+                the first update;
+            train_frequency (int): number of collected samples per update
+                when ``throttle`` is True;
+            throttle (bool, True): whether to keep the ratio between updates
+                and collected samples of the synchronous runs;
+            weight_sync_updates (int, 100): number of updates between two
+                snapshots of the learner weights;
+            weight_sync_steps (int, 100): number of actor steps between two
+                checks for a new snapshot;
+            chunk_size (int, 32): number of transitions sent together by an
+                actor;
+            queue_size (int, 64): maximum number of chunks waiting to be
+                added to the replay memory;
+            frames_wrapper (class, None): class wrapping the frames of
+                stacked observations (e.g. LazyFrames). When provided, the
+                actors send only the newest frame of each state, and the
+                stacks are rebuilt by the learner sharing their frames;
+            epsilon (Parameter, None): exploration parameter of the actors.
+                The actors explore with epsilon 1 until ``initial_replay_size``
+                samples are collected, then the learner updates the parameter
+                once per collected sample and sends its value to the actors,
+                so that the schedule is the one of the synchronous runs.
+
+        """
+        self._agent = agent
+        self._initial_replay_size = initial_replay_size
+        self._train_frequency = train_frequency
+        self._throttle = throttle
+        self._weight_sync_updates = weight_sync_updates
+        self._frames_wrapper = frames_wrapper
+        self._epsilon = epsilon
+
+        w = agent.approximator.model.get_weights()
+        shapes = [x.shape for x in w]
+        dtypes = [x.dtype for x in w]
+
+        ctx = mp.get_context('spawn')
+        self._weights = ctx.RawArray('f', int(sum(x.size for x in w)))
+        self._version = ctx.RawValue('l', 0)
+        self._lock = ctx.Lock()
+        self._queue = ctx.Queue(maxsize=queue_size)
+        self._running = ctx.RawValue('b', 1)
+        self._stats = ctx.RawArray('d', 2 * n_actors)
+        self._epsilon_value = ctx.RawValue(
+            'd', epsilon.get_value() if epsilon is not None and
+            initial_replay_size == 0 else 1.)
+        self._publish()
+
+        self._frames = [None] * n_actors
+        self._n_collected = 0
+        self._n_updates = 0
+        self._pending = list()
+        self._busy = 0.
+        self._wait = 0.
+
+        self._actors = list()
+        for i in range(n_actors):
+            p = ctx.Process(
+                target=_actor,
+                args=(i, env_fn, approximator, approximator_params, policy_fn,
+                      self._weights, shapes, dtypes, self._version,
+                      self._lock, self._queue, self._running, self._stats,
+                      chunk_size, weight_sync_steps,
+                      frames_wrapper is not None,
+                      self._epsilon_value if epsilon is not None else None))
+            p.daemon = True
+            p.start()
+            self._actors.append(p)
+
+    def learn(self, n_steps):
+        """
+        Fit the agent until the actors have collected a given number of
+        samples.
+
+        Args:
+            n_steps (int): number of samples to collect.
+
+        """
+        target = self._n_collected + n_steps
+        while self._n_collected < target:
+            t = time.time()
+            self._receive(block=not self._update_due())
+            t_fit = time.time()
+            self._wait += t_fit - t
+
+            if self._update_due():
+                self._agent.fit(self._pending)
+                self._pending = list()
+                self._n_updates += 1
+                if self._n_updates % self._weight_sync_updates == 0:
+                    self._publish()
+                self._busy += time.time() - t_fit
+
+    def utilization(self):
+        """
+        Returns:
+            The fraction of time spent working (i.e. not waiting for samples
+            or for room in the queue) by the learner and by each actor.
+
+        """
+        def fraction(busy, wait):
+            total = busy + wait
+            return busy / total if total > 0 else 0.
+
+        stats = np.frombuffer(self._stats, dtype=np.float64).reshape(-1, 2)
+
+        return dict(learner=fraction(self._busy, self._wait),
+                    actors=[fraction(b, w) for b, w in stats])
+
+    def stop(self):
+        self._running.value = 0
+        for p in self._actors:
+            while p.is_alive():
+                try:
+                    self._queue.get(timeout=.1)
+                except Empty:
+                    pass
+                p.join(timeout=.1)
+
+    def _update_due(self):
+        if self._n_collected < self._initial_replay_size:
+            return False
+        if not self._throttle:
+            return True
+
+        n_due = 1 + (self._n_collected - self._initial_replay_size) \
+            // self._train_frequency
+
+        return self._n_updates < n_due
+
+    def _receive(self, block):
+        try:
+            chunks = [self._queue.get(timeout=1.) if block
+                      else self._queue.get_nowait()]
+        except Empty:
+            return
+        while True:
+            try:
+                chunks.append(self._queue.get_nowait())
+            except Empty:
+                break
+
+        for idx, chunk in chunks:
+            for sample in chunk:
+                self._pending.append(self._decode(idx, sample))
+                self._n_collected += 1
+                if self._epsilon is not None and \
+                        self._n_collected > self._initial_replay_size:
+                    self._epsilon_value.value = self._epsilon()
+
+    def _decode(self, idx, sample):
+        if self._frames_wrapper is None:
+            return sample
+
+        first_stack, frame, action, reward, absorbing, last = sample
+        if first_stack is not None:
+            self._frames[idx] = [first_stack[..., k]
+                                 for k in range(first_stack.shape[-1])]
+        frames = self._frames[idx]
+        next_frames = frames[1:] + [frame]
+        self._frames[idx] = next_frames
+
+        return (self._frames_wrapper(frames), action, reward,
+                self._frames_wrapper(next_frames), absorbing, last)
+
+    def _publish(self):
+        w = self._agent.approximator.model.get_weights()
+        flat = np.concatenate([x.ravel() for x in w]).astype(np.float32)
+        with self._lock:
+            np.frombuffer(self._weights, dtype=np.float32)[:] = flat
+            self._version.value += 1
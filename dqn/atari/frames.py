@@ -0,0 +1,43 @@
+import numpy as np
+from mushroom.environments import Atari
+
+
+class LazyFrames(object):
+    """
+    Stack of the last ``history_length`` uint8 frames of an Atari game. The
+    frames are shared with the neighbouring states, so that the replay memory
+    does not store them more than once, and they are stacked on the last axis
+    (NHWC layout) only when the state is converted to an array.
+
+    """
+    def __init__(self, frames):
+        self._frames = frames
+
+    def __array__(self, dtype=None, copy=None):
+        out = np.stack(self._frames, axis=-1)
+        if dtype is not None:
+            out = out.astype(dtype)
+
+        return out
+
+    @property
+    def shape(self):
+        return self._frames[0].shape + (len(self._frames),)
+
+
+class AtariNHWC(Atari):
+    """
+    Atari environment returning the states as (height, width, history_length)
+    uint8 stacks, the layout expected by the convolutional networks, so that
+    no transpose or float conversion is needed on the host.
+
+    """
+    def reset(self, state=None):
+        state = super(AtariNHWC, self).reset(state)
+
+        return LazyFrames(state._frames)
+
+    def step(self, action):
+        state, reward, absorbing, info = super(AtariNHWC, self).step(action)
+
+        return LazyFrames(state._frames), reward, absorbing, info
@@ -1,6 +1,8 @@
 import numpy as np
 import tensorflow as tf
 
+from telemetry import SummaryWriter
+
 
 def huber_loss(x, delta=1.0):
     """Reference: https://en.wikipedia.org/wiki/Huber_loss"""
@@ -43,15 +45,17 @@ class GaussianNet:
                         self._w.append(w[i].assign(self._target_w[i]))
 
     def predict(self, s):
-        s = np.transpose(s, [0, 2, 3, 1])
         out = np.array([self._session.run([self._q, self._sigma], feed_dict={self._x: s})])
 
         return out
 
     def fit(self, s, a, q_and_sigma, prob_exploration):
-        s = np.transpose(s, [0, 2, 3, 1])
-        summaries, _, loss = self._session.run(
-            [self._merged, self._train_step, self.loss],
+        summary = self._select_summary()
+        fetches = [self._train_step]
+        if summary is not None:
+            fetches.append(summary)
+        out = self._session.run(
+            fetches,
             feed_dict={self._x: s,
                        self._action: a.ravel().astype(np.uint8),
                        self._target_q: q_and_sigma[0, :],
@@ -59,11 +63,18 @@ class GaussianNet:
                        self._prob_exploration: prob_exploration}
         )
 
-        if hasattr(self, '_train_writer'):
-            self._train_writer.add_summary(summaries, self._train_count)
+        if summary is not None:
+            self._train_writer.add_summary(out[-1], self._train_count)
 
         self._train_count += 1
 
+    def _select_summary(self):
+        if not hasattr(self, '_train_writer'):
+            return None
+
+        return self._train_writer.select(self._train_count, self._merged,
+                                         self._merged_scalars)
+
     def set_weights(self, weights):
         w = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES,
                               scope=self._scope_name)
@@ -108,10 +119,11 @@ class GaussianNet:
             self._scope_name = tf.get_default_graph().get_name_scope() + '/'
 
             with tf.variable_scope('State'):
-                self._x = tf.placeholder(tf.float32,
+                self._x = tf.placeholder(tf.uint8,
                                          shape=[None] + list(
                                              convnet_pars['input_shape']),
                                          name='input')
+                x = tf.cast(self._x, tf.float32) / 255.
 
             with tf.variable_scope('Action'):
                 self._action = tf.placeholder('uint8', [None], name='action')
@@ -123,7 +135,7 @@ class GaussianNet:
 
             with tf.variable_scope('Convolutions'):
                 hidden_1 = tf.layers.conv2d(
-                    self._x / 255., 32, 8, 4, activation=tf.nn.relu,
+                    x, 32, 8, 4, activation=tf.nn.relu,
                     kernel_initializer=tf.glorot_uniform_initializer(),
                     name='hidden_1'
                 )
@@ -227,6 +239,11 @@ class GaussianNet:
                 tf.get_collection(tf.GraphKeys.SUMMARIES,
                                   scope=self._scope_name)
             )
+            self._merged_scalars = tf.summary.merge(
+                [s for s in tf.get_collection(tf.GraphKeys.SUMMARIES,
+                                              scope=self._scope_name)
+                 if s.op.type == 'ScalarSummary']
+            )
 
             optimizer = convnet_pars['optimizer']
 
@@ -274,9 +291,12 @@ class GaussianNet:
         self._session.run(initializer)
 
         if self._folder_name is not None:
-            self._train_writer = tf.summary.FileWriter(
+            self._train_writer = SummaryWriter(
                 self._folder_name + '/' + self._scope_name[:-1],
-                graph=tf.get_default_graph()
+                graph=tf.get_default_graph(),
+                summary_interval=convnet_pars.get('summary_interval',
+                                                  1000),
+                scalar_interval=convnet_pars.get('scalar_interval', 100)
             )
 
         self._train_count = 0
@@ -301,6 +321,8 @@ class GaussianNet:
         tf.add_to_collection(self._scope_name + '_target_q', self._target_q)
         tf.add_to_collection(self._scope_name + '_target_sigma', self._target_sigma)
         tf.add_to_collection(self._scope_name + '_merged', self._merged)
+        tf.add_to_collection(self._scope_name + '_merged_scalars',
+                             self._merged_scalars)
         tf.add_to_collection(self._scope_name + '_train_step', self._train_step)
 
     def _restore_collection(self, convnet_pars):
@@ -318,6 +340,10 @@ class GaussianNet:
         self._target_q = tf.get_collection(self._scope_name + '_target_q')[0]
         self._target_sigma = tf.get_collection(self._scope_name + '_target_sigma')[0]
         self._merged = tf.get_collection(self._scope_name + '_merged')[0]
+        merged_scalars = tf.get_collection(
+            self._scope_name + '_merged_scalars')
+        self._merged_scalars = merged_scalars[0] if merged_scalars \
+            else self._merged
         self._train_step = tf.get_collection(
             self._scope_name + '_train_step')[0]
 
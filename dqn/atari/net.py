@@ -1,6 +1,8 @@
 import numpy as np
 import tensorflow as tf
 
+from telemetry import SummaryWriter
+
 
 class ConvNet:
 
@@ -52,7 +54,6 @@ class ConvNet:
                         self._w.append(w[i].assign(self._target_w[i]))
 
     def predict(self, s, idx=None):
-        s = np.transpose(s, [0, 2, 3, 1])
         if idx is not None:
             return self._session.run(self._q[idx], feed_dict={self._x: s})
         else:
@@ -60,9 +61,12 @@ class ConvNet:
                 [self._session.run(self._q, feed_dict={self._x: s})])
 
     def fit(self, s, a, q, mask, prob_exploration, margin):
-        s = np.transpose(s, [0, 2, 3, 1])
-        summaries, _ = self._session.run(
-            [self._merged, self._train_step],
+        summary = self._select_summary()
+        fetches = [self._train_step]
+        if summary is not None:
+            fetches.append(summary)
+        out = self._session.run(
+            fetches,
             feed_dict={self._x: s,
                        self._action: a.ravel().astype(np.uint8),
                        self._target_q: q,
@@ -70,11 +74,18 @@ class ConvNet:
                        self._prob_exploration: prob_exploration,
                        self._margin: margin}
         )
-        if hasattr(self, '_train_writer'):
-            self._train_writer.add_summary(summaries, self._train_count)
+        if summary is not None:
+            self._train_writer.add_summary(out[-1], self._train_count)
 
         self._train_count += 1
 
+    def _select_summary(self):
+        if not hasattr(self, '_train_writer'):
+            return None
+
+        return self._train_writer.select(self._train_count, self._merged,
+                                         self._merged_scalars)
+
     def set_weights(self, weights):
         w = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES,
                               scope=self._scope_name)
@@ -118,10 +129,11 @@ class ConvNet:
             self._scope_name = tf.get_default_graph().get_name_scope() + '/'
 
             with tf.variable_scope('State'):
-                self._x = tf.placeholder(tf.float32,
+                self._x = tf.placeholder(tf.uint8,
                                          shape=[None] + list(
                                              convnet_pars['input_shape']),
                                          name='input')
+                x = tf.cast(self._x, tf.float32) / 255.
 
             with tf.variable_scope('Action'):
                 self._action = tf.placeholder('uint8', [None], name='action')
@@ -136,7 +148,7 @@ class ConvNet:
 
             with tf.variable_scope('Convolutions'):
                 hidden_1 = tf.layers.conv2d(
-                    self._x / 255., 32, 8, 4, activation=tf.nn.relu,
+                    x, 32, 8, 4, activation=tf.nn.relu,
                     kernel_initializer=tf.glorot_uniform_initializer(),
                     name='hidden_1'
                 )
@@ -239,6 +251,11 @@ class ConvNet:
                 tf.get_collection(tf.GraphKeys.SUMMARIES,
                                   scope=self._scope_name)
             )
+            self._merged_scalars = tf.summary.merge(
+                [s for s in tf.get_collection(tf.GraphKeys.SUMMARIES,
+                                              scope=self._scope_name)
+                 if s.op.type == 'ScalarSummary']
+            )
 
             optimizer = convnet_pars['optimizer']
             if optimizer['name'] == 'rmspropcentered':
@@ -266,9 +283,12 @@ class ConvNet:
         self._session.run(initializer)
 
         if self._folder_name is not None:
-            self._train_writer = tf.summary.FileWriter(
+            self._train_writer = SummaryWriter(
                 self._folder_name + '/' + self._scope_name[:-1],
-                graph=tf.get_default_graph()
+                graph=tf.get_default_graph(),
+                summary_interval=convnet_pars.get('summary_interval',
+                                                  1000),
+                scalar_interval=convnet_pars.get('scalar_interval', 100)
             )
 
         self._train_count = 0
@@ -287,6 +307,8 @@ class ConvNet:
                                  self._q_acted[i])
         tf.add_to_collection(self._scope_name + '_target_q', self._target_q)
         tf.add_to_collection(self._scope_name + '_merged', self._merged)
+        tf.add_to_collection(self._scope_name + '_merged_scalars',
+                             self._merged_scalars)
         tf.add_to_collection(self._scope_name + '_train_step', self._train_step)
         tf.add_to_collection(self._scope_name + '_mask', self._mask)
 
@@ -309,6 +331,10 @@ class ConvNet:
         self._q_acted = q_acted
         self._target_q = tf.get_collection(self._scope_name + '_target_q')[0]
         self._merged = tf.get_collection(self._scope_name + '_merged')[0]
+        merged_scalars = tf.get_collection(
+            self._scope_name + '_merged_scalars')
+        self._merged_scalars = merged_scalars[0] if merged_scalars \
+            else self._merged
         self._train_step = tf.get_collection(
             self._scope_name + '_train_step')[0]
 
@@ -7,6 +7,7 @@ sys.path.append('../..')
 import time
 import tensorflow as tf
 import glob
+from functools import partial
 """
 This script can be used to run Atari experiments with DQN.
 
@@ -37,6 +38,10 @@ def experiment():
                           help='Width of the game screen.')
     arg_game.add_argument("--screen-height", type=int, default=84,
                           help='Height of the game screen.')
+    arg_game.add_argument("--synthetic", action='store_true',
+                          help='Whether to replace the game with a synthetic '
+                               'environment, which does not need the ROMs, '
+                               'to measure the speed of the pipeline.')
     arg_mem = parser.add_argument_group('Replay Memory')
     arg_mem.add_argument("--initial-replay-size", type=int, default=50000,
                          help='Initial size of the replay memory.')
@@ -150,8 +155,33 @@ def experiment():
     arg_utils.add_argument('--debug', action='store_true',
                            help='Flag specifying whether the script has to be'
                                 'run in debug mode.')
+    arg_utils.add_argument("--summary-interval", type=int, default=1000,
+                           help='Number of train steps between two full '
+                                'TensorBoard summaries (0 to disable).')
+    arg_utils.add_argument("--scalar-interval", type=int, default=100,
+                           help='Number of train steps between two scalar '
+                                'TensorBoard summaries (0 to disable).')
     arg_utils.add_argument("--device", type=int, default=0,
                           help='Index of the GPU.')
+    arg_utils.add_argument("--n-envs", type=int, default=1,
+                           help='Number of environments stepped in parallel '
+                                'subprocesses during learning.')
+    arg_utils.add_argument("--eval-workers", type=int, default=0,
+                           help='Number of processes evaluating the policy '
+                                'in background. If 0, learning stops during '
+                                'the evaluation.')
+    arg_utils.add_argument("--async-actors", type=int, default=0,
+                           help='Number of asynchronous actor processes. If '
+                                '0, the agent acts and learns in turn.')
+    arg_utils.add_argument("--checkpoint-frequency", type=int, default=0,
+                           help='Number of epochs between two checkpoints of '
+                                'the complete training state (0 to disable).')
+    arg_utils.add_argument("--resume", type=str,
+                           help='Path of a checkpoint from which the training '
+                                'is resumed.')
+    arg_utils.add_argument("--profile", action='store_true',
+                           help='Whether to save the time spent in each phase '
+                                'of each epoch.')
 
     args = parser.parse_args()
 
@@ -163,9 +193,18 @@ def experiment():
     from gaussian_dqn import GaussianDQN
     from dqn import DoubleDQN, DQN
     from mushroom.core.core import Core
-    from mushroom.environments import Atari
+    from frames import AtariNHWC, LazyFrames
+    if args.synthetic:
+        from synthetic import SyntheticAtari as AtariNHWC
+    from vec_env import SubprocVectorEnv
+    from vec_core import VectorCore
+    from async_learning import AsyncLearner
+    from parallel_eval import EvaluationPool
+    from export import InferenceAgent
+    from checkpoint import load_training_state, save_training_state
+    from utils.callbacks import evaluate_scores
+    from utils.profiler import Profiler, instrument
 
-    from mushroom.utils.dataset import compute_scores
     from mushroom.utils.parameters import LinearDecayParameter, Parameter
 
     from policy import BootPolicy, WeightedPolicy, WeightedGaussianPolicy, EpsGreedy, UCBPolicy
@@ -194,8 +233,8 @@ def experiment():
             agent_algorithm = ParticleDoubleDQN
         else:
             agent_algorithm = ParticleDQN
-    def get_stats(dataset):
-        score = compute_scores(dataset)
+    def get_stats(stats):
+        score = stats[1], stats[2], stats[3], stats[10]
         print('min_reward: %f, max_reward: %f, mean_reward: %f,'
               ' games_completed: %d' % score)
 
@@ -207,41 +246,16 @@ def experiment():
     # Evaluation of the model provided by the user.
     
     if args.load_path and args.evaluation:
-        mdp = Atari(args.name, args.screen_width, args.screen_height,
-                    ends_at_life=False, history_length=args.history_length,
-                    max_no_op_actions=args.max_no_op_actions)
+        mdp = AtariNHWC(args.name, args.screen_width, args.screen_height,
+                        ends_at_life=False, history_length=args.history_length,
+                        max_no_op_actions=args.max_no_op_actions)
         print("Evaluation Run")
 
         # Policy
         epsilon_test = Parameter(value=args.test_exploration_rate)
 
-        # Approximator
-        input_shape = ( args.screen_height,args.screen_width, args.history_length)
-        approximator_params = dict(
-            input_shape=input_shape,
-            output_shape=(mdp.info.action_space.n,),
-            n_actions=mdp.info.action_space.n,
-            name='test',
-            load_path=args.load_path,
-            optimizer={'name': args.optimizer,
-                       'lr': args.learning_rate,
-                       'lr_sigma':args.lr_sigma,
-                       'decay': args.decay,
-                       'epsilon': args.epsilon},
-        )
-
-        approximator = ConvNet
-
-        # Agent
-        algorithm_params = dict(
-            batch_size=args.batch_size,
-            initial_replay_size=1,
-            max_replay_size=1,
-            clip_reward=True,
-            target_update_frequency=args.target_update_frequency // args.train_frequency,
-        )
+        # Agent, acting with the frozen inference graph of the saved network
         if args.alg == 'boot':
-            algorithm_params['p_mask'] = args.p_mask
             pi = BootPolicy(args.n_approximators, epsilon=epsilon_test)
         elif args.alg == 'gaussian':
             if args.ucb:
@@ -258,30 +272,15 @@ def experiment():
         else:
             raise ValueError("Algorithm uknown")
 
-        if args.alg in ['gaussian', 'particle']:
-            algorithm_params['update_type']=args.update_type
-            algorithm_params['delta'] = args.delta
-            approximator_params['q_min']= args.q_min
-            approximator_params['q_max']= args.q_max
-            approximator_params['loss']= args.loss
-            approximator_params['init_type'] = args.init_type
-            approximator_params['sigma_weight'] = args.sigma_weight
-        if  args.alg in ['particle', 'boot']:
-            approximator_params['n_approximators'] = args.n_approximators
-            algorithm_params['n_approximators'] = args.n_approximators
-        agent = agent_algorithm(approximator, pi, mdp.info,
-                          approximator_params=approximator_params,
-                          **algorithm_params)
-        #print(agent)
+        agent = InferenceAgent(pi, mdp.info, args.load_path)
+
         # Algorithm
         core_test = Core(agent, mdp)
 
         # Evaluate model
         pi.set_eval(True)
-        dataset = core_test.evaluate(n_steps=args.test_samples,
-                                     render=args.render,
-                                     quiet=args.quiet)
-        get_stats(dataset)
+        get_stats(evaluate_scores(core_test, args.test_samples,
+                                  render=args.render, quiet=args.quiet))
     else:
         # DQN learning run
         print("Learning Run")
@@ -305,8 +304,18 @@ def experiment():
             max_steps = args.max_steps
 
         # MDP
-        mdp = Atari(args.name, args.screen_width, args.screen_height,
-                    ends_at_life=True)
+        if args.n_envs > 1:
+            mdp = SubprocVectorEnv(
+                [partial(AtariNHWC, args.name, args.screen_width,
+                         args.screen_height, ends_at_life=True)
+                 for _ in range(args.n_envs)],
+                observation_shape=(args.screen_height, args.screen_width,
+                                   args.history_length),
+                frames_wrapper=LazyFrames
+            )
+        else:
+            mdp = AtariNHWC(args.name, args.screen_width, args.screen_height,
+                            ends_at_life=True)
 
         # Policy
         epsilon = LinearDecayParameter(value=args.initial_exploration_rate,
@@ -350,6 +359,8 @@ def experiment():
             n_actions=mdp.info.action_space.n,
             folder_name=folder_name,
             sigma_weight=args.sigma_weight,
+            summary_interval=args.summary_interval,
+            scalar_interval=args.scalar_interval,
             optimizer={'name': args.optimizer,
                        'lr': args.learning_rate,
                        'decay': args.decay,
@@ -364,6 +375,9 @@ def experiment():
             p = "scores.npy"
             scores=np.load(p).tolist()
             max_steps=max_steps-evaluation_frequency*len(scores)
+        elif args.resume:
+            folder_name = os.path.dirname(os.path.abspath(args.resume))
+            approximator_params['folder_name'] = folder_name
         approximator = ConvNet
 
         # Agent
@@ -394,52 +408,116 @@ def experiment():
         if args.ucb:
             q = agent.approximator
             if args.alg == 'particle':
-                def mu(state):
-                    q_list = q.predict(state).squeeze()
-                    qs = np.array(q_list)
-                    return qs.mean(axis=0)
-
                 quantiles = [i * 1. / (args.n_approximators - 1) for i in range(args.n_approximators)]
                 for p in range(args.n_approximators):
                     if quantiles[p] >= 1 - args.delta:
                         delta_index = p
                         break
 
-                def quantile_func(state):
-                    q_list = q.predict(state).squeeze()
-                    qs = np.array(q_list)
-                    return qs[delta_index,:]
-                pi.set_mu(mu)
-                pi.set_quantile_func(quantile_func)
+                def scores_func(state):
+                    qs = np.array(q.predict(state)).squeeze()
+                    return qs.mean(axis=0), qs[delta_index, :]
+                pi.set_scores_func(scores_func)
 
             if args.alg == 'gaussian':
                 raise ValueError("Not implemented")
 
+        # Resume the training state, replay memory included
+        start_epoch = 1
+        if args.resume:
+            info = load_training_state(args.resume, agent, [epsilon],
+                                       frames_wrapper=LazyFrames)
+            scores = info['scores']
+            start_epoch = info['epoch'] + 1
+            print('Resuming from epoch: ', info['epoch'])
+
         # Algorithm
-        core = Core(agent, mdp)
+        if args.n_envs > 1:
+            core = VectorCore(agent, mdp)
+        else:
+            core = Core(agent, mdp)
+
+        evaluate = evaluate_scores
+        profiler = None
+        if args.profile:
+            profiler = Profiler()
+            instrument(profiler, core)
+            evaluate = profiler.wrap(evaluate_scores, 'evaluation', 1)
+
+        # Policies of the actor and evaluation processes
+        if args.async_actors > 0 or args.eval_workers > 0:
+            if args.ucb:
+                raise ValueError('UCB policies are not supported by the '
+                                 'actor and evaluation processes.')
+            if args.alg == 'boot':
+                policy_fn = partial(BootPolicy, args.n_approximators)
+            elif args.alg == 'dqn':
+                policy_fn = partial(EpsGreedy, epsilon=epsilon_test)
+            elif args.alg == 'particle':
+                policy_fn = partial(WeightedPolicy, args.n_approximators)
+            else:
+                policy_fn = WeightedGaussianPolicy
+
+        async_learner = None
+        if args.async_actors > 0:
+            # The actors explore with the parameter of the learner policy,
+            # which is checkpointed with the learner
+            async_learner = AsyncLearner(
+                agent, partial(AtariNHWC, args.name, args.screen_width,
+                               args.screen_height, ends_at_life=True),
+                approximator, approximator_params, policy_fn,
+                n_actors=args.async_actors,
+                initial_replay_size=0 if args.resume else initial_replay_size,
+                train_frequency=train_frequency,
+                frames_wrapper=LazyFrames, epsilon=epsilon
+            )
+            if profiler is not None:
+                profiler.wrap_method(async_learner, 'learn', 'learn', 1)
+
+        eval_pool = None
+        if args.eval_workers > 0:
+            eval_pool = EvaluationPool(
+                partial(AtariNHWC, args.name, args.screen_width,
+                        args.screen_height, ends_at_life=False),
+                approximator, approximator_params, policy_fn, epsilon_test,
+                n_workers=args.eval_workers
+            )
+        evaluation = None
 
         # RUN
 
-        # Fill replay memory with random dataset
+        if not args.resume:
+            # Fill replay memory with random dataset
         
-        print_epoch(0)
-        core.learn(n_steps=initial_replay_size,
-                   n_steps_per_fit=initial_replay_size, quiet=args.quiet)
-
-        if args.save:
-            agent.approximator.model.save()
-
-        # Evaluate initial policy
-        if hasattr(pi, 'set_eval'):
-            pi.set_eval(True)
-        pi.set_epsilon(epsilon_test)
-        mdp.set_episode_end(False)
-        dataset = core.evaluate(n_steps=test_samples, render=args.render,
-                                quiet=args.quiet)
-        scores.append(get_stats(dataset))
-
-        np.save(folder_name + '/scores.npy', scores)
-        for n_epoch in range(1, max_steps // evaluation_frequency + 1):
+            print_epoch(0)
+            if async_learner is not None:
+                async_learner.learn(n_steps=initial_replay_size)
+            else:
+                core.learn(n_steps=initial_replay_size,
+                           n_steps_per_fit=initial_replay_size,
+                           quiet=args.quiet)
+
+            if args.save:
+                agent.approximator.model.save()
+
+            # Evaluate initial policy
+            if eval_pool is not None:
+                evaluation = eval_pool.submit(
+                    agent.approximator.model.get_weights(), test_samples)
+            else:
+                if hasattr(pi, 'set_eval'):
+                    pi.set_eval(True)
+                pi.set_epsilon(epsilon_test)
+                mdp.set_episode_end(False)
+                scores.append(get_stats(evaluate(
+                    core, test_samples, render=args.render,
+                    quiet=args.quiet)))
+
+                np.save(folder_name + '/scores.npy', scores)
+            if profiler is not None:
+                profiler.end_epoch(0)
+        for n_epoch in range(start_epoch,
+                             max_steps // evaluation_frequency + 1):
             print_epoch(n_epoch)
             print('- Learning:')
             # learning step
@@ -448,23 +526,57 @@ def experiment():
 
             pi.set_epsilon(epsilon)
             mdp.set_episode_end(True)
-            core.learn(n_steps=evaluation_frequency,
-                       n_steps_per_fit=train_frequency, quiet=args.quiet)
+            if async_learner is not None:
+                async_learner.learn(n_steps=evaluation_frequency)
+                print('Utilization:', async_learner.utilization())
+            else:
+                core.learn(n_steps=evaluation_frequency,
+                           n_steps_per_fit=train_frequency, quiet=args.quiet)
 
             if args.save:
                 agent.approximator.model.save()
 
             print('- Evaluation:')
             # evaluation step
-            if hasattr(pi, 'set_eval'):
-                pi.set_eval(True)
-            pi.set_epsilon(epsilon_test)
-            mdp.set_episode_end(False)
-            dataset = core.evaluate(n_steps=test_samples, render=args.render,
-                                    quiet=args.quiet)
-            scores.append(get_stats(dataset))
+            if eval_pool is not None:
+                # The previous epoch has been evaluated while learning
+                if evaluation is not None:
+                    scores.append(get_stats(evaluation.result()))
+                evaluation = eval_pool.submit(
+                    agent.approximator.model.get_weights(), test_samples)
+            else:
+                if hasattr(pi, 'set_eval'):
+                    pi.set_eval(True)
+                pi.set_epsilon(epsilon_test)
+                mdp.set_episode_end(False)
+                scores.append(get_stats(evaluate(
+                    core, test_samples, render=args.render,
+                    quiet=args.quiet)))
+
+            if args.checkpoint_frequency > 0 and \
+                    n_epoch % args.checkpoint_frequency == 0:
+                # The pending evaluation is collected, so that the checkpoint
+                # holds the scores of all the completed epochs
+                if evaluation is not None:
+                    scores.append(get_stats(evaluation.result()))
+                    evaluation = None
+                save_training_state(folder_name + '/checkpoint.npz', agent,
+                                    [epsilon], epoch=n_epoch, scores=scores)
 
             np.save(folder_name + '/scores.npy', scores)
+            if profiler is not None:
+                profiler.end_epoch(n_epoch,
+                                   replay_bytes=agent._replay_memory.nbytes)
+                profiler.save(folder_name + '/profile.json')
+
+        if eval_pool is not None:
+            if evaluation is not None:
+                scores.append(get_stats(evaluation.result()))
+            np.save(folder_name + '/scores.npy', scores)
+            eval_pool.shutdown()
+        if async_learner is not None:
+            async_learner.stop()
+        mdp.stop()
 
     return scores
 
@@ -0,0 +1,124 @@
+import numpy as np
+from mushroom.environments import Environment, MDPInfo
+from mushroom.utils.spaces import Box, Discrete
+
+from frames import LazyFrames
+
+
+class SyntheticAtari(Environment):
+    """
+    Environment with the interface of ``AtariNHWC`` that does not need the
+    Atari ROMs, to be used to measure the speed of the learning pipeline. It
+    returns stacks of 84x84 uint8 frames in which a block moves with a cheap
+    deterministic dynamics depending on the actions. Games have a fixed
+    length and a number of lives, and a lost life ends the episode when the
+    episode end is set, as in the Atari environment of mushroom.
+
+    """
+    def __init__(self, name='Synthetic', width=84, height=84,
+                 ends_at_life=False, history_length=4, max_no_op_actions=30,
+                 n_actions=18, game_length=2000, n_lives=5, reward_period=50,
+                 seed=0):
+        """
+        Constructor.
+
+        Args:
+            name (str, 'Synthetic'): unused, kept for compatibility with
+                ``AtariNHWC``;
+            width (int, 84): width of the frames;
+            height (int, 84): height of the frames;
+            ends_at_life (bool, False): whether a lost life ends the episode;
+            history_length (int, 4): number of frames composing a state;
+            max_no_op_actions (int, 30): maximum number of no-op actions at
+                the beginning of a game;
+            n_actions (int, 18): number of actions;
+            game_length (int, 2000): number of steps of a game;
+            n_lives (int, 5): number of lives, lost at regular intervals.
+                The game is over when the last life is lost, so there cannot
+                be more lives than steps;
+            reward_period (int, 50): a unit reward is given every
+                ``reward_period`` steps, on average;
+            seed (int, 0): seed of the background of the frames.
+
+        """
+        if not 1 <= n_lives <= game_length:
+            raise ValueError('The number of lives must be between 1 and the '
+                             'length of the game, got %d lives for %d steps'
+                             % (n_lives, game_length))
+
+        self._width = width
+        self._height = height
+        self._episode_ends = ends_at_life
+        self._history_length = history_length
+        self._max_no_op_actions = max_no_op_actions
+        self._game_length = game_length
+        self._n_lives = n_lives
+        self._reward_period = reward_period
+
+        rng = np.random.RandomState(seed)
+        self._background = rng.randint(64, size=(height, width)).astype(
+            np.uint8)
+
+        self._t = 0
+        self._lives = n_lives
+        self._position = 0
+        self._frames = None
+
+        action_space = Discrete(n_actions)
+        observation_space = Box(low=0., high=255.,
+                                shape=(height, width, history_length))
+        mdp_info = MDPInfo(observation_space, action_space, gamma=.99,
+                           horizon=np.inf)
+
+        super(SyntheticAtari, self).__init__(mdp_info)
+
+    def _frame(self):
+        frame = self._background.copy()
+        row = self._position % (self._height - 8)
+        col = (self._position * 7) % (self._width - 8)
+        frame[row:row + 8, col:col + 8] = 255
+
+        return frame
+
+    def reset(self, state=None):
+        # With the episode end set, a lost life does not restart the game
+        if self._frames is None or not self._episode_ends or \
+                self._lives == 0 or self._t >= self._game_length:
+            self._t = 0
+            self._lives = self._n_lives
+            self._position = 0
+            self._frames = [self._frame()] * self._history_length
+            for _ in range(np.random.randint(self._max_no_op_actions + 1)):
+                self._move(0)
+
+        return LazyFrames(self._frames)
+
+    def _move(self, action):
+        self._t += 1
+        self._position += 1 + int(action)
+        self._frames = self._frames[1:] + [self._frame()]
+
+    def step(self, action):
+        self._move(np.ravel(action)[0])
+
+        reward = 1. if self._position % self._reward_period == 0 else 0.
+        absorbing = False
+        life_length = self._game_length // self._n_lives
+        if self._t % life_length == 0 and self._lives > 0:
+            self._lives -= 1
+            absorbing = self._episode_ends
+        # The game is over at its end or with the last life
+        if self._t >= self._game_length or self._lives == 0:
+            absorbing = True
+
+        return LazyFrames(self._frames), reward, absorbing, dict(
+            lives=self._lives)
+
+    def set_episode_end(self, ends_at_life):
+        self._episode_ends = ends_at_life
+
+    def render(self, mode='human'):
+        pass
+
+    def stop(self):
+        pass
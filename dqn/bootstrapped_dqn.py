@@ -6,6 +6,7 @@ from mushroom.algorithms.agent import Agent
 from mushroom.approximators.regressor import Ensemble, Regressor
 
 from replay_memory import  ReplayMemory
+from utils.masks import MaskStream
 
 
 class BootstrappedDQN(Agent):
@@ -22,6 +23,7 @@ class BootstrappedDQN(Agent):
         self._target_update_frequency = target_update_frequency
         
         self._p_mask = p_mask
+        self._masks = MaskStream(n_approximators, p_mask)
 
         self._replay_memory = ReplayMemory(initial_replay_size, max_replay_size)
 
@@ -43,9 +45,7 @@ class BootstrappedDQN(Agent):
         super(BootstrappedDQN, self).__init__(policy, mdp_info)
 
     def fit(self, dataset):
-        mask = np.random.binomial(1, self._p_mask,
-                                  size=(len(dataset),
-                                        self._n_approximators))
+        mask = self._masks.sample(len(dataset))
         self._replay_memory.add(dataset, mask)
         if self._replay_memory.initialized:
             state, action, reward, next_state, absorbing, _, mask =\
@@ -99,6 +99,25 @@ class BootstrappedDQN(Agent):
 
         return action
 
+    def draw_action_batch(self, states, idxs=None):
+        """
+        Draw an action in each state of a batch, one state per environment
+        of a ``VectorCore``, counting the steps as ``draw_action``.
+
+        Args:
+            states (np.ndarray): the batch of states;
+            idxs (list, None): the head followed in each environment.
+
+        Returns:
+            The (n_states, 1) array of actions.
+
+        """
+        actions = self.policy.draw_action_batch(states, idxs)
+
+        self._episode_steps += len(states)
+
+        return actions
+
     def episode_start(self):
         
         self._episode_steps = 0
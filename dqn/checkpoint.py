@@ -0,0 +1,91 @@
+import tensorflow as tf
+
+from utils.checkpoint import get_rng_state, get_state, load_checkpoint,\
+    save_checkpoint, set_rng_state, set_state
+
+
+def _models(approximator):
+    model = approximator.model
+
+    return model if isinstance(model, list) else [model]
+
+
+def _set_weights(net, weights):
+    # Variable.load assigns through the initializer inputs, so that no new
+    # operation is added to the graph of the network
+    w = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES,
+                          scope=net._scope_name)
+    assert len(w) == len(weights)
+
+    for v, x in zip(w, weights):
+        v.load(x, net._session)
+
+
+def save_training_state(path, agent, objects=None, **info):
+    """
+    Save a checkpoint of the complete training state of a DQN agent: the
+    weights of the train and target networks, including the variables of
+    the optimizer, the replay memory, the counters of the agent, the state
+    of the given objects (e.g. the exploration schedule) and of the random
+    number generators.
+
+    Args:
+        path (str): the path of the checkpoint;
+        agent (Agent): the DQN agent;
+        objects (list, None): other objects whose state has to be saved;
+        **info: other picklable values to save (e.g. the epoch and the
+            scores).
+
+    """
+    arrays = dict()
+    for name, approximator in [('train', agent.approximator),
+                               ('target', agent.target_approximator)]:
+        for i, m in enumerate(_models(approximator)):
+            for j, w in enumerate(m.get_weights()):
+                arrays['%s_%d_%d' % (name, i, j)] = w
+    for k, v in agent._replay_memory.get_state().items():
+        arrays['replay_' + k] = v
+
+    skip = [agent.approximator, agent.target_approximator,
+            agent._replay_memory]
+    state = dict(info=info,
+                 agent=get_state(agent, skip=skip),
+                 objects=get_state(list() if objects is None else objects),
+                 rng=get_rng_state())
+
+    save_checkpoint(path, state, arrays)
+
+
+def load_training_state(path, agent, objects=None, frames_wrapper=None):
+    """
+    Restore a checkpoint saved by ``save_training_state`` in an agent built
+    with the same parameters.
+
+    Args:
+        path (str): the path of the checkpoint;
+        agent (Agent): the DQN agent;
+        objects (list, None): the objects passed to ``save_training_state``;
+        frames_wrapper (class, None): class wrapping the frames of the
+            stacked states in the replay memory (e.g. LazyFrames).
+
+    Returns:
+        The dictionary of the other values saved with the checkpoint.
+
+    """
+    state, arrays = load_checkpoint(path)
+
+    for name, approximator in [('train', agent.approximator),
+                               ('target', agent.target_approximator)]:
+        for i, m in enumerate(_models(approximator)):
+            prefix = '%s_%d_' % (name, i)
+            n = len([k for k in arrays if k.startswith(prefix)])
+            _set_weights(m, [arrays[prefix + str(j)] for j in range(n)])
+    agent._replay_memory.set_state(
+        {k[len('replay_'):]: v for k, v in arrays.items()
+         if k.startswith('replay_')}, frames_wrapper)
+
+    set_state(agent, state['agent'])
+    set_state(list() if objects is None else objects, state['objects'])
+    set_rng_state(state['rng'])
+
+    return state['info']
@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from mushroom.algorithms.agent import Agent
+
+
+_SCOPE = 'train/'
+
+
+def _get(name):
+    collection = tf.get_collection(_SCOPE + name)
+
+    return collection[0] if len(collection) > 0 else None
+
+
+def export_inference_graph(path):
+    """
+    Freeze the ``train`` network saved in a folder into a minimal inference
+    graph, going from the input placeholder to the action values of each
+    head. Optimizers, target network, losses and summaries are dropped.
+    The graph is written in the ``inference`` subfolder, together with the
+    metadata needed to load it.
+
+    Args:
+        path (str): the folder of the saved network, as passed to
+            ``--load-path``.
+
+    Returns:
+        The path of the inference folder.
+
+    """
+    checkpoint = os.path.join(path, _SCOPE[:-1], _SCOPE[:-1])
+    with tf.Graph().as_default() as graph:
+        with tf.Session(graph=graph) as session:
+            restorer = tf.train.import_meta_graph(checkpoint + '.meta',
+                                                  clear_devices=True)
+            restorer.restore(session, checkpoint)
+
+            x = _get('_x')
+            if _get('_q_0') is not None:
+                kind = 'ensemble'
+                outputs = list()
+                while _get('_q_' + str(len(outputs))) is not None:
+                    outputs.append(_get('_q_' + str(len(outputs))))
+            elif _get('sigma') is not None or _get('_sigma') is not None:
+                kind = 'gaussian'
+                outputs = [_get('q') if _get('q') is not None else _get('_q'),
+                           _get('sigma') if _get('sigma') is not None
+                           else _get('_sigma')]
+            else:
+                kind = 'single'
+                outputs = [_get('_q')]
+
+            graph_def = tf.graph_util.convert_variables_to_constants(
+                session, graph.as_graph_def(),
+                [o.op.name for o in outputs])
+            graph_def = tf.graph_util.extract_sub_graph(
+                graph_def, [o.op.name for o in outputs])
+
+    metadata = dict(
+        kind=kind,
+        input=x.name,
+        outputs=[o.name for o in outputs],
+        n_actions=int(outputs[0].shape[-1]),
+        n_heads=len(outputs) if kind == 'ensemble' else 1
+    )
+
+    folder = os.path.join(path, 'inference')
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(os.path.join(folder, 'frozen_graph.pb'), 'wb') as f:
+        f.write(graph_def.SerializeToString())
+    with open(os.path.join(folder, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+    return folder
+
+
+def is_exported(path):
+    return os.path.exists(os.path.join(path, 'inference', 'metadata.json'))
+
+
+class InferenceNet(object):
+    """
+    Network loaded from a graph frozen by ``export_inference_graph``. It
+    only computes the action values, with the same output format of the
+    network it was exported from, so that it can be used by the policies in
+    place of the Regressor of the agent.
+
+    """
+    def __init__(self, path):
+        """
+        Constructor.
+
+        Args:
+            path (str): the folder of the saved network. The inference graph
+                is exported first, if it is missing.
+
+        """
+        if not is_exported(path):
+            export_inference_graph(path)
+
+        folder = os.path.join(path, 'inference')
+        with open(os.path.join(folder, 'metadata.json')) as f:
+            metadata = json.load(f)
+        graph_def = tf.GraphDef()
+        with open(os.path.join(folder, 'frozen_graph.pb'), 'rb') as f:
+            graph_def.ParseFromString(f.read())
+
+        self._kind = metadata['kind']
+        self.n_actions = metadata['n_actions']
+        self.n_heads = metadata['n_heads']
+        self.model = self
+
+        self._graph = tf.Graph()
+        with self._graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        config = tf.ConfigProto()
+        config.gpu_options.allow_growth = True
+        self._session = tf.Session(graph=self._graph, config=config)
+
+        self._x = self._graph.get_tensor_by_name(metadata['input'])
+        self._q = [self._graph.get_tensor_by_name(o)
+                   for o in metadata['outputs']]
+
+    def predict(self, s, idx=None):
+        if self._kind == 'single':
+            return self._session.run(self._q[0], feed_dict={self._x: s})
+        if idx is not None:
+            return self._session.run(self._q[idx], feed_dict={self._x: s})
+
+        return np.array([self._session.run(self._q, feed_dict={self._x: s})])
+
+    def close(self):
+        self._session.close()
+
+
+class InferenceAgent(Agent):
+    """
+    Agent acting with a network loaded by ``InferenceNet``. It has no replay
+    memory and no target network, and it can only be evaluated.
+
+    """
+    def __init__(self, policy, mdp_info, path):
+        """
+        Constructor.
+
+        Args:
+            policy (TDPolicy): the policy followed by the agent;
+            mdp_info (MDPInfo): information about the MDP;
+            path (str): the folder of the saved network.
+
+        """
+        self.approximator = InferenceNet(path)
+        policy.set_q(self.approximator)
+
+        super(InferenceAgent, self).__init__(policy, mdp_info)
+
+    def fit(self, dataset):
+        raise NotImplementedError('An InferenceAgent cannot be fitted.')
+
+    def draw_action(self, state):
+        return super(InferenceAgent, self).draw_action(np.array(state))
+
+    def episode_start(self):
+        if hasattr(self.policy, 'get_idx'):
+            self.policy.set_idx(np.random.randint(self.approximator.n_heads))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=str, nargs='+',
+                        help='Folders of the saved networks to export.')
+    args = parser.parse_args()
+
+    for p in args.paths:
+        print('Exported: ', export_inference_graph(p))
@@ -127,12 +127,38 @@ class GaussianDQN(Agent):
         """
         q_and_sigma = self.target_approximator.predict(next_state).squeeze()
 
+        return GaussianDQN._compute_max_q(q_and_sigma, absorbing,
+                                          self.update_type,
+                                          self.standard_bound, self.q_max,
+                                          self._epsilon)
+
+    @staticmethod
+    def _compute_max_q(q_and_sigma, absorbing, update_type, standard_bound,
+                       q_max, epsilon):
+        """
+        Args:
+            q_and_sigma (np.ndarray): the (2, n_states, n_actions) means and
+                standard deviations of the target network in the next states;
+            absorbing (np.ndarray): the absorbing flag for the next states;
+            update_type (str): how the distributions of the actions are
+                combined, 'mean', 'weighted' or 'optimistic';
+            standard_bound (float): the number of standard deviations of the
+                optimistic bound;
+            q_max (float): the bound of the optimistic action values;
+            epsilon (float): the factor of the standard deviations in the
+                absorbing states.
+
+        Returns:
+            The mean and standard deviation of the maximum action-value for
+            each next state and the mean probability of exploration.
+
+        """
         q = q_and_sigma[0, :, :]
         sigma = q_and_sigma[1, :, :]
         for i in range(q.shape[0]):
             if absorbing[i]:
                 q[i] *= 0
-                sigma[i] *= self._epsilon
+                sigma[i] *= epsilon
         max_q = np.zeros((q.shape[0]))
         max_sigma = np.zeros((q.shape[0]))
         probs = []
@@ -144,24 +170,24 @@ class GaussianDQN(Agent):
             probs.append(prob)
             prob_explore[i] = 1. - np.max(prob)
 
-        if self.update_type == 'mean':
+        if update_type == 'mean':
             best_actions = np.argmax(q, axis=1)
             for i in range(q.shape[0]):
                 max_q[i] = q[i, best_actions[i]]
                 max_sigma[i] = sigma[i, best_actions[i]]
-        elif self.update_type == 'weighted':
+        elif update_type == 'weighted':
             for i in range(q.shape[0]):  # for each batch
                 means = q[i, :]
                 sigmas = sigma[i, :]
                 prob = probs[i]
                 max_q[i] = np.sum(means * prob)
                 max_sigma[i] = np.sum(sigmas * prob)
-        elif self.update_type == 'optimistic':
+        elif update_type == 'optimistic':
             for i in range(q.shape[0]):  # for each batch
                 means = q[i, :]
                 sigmas = sigma[i, :]
-                bounds = sigmas * self.standard_bound + means
-                bounds = np.clip(bounds, -self.q_max, self.q_max)
+                bounds = sigmas * standard_bound + means
+                bounds = np.clip(bounds, -q_max, q_max)
                 next_index = np.random.choice(np.argwhere(bounds == np.max(bounds)).ravel())
                 max_q[i] = q[i, next_index]
                 max_sigma[i] = sigma[i, next_index]
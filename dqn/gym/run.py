@@ -15,10 +15,14 @@ from bootstrapped_dqn import BootstrappedDoubleDQN, BootstrappedDQN
 from gaussian_dqn import GaussianDQN
 from dqn import DoubleDQN, DQN
 from mushroom.core.core import Core
-from mushroom.utils.dataset import compute_scores
 from mushroom.utils.parameters import LinearDecayParameter, Parameter
 from policy import BootPolicy, WeightedPolicy, WeightedGaussianPolicy, EpsGreedy, UCBPolicy
 from envs.gridworld import GridWorld
+from vec_env import DummyVectorEnv
+from vec_core import VectorCore
+from export import InferenceAgent
+from utils.callbacks import evaluate_scores
+from utils.profiler import Profiler, instrument
 import time
 import tensorflow as tf
 """
@@ -35,8 +39,8 @@ def print_epoch(epoch):
     print('Epoch: ', epoch)
     print('----------------------------------------------------------------')
 
-def get_stats(dataset):
-    score = compute_scores(dataset)
+def get_stats(stats):
+    score = stats[1], stats[2], stats[3], stats[10]
     print('min_reward: %f, max_reward: %f, mean_reward: %f,'
           ' games_completed: %d' % score)
 
@@ -74,39 +78,8 @@ def experiment(args, agent_algorithm):
         epsilon_test = Parameter(value=args.test_exploration_rate)
         pi = BootPolicy(args.n_approximators, epsilon=epsilon_test)
 
-        # Approximator
-        input_shape = mdp.info.observation_space.shape + (1,)
-        input_preprocessor = list()
-        approximator_params = dict(
-            input_shape=input_shape,
-            output_shape=(mdp.info.action_space.n,),
-            n_states=n_states,
-            n_actions=mdp.info.action_space.n,
-            n_features=args.n_features,
-            n_approximators=args.n_approximators,
-            input_preprocessor=input_preprocessor,
-            name='test',
-            load_path=args.load_path,
-            net_type=args.net_type,
-            optimizer={'name': args.optimizer,
-                       'lr': args.learning_rate,
-                       'lr_sigma': args.learning_rate,
-                       'decay': args.decay,
-                       'epsilon': args.epsilon}
-        )
-
-        approximator = SimpleNet
-
-        # Agent
-        algorithm_params = dict(
-            batch_size=0,
-            initial_replay_size=0,
-            max_replay_size=0,
-            clip_reward=False,
-            target_update_frequency=1
-        )
+        # Agent, acting with the frozen inference graph of the saved network
         if args.alg == 'boot':
-            algorithm_params['p_mask'] = args.p_mask
             pi = BootPolicy(args.n_approximators, epsilon=epsilon_test)
         elif args.alg == 'gaussian':
             if args.ucb:
@@ -124,33 +97,15 @@ def experiment(args, agent_algorithm):
         else:
             raise ValueError("Algorithm uknown")
 
-        if args.alg in ['gaussian', 'particle']:
-            algorithm_params['update_type']=args.update_type
-            algorithm_params['delta'] = args.delta
-            algorithm_params['store_prob'] = args.store_prob
-            if args.clip_target:
-                algorithm_params['max_spread'] = args.q_max - args.q_min
-            approximator_params['q_min']= args.q_min
-            approximator_params['q_max']= args.q_max
-            approximator_params['loss']= args.loss
-            approximator_params['init_type'] = args.init_type
-            approximator_params['sigma_weight'] = args.sigma_weight
-        if  args.alg in ['particle', 'boot']:
-            approximator_params['n_approximators'] = args.n_approximators
-            algorithm_params['n_approximators'] = args.n_approximators
-        agent = agent_algorithm(approximator, pi, mdp.info,
-                          approximator_params=approximator_params,
-                          **algorithm_params)
+        agent = InferenceAgent(pi, mdp.info, args.load_path)
 
         # Algorithm
         core_test = Core(agent, mdp)
 
         # Evaluate model
         pi.set_eval(True)
-        dataset = core_test.evaluate(n_steps=args.test_samples,
-                                     render=args.render,
-                                     quiet=args.quiet)
-        get_stats(dataset)
+        get_stats(evaluate_scores(core_test, args.test_samples,
+                                  render=args.render, quiet=args.quiet))
     else:
         # DQN learning run
         print("Learning Run")
@@ -174,21 +129,27 @@ def experiment(args, agent_algorithm):
             max_steps = args.max_steps
 
         # MDP
+        def make_mdp():
+            if args.name not in ['Taxi', 'Gridworld']:
+                return Gym(args.name, args.horizon, args.gamma)
+            elif args.name == 'Taxi':
+                return generate_taxi('../../grid.txt')
+            else:
+                rew_weights = [args.fast_zone, args.slow_zone, args.goal]
+                grid_size = args.grid_size
+                env = GridWorld(gamma=args.gamma, rew_weights=rew_weights,
+                                shape=(grid_size, grid_size), randomized_initial=args.rand_initial,
+                                horizon=args.horizon)
+                return env.generate_mdp()
+
+        mdp = make_mdp()
         if args.name not in ['Taxi', 'Gridworld']:
-            mdp = Gym(args.name, args.horizon, args.gamma)
             n_states = None
             gamma_eval = 1.
         elif args.name =='Taxi':
-            mdp = generate_taxi('../../grid.txt')
             n_states = mdp.info.observation_space.size[0]
             gamma_eval = mdp.info.gamma
         else:
-            rew_weights = [args.fast_zone, args.slow_zone, args.goal]
-            grid_size = args.grid_size
-            env = GridWorld(gamma=args.gamma, rew_weights=rew_weights,
-                            shape=(grid_size, grid_size), randomized_initial=args.rand_initial,
-                            horizon=args.horizon)
-            mdp = env.generate_mdp()
             n_states = mdp.info.observation_space.size[0]
             print(mdp.info.gamma)
             gamma_eval = args.gamma
@@ -242,6 +203,8 @@ def experiment(args, agent_algorithm):
             folder_name=folder_name,
             net_type=args.net_type,
             sigma_weight=args.sigma_weight,
+            summary_interval=args.summary_interval,
+            scalar_interval=args.scalar_interval,
             optimizer={'name': args.optimizer,
                        'lr': args.learning_rate,
                        'lr_sigma': args.learning_rate,
@@ -290,42 +253,28 @@ def experiment(args, agent_algorithm):
         if args.ucb:
             q = agent.approximator
             if args.alg == 'particle':
-                def mu(state):
-                    q_list = q.predict(state).squeeze()
-                    qs = np.array(q_list)
-                    return qs.mean(axis=0)
-
                 quantiles = [i * 1. / (args.n_approximators - 1) for i in range(args.n_approximators)]
                 for p in range(args.n_approximators):
                     if quantiles[p] >= 1 - args.delta:
                         delta_index = p
                         break
 
-                def quantile_func(state):
-                    q_list = q.predict(state).squeeze()
-
-                    qs = np.sort(np.array(q_list), axis=0)
-                    return qs[delta_index,:]
+                def scores_func(state):
+                    qs = np.array(q.predict(state)).squeeze()
+                    return qs.mean(axis=0), np.sort(qs, axis=0)[delta_index, :]
                 print("Setting up ucb policy")
-                pi.set_mu(mu)
-                pi.set_quantile_func(quantile_func)
+                pi.set_scores_func(scores_func)
 
             if args.alg == 'gaussian':
                 standard_bound = norm.ppf(1 - args.delta, loc=0, scale=1)
-                def mu(state):
-                    q_and_sigma = q.predict(state).squeeze()
-                    means = q_and_sigma[0]
-                    return means
-
-                def quantile_func(state):
+                def scores_func(state):
                     q_and_sigma = q.predict(state).squeeze()
                     means = q_and_sigma[0]
                     sigmas = q_and_sigma[1]
-                    return sigmas * standard_bound + means
+                    return means, sigmas * standard_bound + means
 
                 print("Setting up ucb policy")
-                pi.set_mu(mu)
-                pi.set_quantile_func(quantile_func)
+                pi.set_scores_func(scores_func)
         args.count = 100
         if args.plot_qs:
             import matplotlib.pyplot as plt
@@ -365,8 +314,21 @@ def experiment(args, agent_algorithm):
             qs = np.array([np.linspace(-1000,0,10), np.linspace(-2000,-1000,10), np.linspace(-750,-250,10)])
             plot_probs(qs.T)
         # Algorithm
-        core = Core(agent, mdp)
-        core_test = Core(agent, mdp)
+        if args.n_envs > 1:
+            vec_mdp = DummyVectorEnv(
+                [mdp] + [make_mdp() for _ in range(args.n_envs - 1)])
+            core = VectorCore(agent, vec_mdp)
+            core_test = VectorCore(agent, vec_mdp)
+        else:
+            core = Core(agent, mdp)
+            core_test = Core(agent, mdp)
+
+        evaluate = evaluate_scores
+        profiler = None
+        if args.profile:
+            profiler = Profiler()
+            instrument(profiler, core)
+            evaluate = profiler.wrap(evaluate_scores, 'evaluation', 1)
 
         # RUN
 
@@ -384,13 +346,15 @@ def experiment(args, agent_algorithm):
         if hasattr(pi, 'set_eval'):
             pi.set_eval(True)
         pi.set_epsilon(epsilon_test)
-        dataset = core_test.evaluate(n_steps=test_samples,
-                                     render=args.render,
-                                     quiet=args.quiet)
-        scores.append(get_stats(dataset))
+        scores.append(get_stats(evaluate(core_test, test_samples,
+                                         render=args.render,
+                                         quiet=args.quiet)))
         if args.plot_qs:
             pi.set_plotter(plot_probs)
         np.save(folder_name + '/scores_' + str(ts) + '.npy', scores)
+        if profiler is not None:
+            profiler.end_epoch(0)
+            profiler.save(folder_name + '/profile_' + str(ts) + '.json')
         for n_epoch in range(1, max_steps // evaluation_frequency + 1):
             print_epoch(n_epoch)
             print('- Learning:')
@@ -417,11 +381,13 @@ def experiment(args, agent_algorithm):
             pi.set_epsilon(epsilon_test)
             if args.plot_qs:
                 pi.set_plotter(plot_probs)
-            dataset = core_test.evaluate(n_steps=test_samples,
-                                         render=args.render,
-                                         quiet=args.quiet)
-            scores.append(get_stats(dataset))
+            scores.append(get_stats(evaluate(core_test, test_samples,
+                                             render=args.render,
+                                             quiet=args.quiet)))
             np.save(folder_name + '/scores_' + str(ts) + '.npy', scores)
+            if profiler is not None:
+                profiler.end_epoch(n_epoch)
+                profiler.save(folder_name + '/profile_' + str(ts) + '.json')
 
     return scores
 
@@ -556,13 +522,24 @@ if __name__ == '__main__':
     arg_utils.add_argument('--debug', action='store_true',
                            help='Flag specifying whether the script has to be'
                                 'run in debug mode.')
+    arg_utils.add_argument("--summary-interval", type=int, default=1000,
+                           help='Number of train steps between two full '
+                                'TensorBoard summaries (0 to disable).')
+    arg_utils.add_argument("--scalar-interval", type=int, default=100,
+                           help='Number of train steps between two scalar '
+                                'TensorBoard summaries (0 to disable).')
     arg_utils.add_argument('--plot_qs', action='store_true',
                            help='Flag specifying whether the script has to be'
                                 'run in debug mode.')
     arg_utils.add_argument("--device", type=int, default=0,
                            help='Index of the GPU.')
+    arg_utils.add_argument("--n-envs", type=int, default=1,
+                           help='Number of environments stepped together.')
     arg_utils.add_argument("--n_experiments", type=int, default=1,
                            help='Number of experiments to run')
+    arg_utils.add_argument("--profile", action='store_true',
+                           help='Whether to save the time spent in each phase '
+                                'of each epoch.')
 
     args = parser.parse_args()
 
@@ -0,0 +1,162 @@
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+
+import numpy as np
+
+
+_worker = dict()
+
+
+def _init_worker(env_fn, approximator, approximator_params, policy_fn,
+                 epsilon):
+    # The workers run their network on the CPU, leaving the GPU to learning
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    from mushroom.approximators.regressor import Regressor
+
+    np.random.seed()
+
+    params = deepcopy(approximator_params)
+    params['name'] = 'target'
+    params['folder_name'] = None
+    params.pop('load_path', None)
+    q = Regressor(approximator, **params)
+
+    policy = policy_fn()
+    policy.set_q(q)
+    policy.set_epsilon(epsilon)
+    if hasattr(policy, 'set_eval'):
+        policy.set_eval(True)
+
+    _worker['mdp'] = env_fn()
+    _worker['q'] = q
+    _worker['policy'] = policy
+
+
+def _evaluate(weights_path, n_steps):
+    from utils.callbacks import ScoreAccumulator
+
+    mdp = _worker['mdp']
+    policy = _worker['policy']
+
+    weights = np.load(weights_path)
+    _worker['q'].model.set_weights(
+        [weights['arr_%d' % i] for i in range(len(weights.files))])
+
+    def episode_start():
+        if hasattr(policy, 'get_idx'):
+            policy.set_idx(np.random.randint(policy._n_approximators))
+
+        return mdp.reset()
+
+    accumulator = ScoreAccumulator()
+    state = episode_start()
+    episode_steps = 0
+    for _ in range(n_steps):
+        action = policy.draw_action(np.array(state))
+        state, reward, absorbing, _ = mdp.step(action)
+        episode_steps += 1
+        last = not (episode_steps < mdp.info.horizon and not absorbing)
+        accumulator.add(reward, last)
+
+        if last:
+            state = episode_start()
+            episode_steps = 0
+
+    return accumulator
+
+
+class EvaluationResult(object):
+    """
+    Handle of an evaluation running in the pool.
+
+    """
+    def __init__(self, futures, weights_path):
+        self._futures = futures
+        self._weights_path = weights_path
+
+    def done(self):
+        return all(f.done() for f in self._futures)
+
+    def result(self):
+        """
+        Wait for the end of the evaluation.
+
+        Returns:
+            The scores of the complete episodes of all the workers, as
+            returned by ``ScoreAccumulator.get_scores``.
+
+        """
+        accumulator = self._futures[0].result()
+        for f in self._futures[1:]:
+            accumulator.merge(f.result())
+        if os.path.exists(self._weights_path):
+            os.remove(self._weights_path)
+
+        return accumulator.get_scores()
+
+
+class EvaluationPool(object):
+    """
+    Pool of processes evaluating frozen snapshots of the weights of a
+    network. The evaluation steps are split among the workers, each one
+    moving in its own environment, and the evaluation runs in background, so
+    that learning can continue while the previous snapshot is evaluated.
+
+    """
+    def __init__(self, env_fn, approximator, approximator_params, policy_fn,
+                 epsilon, n_workers):
+        """
+        Constructor.
+
+        Args:
+            env_fn (function): picklable function building an environment;
+            approximator (class): the network class of the agent;
+            approximator_params (dict): the parameters of the network;
+            policy_fn (function): picklable function building the policy;
+            epsilon (Parameter): the exploration parameter of the evaluation;
+            n_workers (int): number of worker processes.
+
+        """
+        self._n_workers = n_workers
+        self._folder = tempfile.mkdtemp(prefix='evaluation_')
+        self._n_snapshots = 0
+        self._executor = ProcessPoolExecutor(
+            n_workers, mp_context=mp.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(env_fn, approximator, approximator_params, policy_fn,
+                      epsilon)
+        )
+
+    def submit(self, weights, n_steps):
+        """
+        Start the evaluation of a snapshot of the weights.
+
+        Args:
+            weights (list): the weights of the network, as returned by
+                ``get_weights``;
+            n_steps (int): total number of evaluation steps.
+
+        Returns:
+            The EvaluationResult of the snapshot.
+
+        """
+        path = os.path.join(self._folder,
+                            'weights_%d.npz' % self._n_snapshots)
+        np.savez(path, *weights)
+        self._n_snapshots += 1
+
+        steps = [n_steps // self._n_workers] * self._n_workers
+        for i in range(n_steps % self._n_workers):
+            steps[i] += 1
+        futures = [self._executor.submit(_evaluate, path, n)
+                   for n in steps if n > 0]
+
+        return EvaluationResult(futures, path)
+
+    def shutdown(self):
+        self._executor.shutdown()
+        shutil.rmtree(self._folder, ignore_errors=True)
@@ -129,6 +129,32 @@ class ParticleDQN(Agent):
 
         """
         q = np.array(self.target_approximator.predict(next_state))[0]
+
+        return ParticleDQN._compute_max_q(q, absorbing, self.update_type,
+                                          self.delta_index, self.q_max,
+                                          self.store_prob)
+
+    @staticmethod
+    def _compute_max_q(q, absorbing, update_type, delta_index, q_max,
+                       store_prob=False):
+        """
+        Args:
+            q (np.ndarray): the (n_approximators, n_states, n_actions) action
+                values of the target network in the next states;
+            absorbing (np.ndarray): the absorbing flag for the next states;
+            update_type (str): how the particles of the actions are combined,
+                'mean', 'weighted' or 'optimistic';
+            delta_index (int): index of the particle bounding the action values
+                with the optimistic update;
+            q_max (float): the bound of the optimistic action values;
+            store_prob (bool, False): whether to compute the probability of
+                exploration.
+
+        Returns:
+            The particles of the maximum action-value for each next state and
+            the mean probability of exploration, or 0.
+
+        """
         for i in range(q.shape[1]):
             if absorbing[i]:
 
@@ -137,31 +163,31 @@ class ParticleDQN(Agent):
         max_q = np.zeros((q.shape[1], q.shape[0]))
         prob_explore = np.zeros(q.shape[1])
         
-        if self.update_type == 'mean':
+        if update_type == 'mean':
             best_actions = np.argmax(np.mean(q, axis=0), axis=1)
             for i in range(q.shape[1]):
                 max_q[i, :] = q[:, i, best_actions[i]]
-                if self.store_prob:
+                if store_prob:
                     particles = q[:, i, :]
                     particles = np.sort(particles, axis=0)
                     prob = ParticleDQN._compute_prob_max(particles)
                     prob_explore[i] = (1 - np.max(prob))
-        elif self.update_type == 'weighted':
+        elif update_type == 'weighted':
             for i in range(q.shape[1]): #for each batch
                 particles = q[:, i, :]
                 particles = np.sort(particles, axis=0)
                 prob = ParticleDQN._compute_prob_max(particles)
                 max_q[i, :] = np.dot(particles, prob)
-                if self.store_prob:
+                if store_prob:
                     prob_explore[i] = (1 - np.max(prob))
-        elif self.update_type == 'optimistic':
+        elif update_type == 'optimistic':
             for i in range(q.shape[1]):
                 particles = q[:, i, :]
                 particles = np.sort(particles, axis=0)
                 means = np.mean(particles, axis=0)
-                bounds = means + particles[self.delta_index, :]
-                bounds = np.clip(bounds, -self.q_max, self.q_max)
-                if self.store_prob:
+                bounds = means + particles[delta_index, :]
+                bounds = np.clip(bounds, -q_max, q_max)
+                if store_prob:
 
                     prob = ParticleDQN._compute_prob_max(particles)
                     prob_explore[i] = (1 - np.max(prob))
@@ -171,7 +197,7 @@ class ParticleDQN(Agent):
         else:
             raise ValueError("Update type not supported")
 
-        if self.store_prob:
+        if store_prob:
             return max_q, np.mean(prob_explore)
         return max_q, 0
 
@@ -194,6 +220,28 @@ class ParticleDoubleDQN(ParticleDQN):
     def _next_q(self, next_state, absorbing):
         q = np.array(self.approximator.predict(next_state))[0]
         tq = np.array(self.target_approximator.predict(next_state))[0]
+
+        return ParticleDoubleDQN._compute_double_max_q(q, tq, absorbing,
+                                                       self.store_prob)
+
+    @staticmethod
+    def _compute_double_max_q(q, tq, absorbing, store_prob=False):
+        """
+        Args:
+            q (np.ndarray): the (n_approximators, n_states, n_actions) action
+                values of the online network in the next states, selecting the
+                actions;
+            tq (np.ndarray): the action values of the target network in the
+                next states, evaluating the actions;
+            absorbing (np.ndarray): the absorbing flag for the next states;
+            store_prob (bool, False): whether to compute the probability of
+                exploration.
+
+        Returns:
+            The particles of the maximum action-value for each next state and
+            the mean probability of exploration, or 0.
+
+        """
         for i in range(q.shape[1]):
             if absorbing[i]:
                 tq[:, i, :] *= 1. - absorbing[i]
@@ -206,10 +254,10 @@ class ParticleDoubleDQN(ParticleDQN):
             prob = ParticleDQN._compute_prob_max(particles)
 
             max_q[i, :] = np.dot(tg_particles, prob)
-            if self.store_prob:
+            if store_prob:
                 prob_explore[i] = (1 - np.max(prob))
 
-        if self.store_prob:
+        if store_prob:
             return max_q, np.mean(prob_explore)
         return max_q, 0
 
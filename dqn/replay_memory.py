@@ -1,7 +1,14 @@
 import numpy as np
 
+from utils.masks import pack_masks, unpack_masks
+
 
 class ReplayMemory(object):
+    """
+    Replay memory of the DQN agents. The masks of the transitions are packed
+    as bits in a single array, one bit per model of the ensemble.
+
+    """
     def __init__(self, initial_size, max_size):
         self._initial_size = initial_size
         self._max_size = max_size
@@ -9,6 +16,9 @@ class ReplayMemory(object):
         self.reset()
 
     def add(self, dataset, mask):
+        if self._n_masks is None:
+            self._allocate_masks(np.shape(mask)[1])
+        packed = pack_masks(mask)
         for i in range(len(dataset)):
             self._states[self._idx] = dataset[i][0]
             self._actions[self._idx] = dataset[i][1]
@@ -16,7 +26,7 @@ class ReplayMemory(object):
             self._next_states[self._idx] = dataset[i][3]
             self._absorbing[self._idx] = dataset[i][4]
             self._last[self._idx] = dataset[i][5]
-            self._mask[self._idx] = mask[i]
+            self._mask[self._idx] = packed[i]
 
             self._idx += 1
             if self._idx == self._max_size:
@@ -34,24 +44,19 @@ class ReplayMemory(object):
 
         self._current_sample_idx = stop
 
-        s = list()
-        a = list()
-        r = list()
-        ss = list()
-        ab = list()
-        last = list()
-        mask = list()
-        for i in self._sample_idxs[start:stop]:
-            s.append(np.array(self._states[i]))
-            a.append(self._actions[i])
-            r.append(self._rewards[i])
-            ss.append(np.array(self._next_states[i]))
-            ab.append(self._absorbing[i])
-            last.append(self._last[i])
-            mask.append(self._mask[i])
-
-        return np.array(s), np.array(a), np.array(r), np.array(ss),\
-            np.array(ab), np.array(last), np.array(mask)
+        idxs = self._sample_idxs[start:stop]
+
+        # States are stacked directly in their stored dtype (uint8 frames for
+        # Atari), without intermediate per-sample copies.
+        s = np.stack([np.asarray(self._states[i]) for i in idxs])
+        ss = np.stack([np.asarray(self._next_states[i]) for i in idxs])
+        a = np.array([self._actions[i] for i in idxs])
+        r = np.array([self._rewards[i] for i in idxs])
+        ab = np.array([self._absorbing[i] for i in idxs])
+        last = np.array([self._last[i] for i in idxs])
+        mask = unpack_masks(self._mask[idxs], self._n_masks)
+
+        return s, a, r, ss, ab, last, mask
 
     def reset(self):
         self._idx = 0
@@ -62,13 +67,145 @@ class ReplayMemory(object):
         self._next_states = [None for _ in range(self._max_size)]
         self._absorbing = [None for _ in range(self._max_size)]
         self._last = [None for _ in range(self._max_size)]
-        self._mask = [None for _ in range(self._max_size)]
+        # The array of the masks is allocated at the first addition, when the
+        # number of models is known
+        self._mask = None
+        self._n_masks = None
 
         self._sample_idxs = np.random.choice(self._initial_size,
                                              self._initial_size,
                                              replace=False)
         self._current_sample_idx = 0
 
+    def _allocate_masks(self, n_masks):
+        self._n_masks = n_masks
+        self._mask = np.zeros((self._max_size, (n_masks + 7) // 8),
+                              dtype=np.uint8)
+
+    def get_state(self):
+        """
+        Returns:
+            The content of the replay memory as a dictionary of arrays. When
+            the states are stacks of shared frames (e.g. LazyFrames), each
+            frame is stored once, as a list of frames to be written with
+            ``save_checkpoint``, and the states are stored as the indexes of
+            their frames.
+
+        """
+        n = self.size
+        state = dict(
+            actions=np.array(self._actions[:n]),
+            rewards=np.array(self._rewards[:n]),
+            absorbing=np.array(self._absorbing[:n]),
+            last=np.array(self._last[:n]),
+            packed_mask=self._mask[:n] if n > 0 else np.zeros((0, 0),
+                                                              np.uint8),
+            n_masks=np.array(self._n_masks if n > 0 else 0),
+            counters=np.array([self._idx, self._full,
+                               self._current_sample_idx]),
+            sample_idxs=self._sample_idxs
+        )
+
+        if n > 0 and hasattr(self._states[0], '_frames'):
+            frames = list()
+            frame_idxs = dict()
+
+            def index(s):
+                idxs = list()
+                for f in s._frames:
+                    if id(f) not in frame_idxs:
+                        frame_idxs[id(f)] = len(frames)
+                        frames.append(f)
+                    idxs.append(frame_idxs[id(f)])
+
+                return idxs
+
+            state['state_frames'] = np.array(
+                [index(s) for s in self._states[:n]])
+            state['next_state_frames'] = np.array(
+                [index(s) for s in self._next_states[:n]])
+            state['frames'] = frames
+        else:
+            state['states'] = np.array(self._states[:n])
+            state['next_states'] = np.array(self._next_states[:n])
+
+        return state
+
+    def set_state(self, state, frames_wrapper=None):
+        """
+        Restore the content returned by ``get_state``.
+
+        Args:
+            state (dict): the content of the replay memory;
+            frames_wrapper (class, None): class wrapping the frames of the
+                stacked states (e.g. LazyFrames). Needed only when the states
+                were stored as frames.
+
+        """
+        self.reset()
+
+        n = len(state['actions'])
+        if 'frames' in state:
+            frames = list(state['frames'])
+            states = [frames_wrapper([frames[k] for k in idxs])
+                      for idxs in state['state_frames']]
+            next_states = [frames_wrapper([frames[k] for k in idxs])
+                           for idxs in state['next_state_frames']]
+        else:
+            states = list(state['states'])
+            next_states = list(state['next_states'])
+
+        self._states[:n] = states
+        self._next_states[:n] = next_states
+        self._actions[:n] = list(state['actions'])
+        self._rewards[:n] = list(state['rewards'])
+        self._absorbing[:n] = list(state['absorbing'])
+        self._last[:n] = list(state['last'])
+        if n > 0:
+            if 'packed_mask' in state:
+                self._allocate_masks(int(state['n_masks']))
+                self._mask[:n] = state['packed_mask']
+            else:
+                # Checkpoints saved before the masks were packed
+                mask = np.asarray(state['mask'])
+                self._allocate_masks(mask.shape[1])
+                self._mask[:n] = pack_masks(mask)
+
+        idx, full, current_sample_idx = state['counters']
+        self._idx = int(idx)
+        self._full = bool(full)
+        self._current_sample_idx = int(current_sample_idx)
+        self._sample_idxs = state['sample_idxs']
+
+    @property
+    def nbytes(self):
+        """
+        Returns:
+            The number of bytes of the arrays stored in the replay memory.
+            Frames shared among several states are counted once.
+
+        """
+        seen = set()
+        nbytes = 0
+
+        def count(x):
+            if id(x) not in seen and isinstance(x, np.ndarray):
+                seen.add(id(x))
+
+                return x.nbytes
+
+            return 0
+
+        for s in self._states[:self.size] + self._next_states[:self.size]:
+            for x in getattr(s, '_frames', [s]):
+                nbytes += count(x)
+        for x in self._actions[:self.size]:
+            nbytes += count(x)
+        if self._mask is not None:
+            nbytes += self._mask[:self.size].nbytes
+
+        return nbytes
+
     @property
     def initialized(self):
         """
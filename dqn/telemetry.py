@@ -0,0 +1,91 @@
+import atexit
+import threading
+from queue import Queue, Full
+
+import tensorflow as tf
+
+
+class SummaryWriter(object):
+    """
+    Wrapper of ``tf.summary.FileWriter`` that decides at which training
+    steps the summaries of a network are evaluated and writes them to disk
+    from a background thread, so that the latency of a train step does not
+    depend on the summary I/O. Full summaries (scalars and histograms) are
+    written every ``summary_interval`` steps, cheap scalar-only summaries
+    every ``scalar_interval`` steps; an interval of 0 disables the
+    corresponding summaries.
+
+    """
+    def __init__(self, logdir, graph=None, summary_interval=1000,
+                 scalar_interval=100, max_queue=100):
+        """
+        Constructor.
+
+        Args:
+            logdir (str): directory where the event files are written;
+            graph (tf.Graph, None): graph to be written in the event file;
+            summary_interval (int, 1000): number of train steps between two
+                full summaries;
+            scalar_interval (int, 100): number of train steps between two
+                scalar summaries;
+            max_queue (int, 100): maximum number of summaries waiting to be
+                written. When the queue is full, new summaries are dropped.
+
+        """
+        self._writer = tf.summary.FileWriter(logdir, graph=graph)
+        self._summary_interval = summary_interval
+        self._scalar_interval = scalar_interval
+
+        self._queue = Queue(maxsize=max_queue)
+        self.n_dropped = 0
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        self._closed = False
+
+        atexit.register(self.close)
+
+    def select(self, step, merged, merged_scalars):
+        """
+        Select the summary op to be evaluated at a given train step.
+
+        Args:
+            step (int): the current train step;
+            merged (tf.Tensor): the op with all the summaries;
+            merged_scalars (tf.Tensor): the op with the scalar summaries
+                only.
+
+        Returns:
+            The op to be evaluated, or None if no summary is due.
+
+        """
+        if self._summary_interval > 0 and step % self._summary_interval == 0:
+            return merged
+        if self._scalar_interval > 0 and step % self._scalar_interval == 0:
+            return merged_scalars
+
+        return None
+
+    def add_summary(self, summary, step):
+        try:
+            self._queue.put_nowait((summary, step))
+        except Full:
+            self.n_dropped += 1
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self._queue.put((None, None))
+        self._thread.join()
+        self._writer.close()
+
+    def _run(self):
+        while True:
+            summary, step = self._queue.get()
+            if summary is None:
+                self._writer.flush()
+                break
+            self._writer.add_summary(summary, step)
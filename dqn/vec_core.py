@@ -0,0 +1,150 @@
+import numpy as np
+from tqdm import tqdm
+
+
+class VectorCore(object):
+    """
+    Implements the interaction of an agent with a set of environments stepped
+    together. The actions of all the environments are selected with a single
+    batched prediction, when the policy supports it, and the agent is fitted
+    every ``n_steps_per_fit`` collected samples, as with the standard Core,
+    so that the number of updates per sample does not depend on the number
+    of environments.
+
+    """
+    def __init__(self, agent, vec_env, callbacks=None):
+        """
+        Constructor.
+
+        Args:
+            agent (Agent): the agent moving according to a policy;
+            vec_env (VectorEnv): the environments in which the agent moves;
+            callbacks (list, None): list of callbacks to execute at the end
+                of each fit.
+
+        """
+        self.agent = agent
+        self.mdp = vec_env
+        self.callbacks = callbacks if callbacks is not None else list()
+
+        n_envs = self.mdp.n_envs
+        self._states = [None] * n_envs
+        self._episode_steps = np.zeros(n_envs, dtype=int)
+        self._idxs = [None] * n_envs
+
+    def learn(self, n_steps, n_steps_per_fit, render=False, quiet=False):
+        """
+        Move the agent in the environments and fit the policy.
+
+        Args:
+            n_steps (int): number of samples to collect;
+            n_steps_per_fit (int): number of samples to collect before each
+                fit of the agent;
+            render (bool, False): unused, kept for compatibility with Core;
+            quiet (bool, False): whether to hide the progress bar.
+
+        """
+        dataset = list()
+        for sample in self._run(n_steps, quiet):
+            dataset.append(sample)
+            if len(dataset) == n_steps_per_fit:
+                self.agent.fit(dataset)
+                for c in self.callbacks:
+                    c(dataset=dataset)
+                dataset = list()
+
+    def evaluate(self, n_steps, render=False, quiet=False, accumulator=None):
+        """
+        Move the agent in the environments without fitting the policy.
+
+        Args:
+            n_steps (int): number of samples to collect;
+            render (bool, False): unused, kept for compatibility with Core;
+            quiet (bool, False): whether to hide the progress bar;
+            accumulator (ScoreAccumulator, None): if given, the samples are
+                added to the accumulator, with the environment as stream,
+                instead of being returned.
+
+        Returns:
+            The dataset of the complete episodes of each environment, one
+            environment after the other, or the accumulator.
+
+        """
+        if accumulator is not None:
+            for i, sample in self._run(n_steps, quiet, with_env=True):
+                accumulator.add(sample[2], sample[-1], i)
+
+            return accumulator
+
+        datasets = [list() for _ in range(self.mdp.n_envs)]
+        for i, sample in self._run(n_steps, quiet, with_env=True):
+            datasets[i].append(sample)
+
+        dataset = list()
+        for d in datasets:
+            n_complete = len(d)
+            while n_complete > 0 and not d[n_complete - 1][-1]:
+                n_complete -= 1
+            dataset += d[:n_complete]
+
+        return dataset
+
+    def _run(self, n_steps, quiet, with_env=False):
+        n_envs = self.mdp.n_envs
+        self._reset(list(range(n_envs)))
+
+        n_collected = 0
+        with tqdm(total=n_steps, dynamic_ncols=True, disable=quiet,
+                  leave=False) as pbar:
+            while n_collected < n_steps:
+                actions = self._draw_actions()
+                next_states, rewards, absorbing, _ = self.mdp.step(actions)
+
+                n_new = min(n_envs, n_steps - n_collected)
+                ended = list()
+                for i in range(n_envs):
+                    self._episode_steps[i] += 1
+                    last = not (
+                        self._episode_steps[i] < self.mdp.info.horizon and
+                        not absorbing[i])
+                    if i < n_new:
+                        sample = (self._states[i], actions[i], rewards[i],
+                                  next_states[i], absorbing[i], last)
+                        yield (i, sample) if with_env else sample
+
+                    if last:
+                        ended.append(i)
+                    else:
+                        self._states[i] = next_states[i]
+
+                self._reset(ended)
+
+                n_collected += n_new
+                pbar.update(n_new)
+
+    def _reset(self, idxs):
+        if len(idxs) == 0:
+            return
+
+        states = self.mdp.reset(idxs)
+        for i, state in zip(idxs, states):
+            self._states[i] = state
+            self._episode_steps[i] = 0
+            self.agent.episode_start()
+            if hasattr(self.agent.policy, 'get_idx'):
+                self._idxs[i] = self.agent.policy.get_idx()
+
+    def _draw_actions(self):
+        policy = self.agent.policy
+        if not hasattr(policy, 'draw_action_batch'):
+            return np.array([self.agent.draw_action(s) for s in self._states])
+
+        states = np.array([np.asarray(s) for s in self._states])
+        args = (states, self._idxs) if hasattr(policy, 'get_idx') else \
+            (states,)
+        # The agents keeping their own bookkeeping in draw_action, e.g. the
+        # steps of the episode, do the same in their batched version
+        if hasattr(self.agent, 'draw_action_batch'):
+            return self.agent.draw_action_batch(*args)
+
+        return policy.draw_action_batch(*args)
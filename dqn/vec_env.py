@@ -0,0 +1,240 @@
+import ctypes
+import multiprocessing as mp
+
+import numpy as np
+
+
+class VectorEnv(object):
+    """
+    Interface of a set of environments stepped together. Each environment is
+    reset independently, so that the episodes of the different environments
+    do not need to be synchronized.
+
+    """
+    def reset(self, idxs):
+        """
+        Reset some of the environments.
+
+        Args:
+            idxs (list): indexes of the environments to reset.
+
+        Returns:
+            The list of the initial states of the environments.
+
+        """
+        raise NotImplementedError
+
+    def step(self, actions):
+        """
+        Step all the environments.
+
+        Args:
+            actions (np.ndarray): the action of each environment.
+
+        Returns:
+            The lists of next states, rewards, absorbing flags and info of
+            the environments.
+
+        """
+        raise NotImplementedError
+
+    def call(self, name, *args):
+        """
+        Call a method of all the environments.
+
+        Args:
+            name (str): name of the method;
+            *args: arguments of the method.
+
+        Returns:
+            The list of the values returned by each environment.
+
+        """
+        raise NotImplementedError
+
+    def set_episode_end(self, ends_at_life):
+        self.call('set_episode_end', ends_at_life)
+
+    def stop(self):
+        pass
+
+    @property
+    def n_envs(self):
+        raise NotImplementedError
+
+
+class DummyVectorEnv(VectorEnv):
+    """
+    Set of environments stepped sequentially in the current process. It is
+    suited for cheap environments (e.g. classic control or finite MDPs),
+    where the cost of the inter-process communication would exceed the one
+    of the simulation.
+
+    """
+    def __init__(self, envs):
+        """
+        Constructor.
+
+        Args:
+            envs (list): the environments.
+
+        """
+        self._envs = envs
+        self.info = envs[0].info
+
+    def reset(self, idxs):
+        return [self._envs[i].reset() for i in idxs]
+
+    def step(self, actions):
+        out = [env.step(a) for env, a in zip(self._envs, actions)]
+
+        return [list(x) for x in zip(*out)]
+
+    def call(self, name, *args):
+        return [getattr(env, name)(*args) for env in self._envs]
+
+    def stop(self):
+        for env in self._envs:
+            env.stop()
+
+    @property
+    def n_envs(self):
+        return len(self._envs)
+
+
+def _worker(remote, parent_remote, env_fn, buffer, shape, dtype, idx):
+    parent_remote.close()
+    np.random.seed()
+
+    env = env_fn()
+    obs = np.frombuffer(buffer, dtype=dtype).reshape((-1,) + shape)[idx]
+
+    while True:
+        cmd, data = remote.recv()
+        if cmd == 'step':
+            state, reward, absorbing, info = env.step(data)
+            obs[:] = np.asarray(state)
+            remote.send((reward, absorbing, info))
+        elif cmd == 'reset':
+            obs[:] = np.asarray(env.reset())
+            remote.send(None)
+        elif cmd == 'call':
+            name, args = data
+            remote.send(getattr(env, name)(*args))
+        elif cmd == 'info':
+            remote.send(env.info)
+        elif cmd == 'close':
+            env.stop()
+            remote.close()
+            break
+        else:
+            raise ValueError('Unknown command.')
+
+
+class SubprocVectorEnv(VectorEnv):
+    """
+    Set of environments, each one stepped in its own process. The
+    observations are written by the workers in a shared-memory buffer, so
+    that only rewards, flags and actions go through the pipes.
+
+    When the observations are stacks of frames (e.g. Atari), the stack of
+    each environment is rebuilt in the main process from the newest frame,
+    so that consecutive states share their frames as with the single
+    environment.
+
+    """
+    def __init__(self, env_fns, observation_shape, dtype=np.uint8,
+                 frames_wrapper=None):
+        """
+        Constructor.
+
+        Args:
+            env_fns (list): functions building the environments. They are
+                called in the worker processes;
+            observation_shape (tuple): shape of an observation;
+            dtype (np.dtype, np.uint8): type of an observation;
+            frames_wrapper (class, None): class wrapping the list of frames
+                of a stacked observation, whose last axis is the frame axis
+                (e.g. LazyFrames). If None, the observations are returned as
+                arrays.
+
+        """
+        self._shape = tuple(observation_shape)
+        self._dtype = np.dtype(dtype)
+        self._frames_wrapper = frames_wrapper
+
+        n_envs = len(env_fns)
+        size = n_envs * int(np.prod(self._shape)) * self._dtype.itemsize
+        self._buffer = mp.RawArray(ctypes.c_char, size)
+        self._obs = np.frombuffer(self._buffer, dtype=self._dtype).reshape(
+            (n_envs,) + self._shape)
+        self._frames = [None] * n_envs
+
+        ctx = mp.get_context('fork')
+        self._remotes, work_remotes = zip(
+            *[ctx.Pipe() for _ in range(n_envs)])
+        self._processes = list()
+        for i in range(n_envs):
+            p = ctx.Process(target=_worker,
+                            args=(work_remotes[i], self._remotes[i],
+                                  env_fns[i], self._buffer, self._shape,
+                                  self._dtype, i))
+            p.daemon = True
+            p.start()
+            work_remotes[i].close()
+            self._processes.append(p)
+
+        self._remotes[0].send(('info', None))
+        self.info = self._remotes[0].recv()
+
+    def reset(self, idxs):
+        for i in idxs:
+            self._remotes[i].send(('reset', None))
+        for i in idxs:
+            self._remotes[i].recv()
+
+        states = list()
+        for i in idxs:
+            if self._frames_wrapper is not None:
+                self._frames[i] = [self._obs[i][..., k].copy()
+                                   for k in range(self._shape[-1])]
+            states.append(self._get_state(i))
+
+        return states
+
+    def step(self, actions):
+        for remote, a in zip(self._remotes, actions):
+            remote.send(('step', a))
+        results = [remote.recv() for remote in self._remotes]
+
+        states = list()
+        for i in range(self.n_envs):
+            if self._frames_wrapper is not None:
+                self._frames[i] = self._frames[i][1:] + [
+                    self._obs[i][..., -1].copy()]
+            states.append(self._get_state(i))
+        rewards, absorbing, info = [list(x) for x in zip(*results)]
+
+        return states, rewards, absorbing, info
+
+    def call(self, name, *args):
+        for remote in self._remotes:
+            remote.send(('call', (name, args)))
+
+        return [remote.recv() for remote in self._remotes]
+
+    def stop(self):
+        for remote in self._remotes:
+            remote.send(('close', None))
+        for p in self._processes:
+            p.join()
+
+    @property
+    def n_envs(self):
+        return len(self._remotes)
+
+    def _get_state(self, i):
+        if self._frames_wrapper is not None:
+            return self._frames_wrapper(self._frames[i])
+
+        return self._obs[i].copy()
@@ -0,0 +1,136 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from mushroom.environments.finite_mdp import FiniteMDP
+
+from envs.sparse_mdp import SparseFiniteMDP, SparseTransitions
+
+
+# Version of the cached arrays, to be increased to invalidate all the
+# entries when the format or the semantics of the generators change
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'WQL_MDP_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'wql',
+                                  'mdps'))
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def cache_key(generator, args, kwargs):
+    """
+    Args:
+        generator (function): the function building the MDP;
+        args (list): the positional arguments of the generator;
+        kwargs (dict): the keyword arguments of the generator.
+
+    Returns:
+        The hash identifying the MDP built by the generator with the given
+        arguments. It depends also on the source of the module of the
+        generator and on the content of the arguments that are paths of
+        files (e.g. the grid of the taxi), so that the entries are invalidated
+        when the code or the data of the environment change.
+
+    """
+    files = [_file_hash(a) for a in list(args) + list(kwargs.values())
+             if isinstance(a, str) and os.path.isfile(a)]
+    s = json.dumps(dict(
+        generator=generator.__module__ + '.' + generator.__qualname__,
+        source=_file_hash(inspect.getsourcefile(generator)), files=files,
+        args=list(args), kwargs=kwargs, version=CACHE_VERSION),
+        sort_keys=True, default=str)
+
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
+def cached_mdp(generator, *args, cache_dir=DEFAULT_CACHE_DIR, **kwargs):
+    """
+    Build a finite MDP, loading its transition, reward and initial state
+    arrays from the on-disk cache when the same generator has already been
+    called with the same arguments. The arrays are memory-mapped read-only,
+    so that the workers of a sweep share their pages instead of building and
+    holding their own copies.
+
+    Args:
+        generator (function): the function building the ``FiniteMDP`` or
+            the ``SparseFiniteMDP``;
+        *args: the positional arguments of the generator;
+        cache_dir (str, DEFAULT_CACHE_DIR): the directory of the cache. If
+            None, the MDP is built without the cache;
+        **kwargs: the keyword arguments of the generator.
+
+    Returns:
+        The MDP.
+
+    """
+    if cache_dir is None:
+        return generator(*args, **kwargs)
+
+    path = os.path.join(cache_dir, '%s-%s' % (
+        generator.__name__, cache_key(generator, args, kwargs)[:16]))
+    if not os.path.exists(os.path.join(path, 'info.json')):
+        mdp = generator(*args, **kwargs)
+        assert isinstance(mdp, (FiniteMDP, SparseFiniteMDP))
+        _save(path, mdp)
+
+        return mdp
+
+    with open(os.path.join(path, 'info.json')) as f:
+        info = json.load(f)
+    mu = np.load(os.path.join(path, 'mu.npy'), mmap_mode='r') \
+        if info['mu'] else None
+    if info.get('sparse', False):
+        transitions = SparseTransitions(*[
+            np.load(os.path.join(path, n + '.npy'), mmap_mode='r')
+            for n in ['next_states', 'probs', 'rewards']])
+
+        return SparseFiniteMDP(transitions, mu, info['gamma'],
+                               info['horizon'])
+    p = np.load(os.path.join(path, 'p.npy'), mmap_mode='r')
+    r = np.load(os.path.join(path, 'r.npy'), mmap_mode='r')
+
+    return FiniteMDP(p, r, mu, info['gamma'], info['horizon'])
+
+
+def _save(path, mdp):
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # The entry is written in a temporary directory and renamed, so that the
+    # workers building the same MDP at the same time never read a partial
+    # entry
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path))
+    sparse = isinstance(mdp, SparseFiniteMDP)
+    if sparse:
+        np.save(os.path.join(tmp, 'next_states.npy'), mdp.p.next_states)
+        np.save(os.path.join(tmp, 'probs.npy'), mdp.p.probs)
+        np.save(os.path.join(tmp, 'rewards.npy'), mdp.p.rewards)
+    else:
+        np.save(os.path.join(tmp, 'p.npy'), mdp.p)
+        np.save(os.path.join(tmp, 'r.npy'), mdp.r)
+    if mdp.mu is not None:
+        np.save(os.path.join(tmp, 'mu.npy'), mdp.mu)
+    with open(os.path.join(tmp, 'info.json'), 'w') as f:
+        json.dump(dict(gamma=mdp.info.gamma, horizon=mdp.info.horizon,
+                       mu=mdp.mu is not None, sparse=sparse), f)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another worker saved the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def clear_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Remove all the entries of the cache.
+
+    """
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -5,8 +5,15 @@ from builtins import AttributeError
 from math import floor
 from mushroom.environments.finite_mdp import FiniteMDP
 
-def generate_gridworld(shape=(5,5),horizon=100, gamma=0.99,randomized_initial=False):
-    return GridWorld(shape=shape, horizon=horizon, gamma=gamma, randomized_initial=randomized_initial)
+from envs.sparse_mdp import SparseFiniteMDP, SparseTransitions
+
+def generate_gridworld(shape=(5,5),horizon=100, gamma=0.99,randomized_initial=False, sparse=False):
+    return GridWorld(shape=shape, horizon=horizon, gamma=gamma, randomized_initial=randomized_initial, sparse=sparse)
+
+
+def generate_gridworld_mdp(shape=(5,5),horizon=100, gamma=0.99,randomized_initial=False, sparse=False):
+    return generate_gridworld(shape=shape, horizon=horizon, gamma=gamma,
+                              randomized_initial=randomized_initial, sparse=sparse).generate_mdp()
 
 
 class GridWorld(gym.Env):
@@ -27,6 +34,9 @@ class GridWorld(gym.Env):
         - fail_prob: probability of failing an action
         - goal: goal position (x,y)
         - start: start position (x,y)
+        - sparse: whether to store the transitions as SparseTransitions,
+          with at most 5 next states for each state-action pair, instead of
+          the dense (4, S, S) matrices
     """
 
     metadata = {
@@ -35,7 +45,7 @@ class GridWorld(gym.Env):
     }
 
     def __init__(self, shape=(7, 7), horizon=100, fail_prob=0.1, goal=None, start=None, gamma=0.99,
-                 rew_weights=None, randomized_initial=True, extended_features=False):
+                 rew_weights=None, randomized_initial=True, extended_features=False, sparse=False):
 
         assert shape[0] >= 3 and shape[1] >= 3, "The grid must be at least 3x3"
         self.H = 2 * shape[0] +1 #mirrored grid
@@ -63,9 +73,9 @@ class GridWorld(gym.Env):
         self.viewer = None
         self.action_space = spaces.Discrete(4)
         self.observation_space = spaces.Discrete(self.W * self.H)
-        self.ohe = np.eye(self.W*self.H)
         self.extended_features = extended_features
-        mu, p, r = self.calculate_mdp()
+        self.sparse = sparse
+        mu, p, r = self.calculate_mdp(sparse)
 
         self.mu = mu
         self.p = p
@@ -76,6 +86,8 @@ class GridWorld(gym.Env):
         self.reset()
 
     def generate_mdp(self):
+        if self.sparse:
+            return SparseFiniteMDP(self.p, self.mu, self.gamma, self.horizon)
         return FiniteMDP(self.p.transpose([1,0,2]), self.r.transpose([1,0,2]), self.mu, self.gamma, self.horizon)
 
     def _coupleToInt(self, x, y):
@@ -127,7 +139,9 @@ class GridWorld(gym.Env):
 
     def get_state(self, ohe=False):
         if ohe:
-            return self.ohe[self.state]
+            features = np.zeros(self.n_states)
+            features[self.state] = 1
+            return features
         return self.state
 
     def reset(self, state=None, ohe=False):
@@ -197,7 +211,7 @@ class GridWorld(gym.Env):
 
         print(t)
 
-    def calculate_mdp(self):
+    def calculate_mdp(self, sparse=False):
         n_states = self.W * self.H  # Number of states
         n_actions = 4  # Number of actions
 
@@ -210,29 +224,49 @@ class GridWorld(gym.Env):
             P0 = np.zeros(n_states)
             P0[self.init_state] = 1
 
+        # Compute the reward of reaching each state
+        states = np.arange(n_states)
+        x, y = states // self.H, states % self.H
+        features = np.zeros((n_states, 3))
+        slow = (x > 0) & (x < self.W - 1) & (y > 0) & (y < self.H - 1)
+        features[slow, 1] = -1  # slow_region
+        features[~slow, 0] = -1  # fast region
+        features[self.goal_state] = [0, 0, 1]  # goal state
+        rew = features.dot(self.rew_weights)
+
+        # Compute the next state of each state for each action
+        p = self.fail_prob
+        delta_x = [0, 1, 0, -1]  # Change in x for each action [UP, RIGHT, DOWN, LEFT]
+        delta_y = [1, 0, -1, 0]  # Change in y for each action [UP, RIGHT, DOWN, LEFT]
+        next_states = np.array([self._coupleToInt(np.clip(x + dx, 0, self.W - 1), np.clip(y + dy, 0, self.H - 1))
+                                for dx, dy in zip(delta_x, delta_y)])
+
+        if sparse:
+            # a does not fail with prob. 1-p, then each action a_fail is
+            # taken with prob. p/4
+            ns = np.empty((n_states, n_actions, n_actions + 1), dtype=int)
+            ns[:, :, 0] = next_states.T
+            ns[:, :, 1:] = next_states.T[:, None, :]
+            probs = np.empty(ns.shape)
+            probs[:, :, 0] = 1 - p
+            probs[:, :, 1:] = p / 4
+            # The goal state is terminal -> no transitions
+            probs[self.goal_state] = 0
+            R = rew[ns]
+            R[self.goal_state] = 0  # don't get reward after reaching goal state
+            return P0, SparseTransitions(ns, probs, R), R
+
         # Compute the reward function
         R = np.zeros((n_actions, n_states, n_states))
+        R[:, :, :] = rew
 
         # Compute the transition probability matrix
         P = np.zeros((n_actions, n_states, n_states))
-        p = self.fail_prob
-        delta_x = [0, 1, 0, -1]  # Change in x for each action [UP, RIGHT, DOWN, LEFT]
-        delta_y = [1, 0, -1, 0]  # Change in y for each action [UP, RIGHT, DOWN, LEFT]
-        for s in range(n_states):
-            rew = np.sum(self.get_rew_features(s) * self.rew_weights)
-            R[:, :, s] = rew
-            for a in range(n_actions):
-                x, y = self._intToCouple(s)  # Get the coordinates of s
-                x_new = max(min(x + delta_x[a], self.W - 1), 0)  # Correct next-state for a
-                y_new = max(min(y + delta_y[a], self.H - 1), 0)  # Correct next-state for a
-                s_new = self._coupleToInt(x_new, y_new)
-
-                P[a, s, s_new] += 1 - p  # a does not fail with prob. 1-p
-                # Suppose now a fails and try all other actions
-                for a_fail in range(n_actions):
-                    x_new = max(min(x + delta_x[a_fail], self.W - 1), 0)  # Correct next-state for a_fail
-                    y_new = max(min(y + delta_y[a_fail], self.H - 1), 0)  # Correct next-state for a_fail
-                    P[a, s, self._coupleToInt(x_new, y_new)] += p / 4  # a_fail is taken with prob. p/4
+        for a in range(n_actions):
+            P[a, states, next_states[a]] += 1 - p  # a does not fail with prob. 1-p
+            # Suppose now a fails and try all other actions
+            for a_fail in range(n_actions):
+                P[a, states, next_states[a_fail]] += p / 4  # a_fail is taken with prob. p/4
         # The goal state is terminal -> only self-loop transitions
         P[:, self.goal_state, :] = 0
         #P[:, self.goal_state, self.goal_state] = 1
@@ -1,6 +1,7 @@
 import numpy as np
 from gym.envs.toy_text.discrete import DiscreteEnv
 from gym.envs.registration import register
+from mushroom.environments.finite_mdp import FiniteMDP
 
 
 MAP = [
@@ -17,6 +18,17 @@ MAP = [
     entry_point='envs.knight_quest:KnightQuest',
 )'''
 
+def generate_knight_quest(horizon=10000, gamma=0.99, armor_move_prob=0.5,
+                          armor_collect_prob=0.01):
+    # The absorbing states have no transitions, as the absorbing states of
+    # FiniteMDP
+    env = KnightQuest(armor_move_prob, armor_collect_prob)
+    mu = np.zeros(env.nb_states)
+    for s, p in env.isd:
+        mu[s] += p
+    return FiniteMDP(env.P_mat, env.R_mat, mu, gamma, horizon)
+
+
 class KnightQuest(DiscreteEnv):
     def __init__(self,
                  armor_move_prob=0.5,
@@ -0,0 +1,126 @@
+import numpy as np
+from mushroom.environments import Environment, MDPInfo
+from mushroom.utils import spaces
+
+
+class SparseTransitions(object):
+    """
+    Compact transition model of a finite MDP in which each state-action pair
+    reaches at most ``k`` next states. The next states, their probabilities
+    and the rewards are stored as (S, A, k) arrays, padded with zero
+    probabilities. The same next state can appear more than once in a row,
+    its probability being the sum of the probabilities of its entries. A
+    state with zero probabilities for all the actions is absorbing, as in
+    ``FiniteMDP``.
+
+    """
+    def __init__(self, next_states, probs, rewards):
+        """
+        Constructor.
+
+        Args:
+            next_states (np.ndarray): the (S, A, k) next states;
+            probs (np.ndarray): the (S, A, k) probabilities of the next
+                states;
+            rewards (np.ndarray): the (S, A, k) rewards of the transitions.
+
+        """
+        assert next_states.shape == probs.shape == rewards.shape
+        self.next_states = next_states
+        self.probs = probs
+        self.rewards = rewards
+
+    @property
+    def shape(self):
+        """
+        Returns:
+            The shape (S, A, S) of the equivalent dense transition matrix.
+
+        """
+        n_states, n_actions, _ = self.next_states.shape
+
+        return n_states, n_actions, n_states
+
+    def expected_rewards(self):
+        """
+        Returns:
+            The (S, A) expected rewards of the state-action pairs.
+
+        """
+        return np.sum(self.probs * self.rewards, axis=-1)
+
+    def to_dense(self):
+        """
+        Returns:
+            The dense (S, A, S) transition and reward matrices.
+
+        """
+        s, a, _ = np.indices(self.next_states.shape)
+        p = np.zeros(self.shape)
+        r = np.zeros(self.shape)
+        np.add.at(p, (s, a, self.next_states), self.probs)
+        # Rewards of repeated next states are the same, so they are assigned,
+        # skipping the padding
+        valid = self.probs > 0
+        r[s[valid], a[valid], self.next_states[valid]] = self.rewards[valid]
+
+        return p, r
+
+
+class SparseFiniteMDP(Environment):
+    """
+    Finite MDP with the interface of ``FiniteMDP``, built from a
+    ``SparseTransitions`` model, so that MDPs with many states can be used
+    without the dense (S, A, S) matrices. ``p`` is the transition model and
+    ``r`` its rewards.
+
+    """
+    def __init__(self, transitions, mu, gamma, horizon=np.inf):
+        """
+        Constructor.
+
+        Args:
+            transitions (SparseTransitions): the transition model;
+            mu (np.ndarray): the initial state distribution, if None the
+                initial state is drawn uniformly;
+            gamma (float): the discount factor;
+            horizon (int, np.inf): the horizon.
+
+        """
+        assert mu is None or transitions.shape[0] == mu.size
+
+        self.p = transitions
+        self.r = transitions.rewards
+        self.mu = mu
+
+        n_states, n_actions, _ = transitions.shape
+        observation_space = spaces.Discrete(n_states)
+        action_space = spaces.Discrete(n_actions)
+        mdp_info = MDPInfo(observation_space, action_space, gamma, horizon)
+
+        super(SparseFiniteMDP, self).__init__(mdp_info)
+
+    def reset(self, state=None):
+        if state is None:
+            if self.mu is not None:
+                self._state = np.array(
+                    [np.random.choice(self.mu.size, p=self.mu)])
+            else:
+                self._state = np.array([np.random.choice(self.p.shape[0])])
+        else:
+            self._state = state
+
+        return self._state
+
+    def step(self, action):
+        probs = self.p.probs[self._state[0], action[0]]
+        j = np.random.choice(probs.size, p=probs)
+        next_state = np.array([self.p.next_states[self._state[0], action[0],
+                                                  j]])
+
+        absorbing = not np.any(self.p.probs[next_state[0]])
+        reward = self.p.rewards[self._state[0], action[0], j]
+
+        self._state = next_state
+
+        return self._state, reward, absorbing, {}
@@ -88,3 +88,22 @@ class LogarithmicDecayParameter(Parameter):
         n = np.maximum(self._n_updates[idx], 1)
         lr = 1 - np.e ** (-(1 / (n+1) * (self._C + 2 * np.log(n + 1))))
         return lr
+
+
+def set_count_dtype(parameter, dtype):
+    """
+    Change the type of the table of the number of visits of a parameter,
+    e.g. to store the visits as integers instead of floats. It works with
+    the parameters of mushroom too.
+
+    Args:
+        parameter (Parameter): the parameter;
+        dtype (type): the type of the number of visits.
+
+    Returns:
+        The parameter.
+
+    """
+    parameter._n_updates.table = parameter._n_updates.table.astype(dtype)
+
+    return parameter
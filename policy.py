@@ -1,9 +1,56 @@
 import numpy as np
-import tensorflow as tf
 from mushroom.policy.td_policy import TDPolicy
 from mushroom.utils.parameters import Parameter
 from scipy.stats import norm
 
+
+def predict_heads(approximator, state):
+    """
+    Predict the action values of all the heads of an ensemble approximator
+    in a state, running the approximator only once when possible.
+
+    Args:
+        approximator: the ensemble approximator;
+        state (np.ndarray): the state.
+
+    Returns:
+        The (n_heads, n_actions) array of action values.
+
+    """
+    if hasattr(approximator, 'predict_all'):
+        return approximator.predict_all(state)
+    if isinstance(approximator.model, list):
+        return np.array([q.predict(state) for q in approximator.model])
+
+    return np.array(approximator.predict(state)).squeeze()
+
+
+def predict_heads_batch(approximator, states):
+    """
+    Predict the action values of all the heads of an ensemble network in a
+    batch of states with a single run of the network.
+
+    Args:
+        approximator: the ensemble network;
+        states (np.ndarray): the batch of states.
+
+    Returns:
+        The (n_states, n_heads, n_actions) array of action values.
+
+    """
+    q = np.array(approximator.predict(states))
+
+    return q.reshape(q.shape[-3:]).swapaxes(0, 1)
+
+
+def _random_argmax(values):
+    return np.random.choice(np.argwhere(values == np.max(values)).ravel())
+
+
+def _draw_explore(epsilon, states):
+    return np.array([np.random.uniform() < epsilon(state) for state in states])
+
+
 class EpsGreedy(TDPolicy):
     """
     Epsilon greedy policy.
@@ -52,6 +99,30 @@ class EpsGreedy(TDPolicy):
 
         return np.array([np.random.choice(self._approximator.n_actions)])
 
+    def draw_action_batch(self, states):
+        """
+        Draw an action in each state of a batch, predicting the action values
+        of all the states with a single call of the approximator.
+
+        Args:
+            states (np.ndarray): the batch of states.
+
+        Returns:
+            The (n_states, 1) array of actions.
+
+        """
+        explore = _draw_explore(self._epsilon, states)
+        q = self._approximator.predict(states)
+
+        actions = np.empty((len(states), 1), dtype=int)
+        for i in range(len(states)):
+            if explore[i]:
+                actions[i] = np.random.choice(self._approximator.n_actions)
+            else:
+                actions[i] = _random_argmax(q[i])
+
+        return actions
+
     def set_epsilon(self, epsilon):
         """
         Setter.
@@ -95,12 +166,7 @@ class BootPolicy(TDPolicy):
     def draw_action(self, state):
         if not np.random.uniform() < self._epsilon(state):
             if self._evaluation:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for q in self._approximator.model:
-                        q_list.append(q.predict(state))
-                else:
-                    q_list = self._approximator.predict(state).squeeze()
+                q_list = predict_heads(self._approximator, state)
 
                 max_as, count = np.unique(np.argmax(q_list, axis=1),
                                           return_counts=True)
@@ -121,6 +187,38 @@ class BootPolicy(TDPolicy):
         else:
             return np.array([np.random.choice(self._approximator.n_actions)])
 
+    def draw_action_batch(self, states, idxs=None):
+        """
+        Draw an action in each state of a batch, predicting the action values
+        of all the states with a single call of the approximator.
+
+        Args:
+            states (np.ndarray): the batch of states;
+            idxs (np.ndarray, None): the head followed in each state during
+                learning. If None, the current head is used for all states.
+
+        Returns:
+            The (n_states, 1) array of actions.
+
+        """
+        explore = _draw_explore(self._epsilon, states)
+        qs = predict_heads_batch(self._approximator, states)
+        if idxs is None:
+            idxs = [self._idx] * len(states)
+
+        actions = np.empty((len(states), 1), dtype=int)
+        for i in range(len(states)):
+            if explore[i]:
+                actions[i] = np.random.choice(self._approximator.n_actions)
+            elif self._evaluation:
+                max_as, count = np.unique(np.argmax(qs[i], axis=1),
+                                          return_counts=True)
+                actions[i] = max_as[_random_argmax(count)]
+            else:
+                actions[i] = _random_argmax(qs[i, idxs[i]])
+
+        return actions
+
     def set_epsilon(self, epsilon):
         self._epsilon = epsilon
 
@@ -130,6 +228,9 @@ class BootPolicy(TDPolicy):
     def set_idx(self, idx):
         self._idx = idx
 
+    def get_idx(self):
+        return self._idx
+
     def update_epsilon(self, state):
         self._epsilon(state)
 
@@ -160,12 +261,7 @@ class WeightedPolicy(TDPolicy):
     def draw_action(self, state):
         if not np.random.uniform() < self._epsilon(state):
             if self._evaluation:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for q in self._approximator.model:
-                        q_list.append(q.predict(state))
-                else:
-                    q_list = self._approximator.predict(state).squeeze()
+                q_list = predict_heads(self._approximator, state)
 
                 '''prob = WeightedPolicy._compute_prob_max(q_list)
                 print(q_list)
@@ -177,19 +273,11 @@ class WeightedPolicy(TDPolicy):
                     self.plotter(np.array(q_list))
                 return max_a
             else:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for i in range(self._n_approximators):
-                        q_list.append(self._approximator.predict(state, idx=i))
-                else:
-                    q_list = self._approximator.predict(state).squeeze()
-
-                qs = np.array(q_list)
+                qs = np.array(predict_heads(self._approximator, state))
 
-                samples = np.ones(self._approximator.n_actions)
-                for a in range(self._approximator.n_actions):
-                    idx = np.random.randint(self._n_approximators)
-                    samples[a] = qs[idx, a]
+                idx = np.random.randint(self._n_approximators,
+                                        size=self._approximator.n_actions)
+                samples = qs[idx, np.arange(self._approximator.n_actions)]
 
                 max_a = np.array([np.random.choice(np.argwhere(samples == np.max(samples)).ravel())])
                 if self.plotter is not None:
@@ -197,7 +285,35 @@ class WeightedPolicy(TDPolicy):
                 return max_a
         else:
             return np.array([np.random.choice(self._approximator.n_actions)])
-            
+
+    def draw_action_batch(self, states):
+        """
+        Draw an action in each state of a batch, predicting the action values
+        of all the states with a single call of the approximator.
+
+        Args:
+            states (np.ndarray): the batch of states.
+
+        Returns:
+            The (n_states, 1) array of actions.
+
+        """
+        explore = _draw_explore(self._epsilon, states)
+        qs = predict_heads_batch(self._approximator, states)
+        n_actions = self._approximator.n_actions
+
+        actions = np.empty((len(states), 1), dtype=int)
+        for i in range(len(states)):
+            if explore[i]:
+                actions[i] = np.random.choice(n_actions)
+            elif self._evaluation:
+                actions[i] = _random_argmax(np.mean(qs[i], axis=0))
+            else:
+                idx = np.random.randint(self._n_approximators, size=n_actions)
+                actions[i] = _random_argmax(qs[i, idx, np.arange(n_actions)])
+
+        return actions
+
     def set_epsilon(self, epsilon):
         self._epsilon = epsilon
 
@@ -212,9 +328,11 @@ class WeightedPolicy(TDPolicy):
 
 
 class UCBPolicy(TDPolicy):
-    def __init__(self, quantile_func=None, mu=None, delta=0.1, q_max=100):
+    def __init__(self, quantile_func=None, mu=None, delta=0.1, q_max=100,
+                 scores_func=None):
 
         super(UCBPolicy, self).__init__()
+        self.scores_func = scores_func
         if quantile_func is None:
             self.quantile_func = lambda _: 0
         else:
@@ -232,12 +350,17 @@ class UCBPolicy(TDPolicy):
         self.plotter = plotter
 
     def draw_action(self, state):
-        means = self.mu(state)
+        if self.scores_func is not None:
+            means, bounds = self.scores_func(state)
+        else:
+            means = self.mu(state)
+            bounds = None
         if self._evaluation:
             if self.plotter is not None:
                 self.plotter(np.array(self._approximator.predict(state)))
             return np.array([np.random.choice(np.argwhere(means == np.max(means)).ravel())])
-        bounds = self.quantile_func(state)
+        if bounds is None:
+            bounds = self.quantile_func(state)
         #qs = means + bounds
         #bounds = np.clip(bounds, -self.q_max, self.q_max)
         a = np.array([np.random.choice(np.argwhere(bounds == np.max(bounds)).ravel())])
@@ -264,6 +387,18 @@ class UCBPolicy(TDPolicy):
     def set_mu(self, mu):
         self.mu = mu
 
+    def set_scores_func(self, scores_func):
+        """
+        Setter.
+
+        Args:
+            scores_func (function): function returning both the means and the
+                upper bounds of the action values in a state, computed from a
+                single prediction of the approximator. When set, it is used in
+                place of ``mu`` and ``quantile_func``.
+
+        """
+        self.scores_func = scores_func
 
 
 class VPIPolicy(TDPolicy):
@@ -290,31 +425,31 @@ class VPIPolicy(TDPolicy):
         equal = np.sum(q == mu)
         return disqual + equal / 2.
 
+    @staticmethod
+    def _compute_vpi(qs, a1, mu1, mu2):
+        count = np.sum(qs > mu1, axis=0) + np.sum(qs == mu1, axis=0) / 2.
+        gain = np.sum(np.clip(qs - mu1, 0, np.inf), axis=0)
+        count[a1] = VPIPolicy._count_with_ties(qs[:, a1], mu2, '<')
+        gain[a1] = np.sum(np.clip(mu2 - qs[:, a1], 0, np.inf))
+
+        vpi = np.zeros(qs.shape[1])
+        valid = count != 0
+        vpi[valid] = gain[valid] / count[valid]
+
+        return vpi
 
     def draw_action(self, state):
         if not np.random.uniform() < self._epsilon(state):
             if self._evaluation:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for q in self._approximator.model:
-                        q_list.append(q.predict(state))
-                else:
-                    q_list = self._approximator.predict(state).squeeze()
+                q_list = predict_heads(self._approximator, state)
 
                 mean_q = np.mean(q_list, axis=0)
                 max_a = np.array([np.random.choice(np.argwhere(mean_q == np.max(mean_q)).ravel())])
                 return max_a
             else:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for i in range(self._n_approximators):
-                        q_list.append(self._approximator.predict(state, idx=i))
-                else:
-                    q_list = self._approximator.predict(state).squeeze()
-
-                qs = np.array(q_list)
+                qs = np.array(predict_heads(self._approximator, state))
 
-                mean_q = np.mean(q_list, axis=0)
+                mean_q = np.mean(qs, axis=0)
                 best2_idx = np.argpartition(-mean_q, 1)[:2]
                 a1, a2 = best2_idx if mean_q[best2_idx[0]] >= mean_q[best2_idx[1]] else np.flip(best2_idx)
                 mu1, mu2 = mean_q[a1], mean_q[a2]
@@ -322,20 +457,7 @@ class VPIPolicy(TDPolicy):
                 assert mu1 >= mu2
                 assert mu1 >= max(mean_q)
 
-                vpi = np.zeros(self._approximator.n_actions)
-                for a in range(self._approximator.n_actions):
-                    if a == a1:
-                        count = VPIPolicy._count_with_ties(qs[:, a], mu2, '<')
-                        if count == 0:
-                            vpi[a] = 0
-                        else:
-                            vpi[a] = 1. / count * np.sum(np.clip(mu2 - qs[:, a], 0, np.inf))
-                    else:
-                        count = VPIPolicy._count_with_ties(qs[:, a], mu1, '>')
-                        if count == 0:
-                            vpi[a] = 0
-                        else:
-                            vpi[a] = 1. / count * np.sum(np.clip(qs[:, a] - mu1, 0, np.inf))
+                vpi = VPIPolicy._compute_vpi(qs, a1, mu1, mu2)
 
                 score = mean_q + vpi
 
@@ -411,15 +533,8 @@ class WeightedGaussianPolicy(TDPolicy):
     def draw_action(self, state):
         if not np.random.uniform() < self._epsilon(state):
             if self._evaluation:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for q in self._approximator.model:
-                        q_list.append(q.predict(state))
-                    qs = np.array(q_list)
-                    means = qs[0, :]
-                else:
-                    q_and_sigma = self._approximator.predict(state)
-                    means = q_and_sigma[0, :, :].squeeze()
+                qs = predict_heads(self._approximator, state)
+                means = qs[0]
                 try:
                     max_a = np.array([np.random.choice(np.argwhere(means == np.max(means)).ravel())])
                 except:
@@ -429,24 +544,11 @@ class WeightedGaussianPolicy(TDPolicy):
                     return np.array([0])
                 return max_a
             else:
-                if isinstance(self._approximator.model, list):
-                    q_list = list()
-                    for q in self._approximator.model:
-                        q_list.append(q.predict(state))
-                    qs = np.array(q_list)
-                    means = qs[0, :]
-                    sigmas = qs[1, :]
-                else:
-                    q_and_sigma = self._approximator.predict(state)
-                    means = q_and_sigma[0, :, :].squeeze()
-                    sigmas = q_and_sigma[1, :, :].squeeze()
-
-
-                samples = np.ones(self._approximator.n_actions)
-                for a in range(self._approximator.n_actions):
-                    mean = means[a]
-                    sigma = sigmas[a]
-                    samples[a] = np.random.normal(loc=mean, scale=sigma+1e-15)
+                qs = predict_heads(self._approximator, state)
+                means = qs[0]
+                sigmas = qs[1]
+
+                samples = np.random.normal(loc=means, scale=sigmas + 1e-15)
                 try:
                     max_a = np.array([np.random.choice(np.argwhere(samples == np.max(samples)).ravel())])
                 except:
@@ -460,87 +562,54 @@ class WeightedGaussianPolicy(TDPolicy):
         else:
             return np.array([np.random.choice(self._approximator.n_actions)])
 
-    def set_epsilon(self, epsilon):
-        self._epsilon = epsilon
-
-    def set_eval(self, eval):
-        self._evaluation = eval
-
-    def set_idx(self, idx):
-        pass
+    def draw_action_batch(self, states):
+        """
+        Draw an action in each state of a batch, predicting the means and
+        standard deviations of all the states with a single call of the
+        approximator.
 
-    def update_epsilon(self, state):
-        self._epsilon(state)
+        Args:
+            states (np.ndarray): the batch of states.
 
+        Returns:
+            The (n_states, 1) array of actions.
 
-class DeterministicPolicy:
-    def __init__(self, input_shape, output_size, layers, bias=0):
-        #super(UCBPolicy, self).__init__()
-        self._evaluation = False
-        self.plotter = None
-        config = tf.ConfigProto()
-        config.gpu_options.allow_growth = True
-        self._session = tf.Session(config=config)
-        self._name = '_pi'
-        with tf.variable_scope(None, default_name=self._name):
-            self._scope_name = tf.get_default_graph().get_name_scope() + '/'
-            with tf.variable_scope('State'):
-                self._x = tf.placeholder(tf.float32,
-                                         shape=[None] + list(
-                                             input_shape),
-                                         name='input')
-            layer = self._x
-            for l in layers:
-                layer = tf.layers.dense(
-                    layer, l,
-                    activation=tf.nn.relu,
-                    kernel_initializer=tf.glorot_uniform_initializer()
-                )
-            self._action = tf.layers.dense(
-                layer,
-                output_size,
-                kernel_initializer=tf.glorot_uniform_initializer(),
-                bias_initializer=tf.constant_initializer(bias),
-                name='q'
-            )
-
-
-            initializer = tf.variables_initializer(
-                tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES,
-                                  scope=self._scope_name))
-
-        self._session.run(initializer)
-
-    def predict(self, s):
-        return np.array([self._session.run(self._action, feed_dict={self._x: s})])
-
-    def update(self, s, approximator, delta=0.9):
-        actions = self.predict(s)
-
-
-    def set_plotter(self, plotter):
-        self.plotter = plotter
+        """
+        explore = _draw_explore(self._epsilon, states)
+        qs = predict_heads_batch(self._approximator, states)
+
+        actions = np.empty((len(states), 1), dtype=int)
+        for i in range(len(states)):
+            means, sigmas = qs[i, 0], qs[i, 1]
+            if explore[i]:
+                actions[i] = np.random.choice(self._approximator.n_actions)
+            elif self._evaluation:
+                actions[i] = _random_argmax(means)
+            else:
+                actions[i] = _random_argmax(
+                    np.random.normal(loc=means, scale=sigmas + 1e-15))
 
-    def draw_action(self, state):
-        a = self.predict(state)
-        if self.plotter is not None:
-            self.plotter(a)
-        return a
+        return actions
 
     def set_epsilon(self, epsilon):
-        pass
+        self._epsilon = epsilon
 
     def set_eval(self, eval):
-        pass
+        self._evaluation = eval
 
     def set_idx(self, idx):
         pass
 
     def update_epsilon(self, state):
-        pass
+        self._epsilon(state)
 
-    def set_quantile_func(self, quantile_func):
-        pass
 
-    def set_mu(self, mu):
-        pass
\ No newline at end of file
+def __getattr__(name):
+    # The TensorFlow policies are imported only when requested, so that the
+    # tabular experiments do not import TensorFlow
+    if name == 'DeterministicPolicy':
+        from deterministic_policy import DeterministicPolicy
+
+        return DeterministicPolicy
+
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
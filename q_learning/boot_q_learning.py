@@ -3,22 +3,37 @@ from copy import deepcopy
 import numpy as np
 
 from mushroom.algorithms.value import TD
-from mushroom.utils.table import EnsembleTable
+
+from utils.batch import random_argmax
+from utils.masks import MaskStream
+from utils.table import DoubleEnsembleTable, SparseEnsembleTable, \
+    StackedEnsembleTable
 
 
 class Bootstrapped(TD):
     def __init__(self, policy, mdp_info, learning_rate, n_approximators=10,
-                 mu=0., sigma=1., p=2 / 3., cross_update=False):
+                 mu=0., sigma=1., p=2 / 3., cross_update=False, sparse=False,
+                 dtype=np.float64):
         self._n_approximators = n_approximators
         self._mu = mu
         self._sigma = sigma
         self._p = p
         self._cross_update = cross_update
-        self._mask = np.random.binomial(1, self._p, self._n_approximators)
-        self.Q = EnsembleTable(self._n_approximators, mdp_info.size)
-        for i in range(len(self.Q.model)):
-            self.Q.model[i].table = np.random.randn(
-                *self.Q[i].shape) * self._sigma + self._mu
+        self._masks = MaskStream(self._n_approximators, self._p)
+        self._mask = self._masks.next()
+        if sparse:
+            # The random initial values of a state are drawn at its first
+            # access
+            self.Q = SparseEnsembleTable(
+                self._n_approximators, mdp_info.size,
+                init_fun=lambda n, m: np.random.randn(n, m) * self._sigma +
+                self._mu, dtype=dtype)
+        else:
+            self.Q = StackedEnsembleTable(self._n_approximators, mdp_info.size,
+                                          dtype=dtype)
+            for i in range(len(self.Q.model)):
+                self.Q.model[i].table[:] = np.random.randn(
+                    *self.Q[i].shape) * self._sigma + self._mu
 
         super(Bootstrapped, self).__init__(self.Q, policy, mdp_info,
                                            learning_rate)
@@ -36,40 +51,53 @@ class Bootstrapped(TD):
 
 class BootstrappedQLearning(Bootstrapped):
     def _update(self, state, action, reward, next_state, absorbing):
-        q_current = np.array([x[state, action] for x in self.Q.model])
-
-        for i in np.argwhere(self._mask).ravel():
+        models = np.flatnonzero(self._mask)
+        # The row of the state is accessed first, as with one model at a
+        # time, and taken again after the next state, since the access to a
+        # new row of a sparse table can move the others
+        self.Q.predict_all(state)
+        if absorbing:
+            q_next = 0.
+        else:
             if self._cross_update:
-                idx = np.random.randint(self._n_approximators)
+                idx = np.random.randint(self._n_approximators,
+                                        size=len(models))
             else:
-                idx = i
-
-            q_next = np.max(self.Q[idx][next_state]) if not absorbing else 0.
-            self.Q.model[i][
-                state, action] = q_current[i] + self.alpha[i](state, action) * (
-                reward + self.mdp_info.gamma * q_next - q_current[i])
+                idx = models
+            q_next = np.max(self.Q.predict_all(next_state)[idx], axis=1)
+        alpha = np.array([self.alpha[i](state, action) for i in models])
+
+        q = self.Q.predict_all(state)
+        a = int(np.ravel(action)[0])
+        q_current = q[models, a]
+        if self._cross_update and not absorbing and \
+                int(np.ravel(next_state)[0]) == int(np.ravel(state)[0]):
+            # On a self-loop a model can bootstrap from one updated before it
+            # in the same step, so the models are updated one at a time
+            for k, i in enumerate(models):
+                q[i, a] = q_current[k] + alpha[k] * (
+                    reward + self.mdp_info.gamma * np.max(q[idx[k]]) -
+                    q_current[k])
+        else:
+            q[models, a] = q_current + alpha * (
+                reward + self.mdp_info.gamma * q_next - q_current)
 
-        self._mask = np.random.binomial(1, self._p, self._n_approximators)
+        self._mask = self._masks.next()
 
 
 class BootstrappedDoubleQLearning(Bootstrapped):
     def __init__(self, policy, mdp_info, learning_rate, n_approximators=10,
-                 mu=0., sigma=1., p=1., cross_update=False):
+                 mu=0., sigma=1., p=1., cross_update=False, dtype=np.float64):
         super(BootstrappedDoubleQLearning, self).__init__(
             policy, mdp_info, learning_rate, n_approximators, mu, sigma, p,
-            cross_update
+            cross_update, dtype=dtype
         )
 
-        self.Qs = [EnsembleTable(n_approximators, mdp_info.size),
-                   EnsembleTable(n_approximators, mdp_info.size)]
-
-        for i in range(len(self.Qs[0])):
-            self.Qs[0][i].table = np.random.randn(
-                *self.Qs[0][i].shape) * self._sigma + self._mu
-
-        for i in range(len(self.Qs[1])):
-            self.Qs[1][i].table = self.Qs[0][i].table.copy()
-            self.Q[i].table = self.Qs[0][i].table.copy()
+        self.Qs = DoubleEnsembleTable(self.Q)
+        self.Qs.table[0] = np.random.randn(
+            *self.Qs.table[0].shape) * self._sigma + self._mu
+        self.Qs.table[1] = self.Qs.table[0]
+        self.Qs.update_mean()
 
         self.alpha = [deepcopy(self.alpha), deepcopy(self.alpha)]
 
@@ -79,31 +107,38 @@ class BootstrappedDoubleQLearning(Bootstrapped):
         else:
             i_q = 1
 
-        q_current = np.array([x[state, action] for x in self.Qs[i_q]])
+        models = np.flatnonzero(self._mask)
+        a = int(np.ravel(action)[0])
+        q_current = self.Qs[i_q].predict_all(state)[models, a]
+        alpha = np.array([self.alpha[i_q][i](state, action) for i in models])
         if not absorbing:
-            for i in np.argwhere(self._mask).ravel():
-                if self._cross_update:
-                    idx = np.random.randint(self._n_approximators)
-                else:
-                    idx = i
-
-                q_ss = self.Qs[i_q].predict(next_state, idx=idx)
-                max_q = np.max(q_ss)
-                a_n = np.array(
-                    [np.random.choice(np.argwhere(q_ss == max_q).ravel())])
-                q_next = self.Qs[1-i_q].predict(next_state, a_n, idx=idx)
-                self.Qs[i_q][i][state, action] = q_current[i] + self.alpha[i_q][i](
-                    state, action) * (
-                        reward + self.mdp_info.gamma * q_next - q_current[i])
-                self._update_Q(state, action, idx=i)
+            if self._cross_update:
+                idx = np.random.randint(self._n_approximators,
+                                        size=len(models))
+            else:
+                idx = models
+
+            q_ss = self.Qs[i_q].predict_all(next_state)
+            q_ss_2 = self.Qs[1 - i_q].predict_all(next_state)
+            if self._cross_update and \
+                    int(np.ravel(next_state)[0]) == int(np.ravel(state)[0]):
+                # On a self-loop a model can bootstrap from one updated before
+                # it in the same step, so the models are updated one at a
+                # time, with the same draws of random_argmax
+                u = np.random.uniform(size=(len(models), q_ss.shape[1]))
+                for k, i in enumerate(models):
+                    ties = q_ss[idx[k]] == np.max(q_ss[idx[k]])
+                    a_n = np.argmax((1 + u[k]) * ties)
+                    self.Qs.update(i_q, state, action, q_current[k] + alpha[k] * (
+                        reward + self.mdp_info.gamma * q_ss_2[idx[k], a_n] -
+                        q_current[k]), i)
+            else:
+                a_n = random_argmax(q_ss[idx])
+                q_next = q_ss_2[idx, a_n]
+                self.Qs.update(i_q, state, action, q_current + alpha * (
+                    reward + self.mdp_info.gamma * q_next - q_current), models)
         else:
-            for i in np.argwhere(self._mask).ravel():
-                self.Qs[i_q][i][state, action] = q_current[i] + self.alpha[i_q][i](
-                    state, action) * (reward - q_current[i])
-                self._update_Q(state, action, idx=i)
-
-        self._mask = np.random.binomial(1, self._p, self._n_approximators)
+            self.Qs.update(i_q, state, action,
+                           q_current + alpha * (reward - q_current), models)
 
-    def _update_Q(self, state, action, idx):
-        self.Q[idx][state, action] = np.mean(
-            [q[idx][state, action] for q in self.Qs])
+        self._mask = self._masks.next()
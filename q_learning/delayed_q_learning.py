@@ -1,7 +1,8 @@
 import numpy as np
 from copy import deepcopy
 from mushroom.algorithms.value import TD
-from mushroom.utils.table import EnsembleTable, Table
+from mushroom.utils.dataset import parse_dataset
+from mushroom.utils.table import Table
 
 class DelayedQLearning(TD):
     """
@@ -23,55 +24,192 @@ class DelayedQLearning(TD):
         self.nS = S
         self.nA = A
         self.epsilon = delayed_epsilon
-        self.U = Table(mdp_info.size)
-        self.l = Table(mdp_info.size)
-        #self.t = Table(mdp_info.size)
-        self.b = Table(mdp_info.size)
-        self.LEARN = Table(mdp_info.size, initial_value=1)
+        # Accumulated targets, number of accumulated targets, step of the
+        # first accumulated target and learn flags of the state-action pairs
+        self.U = np.zeros(mdp_info.size)
+        self.l = np.zeros(mdp_info.size, dtype=int)
+        self.b = np.zeros(mdp_info.size, dtype=int)
+        self.LEARN = np.ones(mdp_info.size, dtype=bool)
         self.last_t = 0
         self.update_count = 0
-        policy = np.zeros((self.nS, self.nA))
-        for s in range(self.nS):
-            qs = self.Q[s, :]
-            actions = np.argwhere(qs == np.max(qs)).ravel()
-            n = len(actions)
-            for a in actions:
-                policy[s, a] = 1. / n
-        self.policy_matrix = policy
+        self.policy_matrix = np.zeros((self.nS, self.nA))
+        self._update_policy(np.arange(self.nS))
+        # Sizes of the replays of the blocks of transitions
+        self._window = 1024
+        self._n_sequential = 128
+        self._n_sequential_left = 0
+
+    def _update_policy(self, states):
+        #Update policy matrix NOT PART OF DELAYED!!
+        qs = self.Q.table[states]
+        best = qs == qs.max(axis=-1, keepdims=True)
+        self.policy_matrix[states] = best / best.sum(axis=-1, keepdims=True)
+
+    def fit(self, dataset):
+        if len(dataset) == 1:
+            super().fit(dataset)
+        else:
+            state, action, reward, next_state, absorbing, _ = \
+                parse_dataset(dataset)
+            self._update_block(state.ravel().astype(int),
+                               action.ravel().astype(int), reward,
+                               next_state.ravel().astype(int),
+                               absorbing.astype(bool))
 
     def _update(self, state, action, reward, next_state, absorbing):
+        s, a = int(state[0]), int(action[0])
         self.update_count += 1
-        if self.b[state, action] <= self.last_t:
-            self.LEARN[state, action] = 1
+        if self.b[s, a] <= self.last_t:
+            self.LEARN[s, a] = True
 
-        if self.LEARN[state, action] == 1:
-            if self.l[state, action] == 0:
-                self.b[state, action] = self.update_count
+        if self.LEARN[s, a]:
+            if self.l[s, a] == 0:
+                self.b[s, a] = self.update_count
 
-            self.U[state, action] += reward + (self.mdp_info.gamma * np.max(self.Q[next_state, :])
-                                               if not absorbing else 0)
-            self.l[state, action] += 1
+            self.U[s, a] += reward + (self.mdp_info.gamma * self.Q.table[
+                int(next_state[0])].max() if not absorbing else 0)
+            self.l[s, a] += 1
 
-            if self.l[state, action] == self.m:
-                if self.Q[state, action] - (self.U[state, action] / self.m) >= 2 * self.epsilon:
+            if self.l[s, a] == self.m:
+                if self.Q.table[s, a] - (self.U[s, a] / self.m) >= 2 * self.epsilon:
 
-                    self.Q[state, action] = (self.U[state, action] / self.m) + self.epsilon
+                    self.Q.table[s, a] = (self.U[s, a] / self.m) + self.epsilon
                     self.last_t = self.update_count
-                    #Update policy matrix NOT PART OF DELAYED!!
-                    qs = self.Q[state, :]
-                    actions = np.argwhere(qs == np.max(qs)).ravel()
-                    n = len(actions)
-                    for a in range(self.mdp_info.size[-1]):
-                        if a in actions:
-                            self.policy_matrix[state, a] = 1. / n
-                        else:
-                            self.policy_matrix[state, a] = 0
-
-                elif self.b[state, action] > self.last_t:
-                    self.LEARN[state, action] = 0
-
-                self.U[state, action] = 0
-                self.l[state, action] = 0
+                    self._update_policy(s)
+
+                elif self.b[s, a] > self.last_t:
+                    self.LEARN[s, a] = False
+
+                self.U[s, a] = 0
+                self.l[s, a] = 0
+
+    def _update_block(self, state, action, reward, next_state, absorbing):
+        # The action values and last_t change only with the successful
+        # attempted updates, so the transitions are replayed in windows up
+        # to the first successful attempt, sized after the distance between
+        # the last successes. When they are too close, the transitions are
+        # replayed one at a time, for longer and longer stretches
+        start = 0
+        while start < len(state):
+            if self._n_sequential_left > 0:
+                stop = min(start + self._n_sequential_left, len(state))
+                for i in range(start, stop):
+                    self._update(state[i:i + 1], action[i:i + 1], reward[i],
+                                 next_state[i:i + 1], absorbing[i])
+                self._n_sequential_left -= stop - start
+                start = stop
+                continue
+
+            stop = min(start + self._window, len(state))
+            n = self._update_window(state[start:stop], action[start:stop],
+                                    reward[start:stop], next_state[start:stop],
+                                    absorbing[start:stop])
+            if n == stop - start:
+                self._window = min(2 * self._window, 1024)
+                self._n_sequential = 128
+            elif n < 64:
+                self._window = 64
+                self._n_sequential_left = self._n_sequential
+                self._n_sequential = min(2 * self._n_sequential, 4096)
+            else:
+                self._window = n
+            start += n
+
+    def _update_window(self, state, action, reward, next_state, absorbing):
+        # Replay the transitions with the action values and last_t fixed, up
+        # to the first successful attempted update included. Returns the
+        # number of transitions replayed
+        n = len(state)
+        steps = self.update_count + 1 + np.arange(n)
+        targets = reward + np.where(absorbing, 0, self.mdp_info.gamma *
+                                    np.max(self.Q.table[next_state], axis=1))
+
+        # Visits of each pair, in the order of the block
+        keys = state * self.nA + action
+        order = np.argsort(keys, kind='stable')
+        first = np.r_[True, keys[order][1:] != keys[order][:-1]]
+        starts = np.flatnonzero(first)
+        group = np.cumsum(first) - 1
+        visit = np.arange(n) - starts[group]
+        n_visits = np.diff(np.r_[starts, n])
+        s, a = state[order][starts], action[order][starts]
+
+        def visit_idx(k):
+            return order[starts + np.minimum(k, n_visits - 1)]
+
+        q = self.Q.table[s, a]
+        l0, U0, b0 = self.l[s, a], self.U[s, a], self.b[s, a]
+        learn = self.LEARN[s, a] | (b0 <= self.last_t)
+        b1 = np.where(l0 == 0, steps[visit_idx(0)], b0)
+        # The first attempt ends the current accumulation and the second one
+        # the next, after which the pair stops learning until the next
+        # successful attempt. With a non integer m, l never equals m
+        if self.m == int(self.m):
+            k1 = int(self.m) - l0 - 1
+            k2 = k1 + int(self.m)
+        else:
+            k1 = np.full(len(starts), n)
+            k2 = k1 + n
+
+        # Accumulated targets, summed in the same order as in _update
+        second = visit > k1[group]
+        valid = visit <= k2[group]
+        row = (2 * group + second)[valid]
+        col = np.where(second, visit - k1[group] - 1, visit)[valid] + 1
+        sums = np.zeros((2 * len(starts), np.max(col) + 1))
+        sums[0::2, 0] = U0
+        sums[row, col] = targets[order][valid]
+        sums = np.cumsum(sums, axis=1)
+
+        def accumulated(k, acc):
+            return sums[2 * np.arange(len(starts)) + acc,
+                        np.clip(k + 1, 0, sums.shape[1] - 1)]
+
+        U1 = accumulated(k1, 0)
+        U2 = accumulated(k2 - k1 - 1, 1)
+        attempt1 = learn & (n_visits > k1)
+        success1 = attempt1 & (q - (U1 / self.m) >= 2 * self.epsilon)
+        fail1 = attempt1 & ~success1
+        attempt2 = fail1 & (b1 <= self.last_t) & (n_visits > k2)
+        success2 = attempt2 & (q - (U2 / self.m) >= 2 * self.epsilon)
+
+        success_idx = np.where(success1, visit_idx(k1),
+                               np.where(success2, visit_idx(k2), n))
+        i = np.argmin(success_idx)
+        n_replayed = min(success_idx[i] + 1, n)
+
+        # State of the pairs after their replayed visits
+        replayed = np.bincount(group, weights=order < n_replayed,
+                               minlength=len(starts)).astype(int)
+        update = learn & (replayed > 0)
+        in_first = update & (replayed <= k1)
+        started2 = update & fail1 & (b1 <= self.last_t) & (replayed > k1 + 1)
+        in_second = started2 & (replayed <= k2)
+        stop = update & fail1 & ((b1 > self.last_t) |
+                                 (replayed > k2) & ~success2)
+
+        idx = s[update], a[update]
+        self.LEARN[idx] = True
+        self.b[idx] = b1[update]
+        self.l[idx] = 0
+        self.U[idx] = 0
+        self.LEARN[s[stop], a[stop]] = False
+        self.b[s[started2], a[started2]] = steps[visit_idx(k1 + 1)][started2]
+        idx = s[in_first], a[in_first]
+        self.l[idx] = (l0 + replayed)[in_first]
+        self.U[idx] = accumulated(replayed - 1, 0)[in_first]
+        idx = s[in_second], a[in_second]
+        self.l[idx] = (replayed - k1 - 1)[in_second]
+        self.U[idx] = accumulated(replayed - k1 - 2, 1)[in_second]
+
+        self.update_count += n_replayed
+        if success_idx[i] < n:
+            U = U1[i] if success1[i] else U2[i]
+            self.Q.table[s[i], a[i]] = (U / self.m) + self.epsilon
+            self.last_t = self.update_count
+            self._update_policy(s[i])
+
+        return n_replayed
 
     def draw_action(self, state):
 
@@ -2,12 +2,16 @@
 import numpy as np
 from copy import deepcopy
 from mushroom.algorithms.value import TD
-from mushroom.utils.table import EnsembleTable
+
+from utils.batch import learning_rates, random_argmax, visit_rounds
+from utils.table import DoubleEnsembleTable, SparseEnsembleTable, \
+    StackedEnsembleTable
 
 
 class Particle(TD):
     def __init__(self, policy, mdp_info, learning_rate, n_approximators=10, update_mode='deterministic',
-                 update_type='weighted', q_min=0, q_max=1, init_values=None, delta =0.1):
+                 update_type='weighted', q_min=0, q_max=1, init_values=None, delta =0.1, sparse=False,
+                 dtype=np.float64):
         self._n_approximators = n_approximators
         self._update_mode = update_mode
         self._update_type = update_type
@@ -18,11 +22,16 @@ class Particle(TD):
                 self.delta_index = p
                 break
 
-        self.Q = EnsembleTable(self._n_approximators, mdp_info.size)
         if init_values is None:
             init_values = np.linspace(q_min, q_max, n_approximators)
-        for i in range(len(self.Q.model)):
-            self.Q.model[i].table = np.tile([init_values[i]], self.Q[i].shape)
+        if sparse:
+            self.Q = SparseEnsembleTable(self._n_approximators, mdp_info.size,
+                                         init_values=init_values, dtype=dtype)
+        else:
+            self.Q = StackedEnsembleTable(self._n_approximators, mdp_info.size,
+                                          dtype=dtype)
+            for i in range(len(self.Q.model)):
+                self.Q.model[i].table[:] = np.tile([init_values[i]], self.Q[i].shape)
 
         super(Particle, self).__init__(self.Q, policy, mdp_info,
                                            learning_rate)
@@ -43,19 +52,91 @@ class ParticleQLearning(Particle):
         prob = prob.astype(np.float32)
         return prob / np.sum(prob)
 
+    @staticmethod
+    def _compute_prob_max_batch(q_next_all):
+        # Same as _compute_prob_max for the (n_approximators, n_samples,
+        # n_actions) action values of a batch of next states
+        q_array = q_next_all.transpose(1, 2, 0)
+        score = (q_array[:, :, :, None, None] >= q_array[:, None, None]).astype(int)
+        prob = score.sum(axis=4).prod(axis=3).sum(axis=2)
+        prob = prob.astype(np.float32)
+        return prob / np.sum(prob, axis=1, keepdims=True)
+
     @staticmethod
     def _compute_max_distribution(q_list):
-        q_array = np.array(q_list).T
-        n_actions, n_approximators = q_array.shape
-        q_array_flat = np.sort(q_array.ravel())
-        cdf = (q_array_flat >= q_array[:, :, None]).sum(axis=1).prod(axis=0) / (n_approximators ** n_actions)
-        pdf = np.diff(cdf)
-        valid_indexes = np.argwhere(pdf != 0).ravel()
-        pdf = np.concatenate(([cdf[0]], pdf[valid_indexes]))
-        values = np.append(q_array_flat[valid_indexes], q_array_flat[-1])
+        q_array = np.array(q_list)
+        n_approximators, n_actions = q_array.shape
+        order = np.argsort(q_array.ravel(), kind='stable')
+        values = q_array.ravel()[order]
+        # The CDF of the maximum is the product of the CDFs of the actions,
+        # whose counts are accumulated along the sorted values, up to the
+        # last of the tied values
+        counts = np.cumsum(np.eye(n_actions)[order % n_actions], axis=0)
+        last = np.searchsorted(values, values, side='right') - 1
+        cdf = np.prod(counts[last] / n_approximators, axis=1)
+        pdf = cdf.copy()
+        pdf[1:] -= cdf[:-1]
 
         return values, pdf
 
+    @staticmethod
+    def _project_distribution(values, pdf, n_approximators):
+        # Each particle is the mean of the distribution in one of the
+        # n_approximators intervals of equal probability, i.e. the
+        # difference of the integral of the quantile function at its bounds
+        cdf = np.concatenate(([0.], np.cumsum(pdf)))
+        integral = np.concatenate(([0.], np.cumsum(pdf * values)))
+        bounds = np.arange(n_approximators + 1) / n_approximators
+        j = np.minimum(np.searchsorted(cdf[1:], bounds), len(values) - 1)
+        integral = integral[j] + values[j] * (bounds - cdf[j])
+
+        return n_approximators * (integral[1:] - integral[:-1])
+
+    def fit(self, dataset):
+        # Blocks of transitions are split in rounds of consecutive
+        # transitions that do not read the values updated in the round, whose
+        # updates are vectorized (the projections of the distributional
+        # update are computed one at a time)
+        if len(dataset) == 1 or not self._batch_supported():
+            for sample in dataset:
+                super(ParticleQLearning, self).fit([sample])
+        else:
+            for block in visit_rounds(dataset, self.mdp_info.size[-1]):
+                self._update_batch(*block)
+
+    def _batch_supported(self):
+        return isinstance(self.Q, StackedEnsembleTable) and \
+            self._update_mode == 'deterministic' and \
+            self._update_type in ['mean', 'weighted', 'optimistic',
+                                  'distributional']
+
+    def _update_batch(self, state, action, reward, next_state, absorbing):
+        q_current = self.Q.table[:, state, action]
+        alpha = np.array([learning_rates(self.alpha[i], state, action)
+                          for i in range(self._n_approximators)])
+
+        q_next = np.zeros_like(q_current)
+        valid = ~absorbing
+        q_next_all = self.Q.table[:, next_state[valid]]
+        if self._update_type == 'weighted':
+            prob = ParticleQLearning._compute_prob_max_batch(q_next_all)
+            q_next[:, valid] = np.sum(q_next_all * prob, axis=2)
+        elif self._update_type == 'distributional':
+            for i in range(q_next_all.shape[1]):
+                values, pdf = ParticleQLearning._compute_max_distribution(q_next_all[:, i])
+                q_next[:, np.flatnonzero(valid)[i]] = ParticleQLearning._project_distribution(
+                    values, pdf, self._n_approximators)
+        else:
+            scores = np.mean(q_next_all, axis=0)
+            if self._update_type == 'optimistic':
+                scores = scores + q_next_all[self.delta_index]
+            next_index = random_argmax(scores)
+            q_next[:, valid] = q_next_all[:, np.arange(len(next_index)), next_index]
+
+        self.Q.table[:, state, action] = np.where(
+            absorbing, q_current + alpha * (reward - q_current),
+            q_current + alpha * (reward + self.mdp_info.gamma * q_next - q_current))
+
     def _update(self, state, action, reward, next_state, absorbing):
         q_current = np.array([x[state, action] for x in self.Q.model])
         if absorbing:
@@ -70,35 +151,8 @@ class ParticleQLearning(Particle):
                     next_index = np.array([np.random.choice(np.argwhere(q_next_mean == np.max(q_next_mean)).ravel())])
                     q_next = q_next_all[:, next_index]
                 elif self._update_type == 'distributional':
-                    sorted_q_next, pdf = ParticleQLearning._compute_max_distribution(q_next_all)
-
-                    cum_sum = 0.
-                    residual_pdf = 0.
-                    start = 0
-                    q_next = []
-                    for i in range(len(pdf)):
-                        cum_sum += pdf[i]
-
-                        if cum_sum >= 1. / self._n_approximators:
-                            if start > 0:
-                                initial_correction = residual_pdf * sorted_q_next[start-1]
-                            else:
-                                initial_correction = 0.
-                            residual_pdf = cum_sum - 1. / self._n_approximators
-                            final_correction = (pdf[i] - residual_pdf) * sorted_q_next[i]
-                            q = np.sum(pdf[start:i] * sorted_q_next[start:i]) + initial_correction + final_correction
-                            q *= self._n_approximators
-                            q_next.append(q)
-                            while residual_pdf >= 1. / self._n_approximators:
-                                q_next.append(sorted_q_next[i])
-                                residual_pdf -= 1. / self._n_approximators
-                            cum_sum = residual_pdf
-                            start = i + 1
-
-                    if cum_sum > 0:
-                        q_next.append(sorted_q_next[-1])
-
-                    q_next = np.array(q_next)
+                    values, pdf = ParticleQLearning._compute_max_distribution(q_next_all)
+                    q_next = ParticleQLearning._project_distribution(values, pdf, self._n_approximators)
                 elif self._update_type == 'weighted':
                     prob = ParticleQLearning._compute_prob_max(q_next_all)
                     q_next = np.sum(q_next_all * prob, axis=1)
@@ -130,21 +184,16 @@ class ParticleQLearning(Particle):
 
 class ParticleDoubleQLearning(Particle):
     def __init__(self, policy, mdp_info, learning_rate, n_approximators=10, update_mode='deterministic',
-                 update_type='weighted', q_min=0, q_max=1):
+                 update_type='weighted', q_min=0, q_max=1, dtype=np.float64):
         super(ParticleDoubleQLearning, self).__init__(
             policy, mdp_info, learning_rate, n_approximators, update_mode,
-                 update_type,  q_min, q_max
+                 update_type,  q_min, q_max, dtype=dtype
         )
 
-        self.Qs = [EnsembleTable(n_approximators, mdp_info.size),
-                   EnsembleTable(n_approximators, mdp_info.size)]
+        self.Qs = DoubleEnsembleTable(self.Q)
         init_values = np.linspace(q_min, q_max, n_approximators)
-        for i in range(len(self.Qs[0])):
-            self.Qs[0][i].table = np.tile([init_values[i]], self.Q[i].shape)
-
-        for i in range(len(self.Qs[1])):
-            self.Qs[1][i].table = self.Qs[0][i].table.copy()
-            self.Q[i].table = self.Qs[0][i].table.copy()
+        self.Qs.table[:] = init_values[:, None, None]
+        self.Qs.update_mean()
 
         self.alpha = [deepcopy(self.alpha), deepcopy(self.alpha)]
 
@@ -154,19 +203,19 @@ class ParticleDoubleQLearning(Particle):
         else:
             i_q = 1
 
-        q_current = np.array([x[state, action] for x in self.Qs[i_q]])
+        a = int(np.ravel(action)[0])
+        q_current = self.Qs[i_q].predict_all(state)[:, a]
         if absorbing:
-            for i in range(self._n_approximators):
-                self.Qs[i_q][i][state, action] = q_current[i] + self.alpha[i_q][i](state, action) * (
-                        reward - q_current[i])
-                self._update_Q(state, action, idx=i)
+            alpha = np.array([self.alpha[i_q][i](state, action)
+                              for i in range(self._n_approximators)])
+            q = q_current + alpha * (reward - q_current)
         else:
-            q_next_all = np.array([x[next_state] for x in self.Qs[i_q]])
-            q_next_all_2=np.array([x[next_state] for x in self.Qs[1-i_q]])
+            q_next_all = self.Qs[i_q].predict_all(next_state)
+            q_next_all_2 = self.Qs[1 - i_q].predict_all(next_state)
             if self._update_mode == 'deterministic':
                 if self._update_type == 'mean':
                     q_next_mean = np.mean(q_next_all, axis=0)
-                    next_index = np.array([np.random.choice(np.argwhere(q_next_mean == np.max(q_next_mean)).ravel())])
+                    next_index = np.random.choice(np.argwhere(q_next_mean == np.max(q_next_mean)).ravel())
                     q_next = q_next_all_2[:, next_index]
                 elif self._update_type == 'weighted':
                     prob = ParticleQLearning._compute_prob_max(q_next_all)
@@ -176,11 +225,8 @@ class ParticleDoubleQLearning(Particle):
             else:
                 raise NotImplementedError()
 
-            for i in range(self._n_approximators):
-                self.Qs[i_q][i][state, action] = q_current[i] + self.alpha[i_q][i](state, action) * (
-                        reward + self.mdp_info.gamma * q_next[i] - q_current[i])
-                self._update_Q(state, action, idx=i)
+            alpha = np.array([self.alpha[i_q][i](state, action)
+                              for i in range(self._n_approximators)])
+            q = q_current + alpha * (reward + self.mdp_info.gamma * q_next - q_current)
 
-    def _update_Q(self, state, action, idx):
-        self.Q[idx][state, action] = np.mean(
-            [q[idx][state, action] for q in self.Qs])
+        self.Qs.update(i_q, state, action, q)
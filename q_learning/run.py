@@ -1,41 +1,47 @@
 import sys
 import os
 import argparse
+import inspect
 import numpy as np
 import warnings
 import time
 import random
-from joblib import Parallel, delayed
+from functools import partial
 from distutils.util import strtobool
 from scipy.stats import norm
 from mushroom.core import Core
 from mushroom.environments.generators.taxi import generate_taxi
-from mushroom.environments.gym_env import Gym
-from mushroom.utils.callbacks import CollectDataset
 from mushroom.utils.dataset import parse_dataset
 from mushroom.utils.parameters import ExponentialDecayParameter, Parameter
 from mushroom.policy.td_policy import EpsGreedy, Boltzmann
 from mushroom.algorithms.value.td import QLearning, DoubleQLearning
 from mushroom.utils.table import Table
+sys.path.append('..')
 from boot_q_learning import BootstrappedQLearning,  BootstrappedDoubleQLearning
 from particle_q_learning import ParticleQLearning, ParticleDoubleQLearning
 from wq_learning import GaussianQLearning, GaussianDoubleQLearning
 from delayed_q_learning import DelayedQLearning
-sys.path.append('..')
-from policy import BootPolicy, WeightedPolicy, VPIPolicy, WeightedGaussianPolicy, UCBPolicy
-from parameter import LogarithmicDecayParameter
+from policy import BootPolicy, WeightedPolicy, VPIPolicy, WeightedGaussianPolicy, UCBPolicy, predict_heads
+from parameter import LogarithmicDecayParameter, set_count_dtype
 from r_max.r_max import RMaxAgent
 from mbie.mbie import MBIE_EB
-from envs.knight_quest import KnightQuest
-from envs.gridworld import generate_gridworld
+from value_iteration.value_iteration import evaluate_policy as evaluate_mdp_policy
+from envs.knight_quest import generate_knight_quest
+from envs.gridworld import generate_gridworld_mdp
 from envs.chain import generate_chain
 from envs.loop import generate_loop
 from envs.river_swim import generate_river
 from envs.six_arms import generate_arms
 from envs.three_arms import generate_arms as generate_three_arms
-import envs.knight_quest
-from gym.envs.registration import register
-from utils.callbacks import CollectQs, CollectVs
+from envs.cache import DEFAULT_CACHE_DIR, cached_mdp
+from utils.callbacks import CollectQs, CollectVs, ScoreAccumulator, \
+    evaluate_scores
+from utils.seeds import set_global_seeds
+from utils.scheduler import SweepScheduler, save_group_results, save_task_result
+from utils.result_store import ResultStore, load_scores
+from utils.profiler import Profiler, instrument
+from utils.checkpoint import get_rng_state, get_state, load_checkpoint,\
+    save_checkpoint, set_rng_state, set_state
 
 policy_dict = {'eps-greedy': EpsGreedy,
                'boltzmann': Boltzmann,
@@ -45,46 +51,6 @@ policy_dict = {'eps-greedy': EpsGreedy,
                'weighted-gaussian': WeightedGaussianPolicy}
 
 
-def set_global_seeds(i):
-    try:
-        import tensorflow as tf
-    except ImportError:
-        pass
-    else:
-        tf.set_random_seed(i)
-    np.random.seed(i)
-    random.seed(i)
-
-
-def compute_scores(dataset, gamma):
-    scores = list()
-    disc_scores = list()
-    lens = list()
-
-    score = 0.
-    disc_score = 0.
-    episode_steps = 0
-    n_episodes = 0
-    for i in range(len(dataset)):
-        score += dataset[i][2]
-        disc_score += dataset[i][2] * gamma ** episode_steps
-        episode_steps += 1
-        if dataset[i][-1]:
-            scores.append(score)
-            disc_scores.append(disc_score)
-            lens.append(episode_steps)
-            score = 0.
-            disc_score = 0.
-            episode_steps = 0
-            n_episodes += 1
-
-    if len(scores) > 0:
-        return len(dataset), np.min(scores), np.max(scores), np.mean(scores), np.std(scores),  \
-               np.min(disc_scores), np.max(disc_scores), np.mean(disc_scores), \
-               np.std(disc_scores), np.mean(lens), n_episodes
-    else:
-        return len(dataset), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-
 class TheoreticalParameter(Parameter):
 
     def __init__(self, a=1.1, b=2, decay_exp=1., min_value=None, size=(1,)):
@@ -112,58 +78,56 @@ class BetaParameter(Parameter):
 def experiment(algorithm, name, update_mode, update_type, policy, n_approximators, q_max, q_min,
                lr_exp, R, log_lr, r_max_m, delayed_m, delayed_epsilon, delta, debug, double,
                regret_test, a, b, mbie_C, value_iterations, tolerance, file_name, out_dir,
-               collect_qs,  seed):
+               collect_qs,  seed, checkpoint_prefix=None, checkpoint_frequency=0,
+               resume=False, store_path=None, config=None, qs_stride=1,
+               qs_dtype='float32', qs_deltas=False, profile=False,
+               mdp_cache_dir=None, sparse_table=False, precision='float64',
+               n_steps_per_fit=1):
     set_global_seeds(seed)
     print('Using seed %s' % seed)
     # MDP
+    # The generated MDPs are loaded from the cache, if enabled
+    make_mdp = partial(cached_mdp, cache_dir=mdp_cache_dir)
     if name == 'Taxi':
-        mdp = generate_taxi('../grid.txt', horizon=5000, gamma=0.99)
+        mdp = make_mdp(generate_taxi, '../grid.txt', horizon=5000, gamma=0.99)
         max_steps = 500000
         evaluation_frequency = 5000
         test_samples = 5000
     elif name == 'Chain':
-        mdp = generate_chain(horizon=100, gamma=0.99)
+        mdp = make_mdp(generate_chain, horizon=100, gamma=0.99)
         max_steps = 100000
         evaluation_frequency = 1000
         test_samples = 1000
     elif name == 'Gridworld':
-        mdp = generate_gridworld(horizon=100, gamma=0.99)
+        mdp = make_mdp(generate_gridworld_mdp, horizon=100, gamma=0.99)
         max_steps = 500000
         evaluation_frequency = 5000
         test_samples = 1000
     elif name == 'Loop':
-        mdp = generate_loop(horizon=100, gamma=0.99)
+        mdp = make_mdp(generate_loop, horizon=100, gamma=0.99)
         max_steps = 100000
         evaluation_frequency = 1000
         test_samples = 1000
     elif name == 'RiverSwim':
-        mdp = generate_river(horizon=100, gamma=0.99)
+        mdp = make_mdp(generate_river, horizon=100, gamma=0.99)
         max_steps = 100000
         evaluation_frequency = 1000
         test_samples = 1000
         mbie_C = 0.4
     elif name == 'SixArms':
-        mdp = generate_arms(horizon=100, gamma=0.99)
+        mdp = make_mdp(generate_arms, horizon=100, gamma=0.99)
         max_steps = 100000
         evaluation_frequency = 1000
         test_samples = 1000
         mbie_C = 0.8
     elif name == 'ThreeArms':
         horizon = 100
-        mdp = generate_three_arms(horizon=horizon, gamma=0.99)
+        mdp = make_mdp(generate_three_arms, horizon=horizon, gamma=0.99)
         max_steps = 100000
         evaluation_frequency = 1000
         test_samples = 1000
     elif name == 'KnightQuest':
-        mdp = None
-        try:
-            mdp = Gym('KnightQuest-v0', gamma=0.99, horizon=10000)
-        except:
-            register(
-                id='KnightQuest-v0',
-                entry_point='envs.knight_quest:KnightQuest',
-            )
-            mdp = Gym('KnightQuest-v0', gamma=0.99, horizon=10000)
+        mdp = make_mdp(generate_knight_quest, horizon=10000, gamma=0.99)
         max_steps = 100000
         evaluation_frequency = 1000
         test_samples = 1000
@@ -175,6 +139,12 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
     # Agent
     learning_rate = ExponentialDecayParameter(value=1., decay_exp=lr_exp,
                                               size=mdp.info.size)
+    # With reduced precision, the action values are stored with the given
+    # type and the visits of the learning rates as integers. The regret
+    # evaluation is always computed in float64
+    dtype = np.dtype(precision)
+    if dtype != np.float64:
+        set_count_dtype(learning_rate, np.int32)
     algorithm_params = dict(learning_rate=learning_rate)
     if regret_test:
 
@@ -211,11 +181,12 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         algorithm_params = dict(n_approximators=n_approximators,
                                 mu=(q_max + q_min) / 2,
                                 sigma=(q_max - q_min)/2,
+                                dtype=dtype,
                                 **algorithm_params)
         if double:
             agent = BootstrappedDoubleQLearning(pi, mdp.info, **algorithm_params)
         else:
-            agent = BootstrappedQLearning(pi, mdp.info, **algorithm_params)
+            agent = BootstrappedQLearning(pi, mdp.info, sparse=sparse_table, **algorithm_params)
         epsilon_train = Parameter(0)
     elif algorithm == 'particle-ql':
         if policy not in ['weighted', 'ucb']:
@@ -231,11 +202,12 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
                                 q_max=q_max,
                                 q_min=q_min,
                                 delta=delta,
+                                dtype=dtype,
                                 **algorithm_params)
         if double:
             agent = ParticleDoubleQLearning(pi, mdp.info, **algorithm_params)
         else:
-            agent = ParticleQLearning(pi, mdp.info, **algorithm_params)
+            agent = ParticleQLearning(pi, mdp.info, sparse=sparse_table, **algorithm_params)
 
         epsilon_train = Parameter(0)
     elif algorithm == 'r-max':
@@ -283,19 +255,7 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
                 print("S:{}".format(S))
                 print("A:{}".format(A))
                 input()
-            def evaluate_policy(P, R, policy):
-
-                P_pi = np.zeros((S, S))
-                R_pi = np.zeros(S)
-
-                for s in range(S):
-                    for s1 in range(S):
-                        P_pi[s,s1] = np.sum(policy[s, :] * P[s, :, s1])
-                    R_pi[s] = np.sum(policy[s, :] * np.sum(P[s, :, :] * R[s, :, :], axis=-1))
-                I = np.diag(np.ones(S))
-                V = np.linalg.solve(I - gamma * P_pi, R_pi)
-
-                return V
+            evaluate_policy = partial(evaluate_mdp_policy, gamma=gamma)
         algorithm_params = dict(
             R=R,
             m=theoretic_m,
@@ -331,6 +291,8 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         if log_lr:
             sigma_lr = LogarithmicDecayParameter(value=1., C=C,
                                              size=mdp.info.size)
+            if dtype != np.float64:
+                set_count_dtype(sigma_lr, np.int32)
         init_values = (q_0, sigma_0)
         if regret_test:
             sigma_lr = None
@@ -361,20 +323,7 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
                                     sigma_1_learning_rate=learning_rate_sigma1)
 
             sigma_lr = BetaParameter(c=c, d=d, size=mdp.info.size)
-            def evaluate_policy(P, R, policy):
-
-                P_pi = np.zeros((S, S))
-                R_pi = np.zeros(S)
-
-                for s in range(S):
-                    for s1 in range(S):
-                        P_pi[s,s1] = np.sum(policy[s, :] * P[s, :, s1])
-
-                    R_pi[s] = np.sum(policy[s, :] * np.sum(P[s, :, :] * R[s, :, :],axis=-1))
-                I = np.diag(np.ones(S))
-
-                V = np.linalg.solve(I - gamma * P_pi, R_pi)
-                return V
+            evaluate_policy = partial(evaluate_mdp_policy, gamma=gamma)
             if debug:
                 print("Delta:{}".format(delta))
                 print("R:{}".format(R))
@@ -405,7 +354,7 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         if double and not regret_test:
             agent = GaussianDoubleQLearning(pi, mdp.info, **algorithm_params)
         else:
-            agent = GaussianQLearning(pi, mdp.info, **algorithm_params)
+            agent = GaussianQLearning(pi, mdp.info, sparse=sparse_table, dtype=dtype, **algorithm_params)
         if regret_test:
             if debug:
                 freq = 10
@@ -428,45 +377,83 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         if policy == 'ucb':
             q = agent.approximator
             standard_bound = norm.ppf(1 - delta, loc=0, scale=1)
-            def quantile_func(state):
-                means = np.array(q.predict(state, idx=0))
+            def scores_func(state):
+                qs = predict_heads(q, state)
+                means = qs[0]
                 if regret_test:
-                    sigmas1 = np.array(q.predict(state, idx=1))
-                    sigmas2 = np.array(q.predict(state, idx=2))
-                    sigmas = sigmas2
-                    #print(sigmas1, sigmas2)
+                    sigmas = qs[2]
                 else:
-                    sigmas = np.array(q.predict(state, idx=1))
+                    sigmas = qs[1]
                 out = sigmas * standard_bound + means
-                return out
-
-            def mu(state):
-                q_list = q.predict(state, idx=0)
-                means = np.array(q_list)
+                return means, out
 
-                return means
-            pi.set_quantile_func(quantile_func)
-            pi.set_mu(mu)
+            pi.set_scores_func(scores_func)
         epsilon_train = Parameter(0)
     else:
         raise ValueError()
 
+    checkpoint_path = None
+    if checkpoint_prefix is not None:
+        checkpoint_path = '%s_%d.npz' % (checkpoint_prefix, seed)
+    resume = resume and checkpoint_path is not None and \
+        os.path.exists(checkpoint_path)
+
     # Algorithm
-    collect_dataset = CollectDataset()
-    callbacks = [collect_dataset]
+    score_accumulator = ScoreAccumulator(mdp.info.gamma)
+    callbacks = [score_accumulator]
+    collect_qs_callback = None
     if collect_qs:
         if algorithm not in ['r-max']:
-            collect_qs_callback = CollectQs(agent.approximator)
+            if not os.path.exists(out_dir):
+                os.makedirs(out_dir)
+            collect_qs_callback = CollectQs(
+                agent.approximator, out_dir + '/' + file_name + '.npy',
+                n_steps=max_steps, stride=qs_stride, dtype=qs_dtype,
+                deltas=qs_deltas, resume=resume)
             callbacks += [collect_qs_callback]
 
     if regret_test:
         callbacks += [collect_vs_callback]
     core = Core(agent, mdp, callbacks)
+    # The other agents update a single transition at a time
+    if not isinstance(agent, (ParticleQLearning, GaussianQLearning,
+                              DelayedQLearning)):
+        n_steps_per_fit = 1
+
+    evaluate = evaluate_scores
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        instrument(profiler, core)
+        evaluate = profiler.wrap(evaluate_scores, 'evaluation', 1)
 
     train_scores = []
     test_scores = []
 
-    for n_epoch in range(1, max_steps // evaluation_frequency + 1):
+    # The whole learning state is restored in the objects built above. The
+    # collected action values are on disk, where the resumed callback
+    # continues to write them, and the arrays of the MDP are rebuilt from its
+    # configuration, so they are not part of the checkpoint
+    checkpoint_objects = [agent, pi, epsilon_train, mdp, callbacks]
+    checkpoint_skip = [x for x in [getattr(mdp, 'p', None),
+                                   getattr(mdp, 'r', None),
+                                   getattr(mdp, 'mu', None)] if x is not None]
+    start_epoch = 1
+    if resume:
+        state, _ = load_checkpoint(checkpoint_path)
+        set_state(checkpoint_objects, state['objects'])
+        set_rng_state(state['rng'])
+        train_scores = state['train_scores']
+        test_scores = state['test_scores']
+        start_epoch = state['epoch'] + 1
+        print('Resuming seed %s from epoch %d' % (seed, state['epoch']))
+
+    store = None
+    if store_path is not None:
+        store = ResultStore(store_path)
+        store_key = store.start(config, seed)
+
+    for n_epoch in range(start_epoch, max_steps // evaluation_frequency + 1):
 
         # Train
         if hasattr(pi, 'set_epsilon'):
@@ -475,14 +462,15 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
             pi.set_eval(False)
         if regret_test:
             collect_vs_callback.on()
-        core.learn(n_steps=evaluation_frequency, n_steps_per_fit=1, quiet=True)
-        dataset = collect_dataset.get()
-        scores = compute_scores(dataset, mdp.info.gamma)
+        core.learn(n_steps=evaluation_frequency, n_steps_per_fit=n_steps_per_fit, quiet=True)
+        scores = score_accumulator.get_scores()
 
         #print('Train: ', scores)
         train_scores.append(scores)
+        if store is not None:
+            store.append(store_key, 'train', n_epoch, scores)
 
-        collect_dataset.clean()
+        score_accumulator.clean()
         mdp.reset()
         if regret_test:
             vs = collect_vs_callback.get_values()
@@ -496,9 +484,8 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
             pi.set_epsilon(epsilon_test)
         if hasattr(pi, 'set_eval'):
             pi.set_eval(True)
-        dataset = core.evaluate(n_steps=test_samples, quiet=True)
+        scores = evaluate(core, test_samples, mdp.info.gamma, quiet=True)
         s = mdp.reset()
-        scores = compute_scores(dataset, mdp.info.gamma)
         print('Evaluation #%d:%s ' %(n_epoch, scores))
         if debug:
             print("Policy:")
@@ -514,13 +501,28 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
             print("V:{}".format(evaluate_policy(mdp.p, mdp.r, agent.get_policy())))
             input()
         test_scores.append(scores)
+        if store is not None:
+            store.append(store_key, 'test', n_epoch, scores)
         if regret_test:
             np.save(out_dir + "/scores_offline" + str(seed), test_scores)
-    if collect_qs:
-        qs= collect_qs_callback.get_values()
-        if not os.path.exists(out_dir):
-                            os.makedirs(out_dir)
-        np.save(out_dir + '/' + file_name, qs)
+        if profiler is not None:
+            profiler.end_epoch(n_epoch)
+            if not os.path.exists(out_dir):
+                os.makedirs(out_dir)
+            profiler.save(out_dir + '/profile_%s_seed=%d.json' % (file_name, seed))
+        if checkpoint_path is not None and checkpoint_frequency > 0 and \
+                n_epoch % checkpoint_frequency == 0:
+            save_checkpoint(checkpoint_path,
+                            dict(epoch=n_epoch, train_scores=train_scores,
+                                 test_scores=test_scores,
+                                 objects=get_state(checkpoint_objects,
+                                                   skip=checkpoint_skip),
+                                 rng=get_rng_state()))
+    if collect_qs_callback is not None:
+        collect_qs_callback.close()
+
+    if store is not None:
+        store.complete(store_key)
 
     return train_scores, test_scores
 
@@ -614,9 +616,10 @@ if __name__ == '__main__':
                           default='deterministic',
                           help='Whether to perform randomized or deterministic target update (only ParticleQLearning).')
     arg_alg.add_argument("--update-type",
-                          choices=['mean', 'weighted', 'optimistic'],
+                          choices=['mean', 'weighted', 'optimistic', 'distributional'],
                           default='',
-                          help='Kind of update to perform (only WQL algorithms).')
+                          help='Kind of update to perform (only WQL algorithms, distributional '
+                               'only particle-ql).')
     arg_alg.add_argument("--policy",
                           choices=['weighted', 'vpi', 'boot', 'boltzmann', 'eps-greedy', 'ucb', 'weighted-gaussian'],
                           default='',
@@ -670,13 +673,59 @@ if __name__ == '__main__':
                          help='Seed.')
     arg_run.add_argument("--collect-qs", action='store_true',
                          help="Whether to collect the q_values for each timestep.")
+    arg_run.add_argument("--qs-stride", type=int, default=1,
+                         help='Number of steps between two collected q_values.')
+    arg_run.add_argument("--qs-dtype", choices=['float16', 'float32', 'float64'],
+                         default='float32',
+                         help='Type of the collected q_values on disk.')
+    arg_run.add_argument("--qs-deltas", action='store_true',
+                         help='Whether to store only the collected q_values '
+                              'that changed since the previous collection.')
+    arg_run.add_argument("--profile", action='store_true',
+                         help='Whether to save the time spent in each phase '
+                              'of each epoch of the experiments.')
     arg_run.add_argument("--debug", action='store_true',
                          help="Debug flag for the regret test.")
+    arg_run.add_argument("--mdp-cache-dir", type=str, default=DEFAULT_CACHE_DIR,
+                         help='Directory where the arrays of the generated '
+                              'MDPs are cached.')
+    arg_run.add_argument("--no-mdp-cache", action='store_true',
+                         help='Whether to build the MDPs without the cache.')
+    arg_run.add_argument("--precision", choices=['float64', 'float32'],
+                         default='float64',
+                         help='Type of the action values of boot-ql, '
+                              'particle-ql and gaussian-ql. With float32, the '
+                              'visits of the learning rates are stored as '
+                              'integers.')
+    arg_run.add_argument("--sparse-table", action='store_true',
+                         help='Whether to store only the action values of the '
+                              'visited states (only single estimator '
+                              'boot-ql, particle-ql and gaussian-ql).')
+    arg_run.add_argument("--n-steps-per-fit", type=int, default=1,
+                         help='Number of transitions of each update of the '
+                              'agent (only single estimator particle-ql and '
+                              'gaussian-ql, and delayed-ql). Blocks of '
+                              'transitions are updated in a vectorized way, '
+                              'with the same result as the sequential '
+                              'updates, up to the random breaking of the ties '
+                              'of the next actions. The action values and the '
+                              'regret are collected after each block, with '
+                              'their frequencies still counted in steps.')
+    arg_run.add_argument("--checkpoint-frequency", type=int, default=0,
+                         help='Number of epochs between two checkpoints of '
+                              'each experiment (0 to disable).')
+    arg_run.add_argument("--resume", action='store_true',
+                         help='Whether to resume the experiments from their '
+                              'checkpoints in --dir.')
+    arg_run.add_argument("--store", type=str,
+                         help='Path of the SQLite result store. The scores '
+                              'of each epoch are stored there, and the runs '
+                              'already completed are not executed again.')
 
     args = parser.parse_args()
     n_experiment = args.n_experiments
 
-    affinity = min(len(os.sched_getaffinity(0)), args.n_experiments)
+    affinity = len(os.sched_getaffinity(0))
     if args.name != '':
         envs = [args.name]
     if args.algorithm != '':
@@ -685,6 +734,9 @@ if __name__ == '__main__':
             alg_to_policies[args.algorithm]=[args.policy]
         if args.update_type!='' and args.update_type in alg_to_update_types[args.algorithm]:
             alg_to_update_types[args.algorithm]=[args.update_type]
+        # The distributional update is not part of the default sweep
+        if args.update_type == 'distributional' and args.algorithm == 'particle-ql':
+            alg_to_update_types[args.algorithm] = [args.update_type]
 
     if args.double != '':
         double_vec = [bool(strtobool(args.double))]
@@ -709,6 +761,19 @@ if __name__ == '__main__':
         if args.name in ["ThreeArms", "SixArms"]:
             envs = [args.name]
         args.lr_exp = 1
+    # Expected number of steps of a run, used to start the longest runs first
+    env_to_steps = {
+        "Gridworld": 500000,
+        "Taxi": 500000
+    }
+
+    # The pool is sized by the scheduler from the number of tasks of the
+    # whole grid. The debug runs wait for input, so they run in this process
+    scheduler = SweepScheduler(n_workers=1 if args.debug else affinity)
+    # Configuration and seed of each task, to record its failure
+    task_runs = dict()
+    store = ResultStore(args.store) if args.store is not None else None
+    experiment_params = list(inspect.signature(experiment).parameters)
     for alg in algorithms:
         for double in alg_to_double_vec[alg]:
             for env in envs:
@@ -724,18 +789,60 @@ if __name__ == '__main__':
                                     qs[0], args.lr_exp, R, args.log_lr, args.m, args.delayed_m, args.epsilon,
                                     args.delta, args.debug, double, args.regret_test, args.a, args.b, args.C,
                                     args.value_iterations, args.tolerance, file_name, out_dir]
-                        start = time.time()
-                        if n_experiment > 1:
-                            out = Parallel(n_jobs=affinity)(delayed(experiment)(*(fun_args + [args.collect_qs if i==0 else False, args.seed+i])) for i in range(n_experiment))
-                        else:
-                            out = [experiment(*(fun_args + [False, 0]))]
-                        end = time.time()
-                        print("Executed in %f seconds!" %(end - start))
-                        if not os.path.exists(out_dir):
-                            os.makedirs(out_dir)
-                        file_name = 'results_%s_%s_%s_%s_double=%s_%s' % (policy, '1' if args.algorithm in ['ql', 'weighted-gaussian'] else args.n_approximators,
-                                             '' if alg not in ['particle-ql','gaussian-ql'] else update_type, args.lr_exp, double, time.time())
+                        checkpoint_params = dict(
+                            checkpoint_prefix=out_dir + '/checkpoint_%s_%s_%s_double=%s' % (
+                                policy, update_type, args.lr_exp, double),
+                            checkpoint_frequency=args.checkpoint_frequency,
+                            resume=args.resume)
+                        results_name = 'results_%s_%s_%s_%s_double=%s_' % (policy, '1' if args.algorithm in ['ql', 'weighted-gaussian'] else args.n_approximators,
+                                             '' if alg not in ['particle-ql','gaussian-ql'] else update_type, args.lr_exp, double)
+                        results_tail = ''
                         if args.algorithm == 'gaussian-ql':
-                            file_name += "_log_lr=%s" % (args.log_lr)
-                        np.save(out_dir + '/' + file_name, out)
-                        
+                            results_tail = "_log_lr=%s" % (args.log_lr)
+                        cost = 1 if args.regret_test else env_to_steps.get(env, 100000)
+                        if alg in ['boot-ql', 'particle-ql']:
+                            cost *= args.n_approximators
+                        group = (out_dir, results_name, results_tail)
+                        # The configuration identifying the runs in the result store
+                        config = dict(zip(experiment_params, fun_args))
+                        for k in ['debug', 'file_name', 'out_dir']:
+                            config.pop(k)
+                        config.update(max_steps_regret=args.max_steps_regret, delayed_ratio=args.delayed_ratio,
+                                      freq_collection=args.freq_collection)
+                        # Options changing the results are part of the configuration only when they are set, so
+                        # that the runs stored before their introduction are still found
+                        if args.precision != 'float64':
+                            config.update(precision=args.precision)
+                        if args.sparse_table:
+                            config.update(sparse_table=True)
+                        if args.n_steps_per_fit != 1:
+                            config.update(n_steps_per_fit=args.n_steps_per_fit)
+                        seeds = [args.seed + i for i in range(n_experiment)] if n_experiment > 1 else [0]
+                        for i, seed in enumerate(seeds):
+                            if store is not None and store.is_completed(config, seed):
+                                scheduler.add(group, load_scores, [args.store, config, seed], cost=0)
+                                continue
+                            collect_qs = args.collect_qs if i == 0 and n_experiment > 1 else False
+                            index = scheduler.add(group, experiment, fun_args + [collect_qs, seed],
+                                          dict(store_path=args.store, config=config, qs_stride=args.qs_stride,
+                                               qs_dtype=args.qs_dtype, qs_deltas=args.qs_deltas,
+                                               profile=args.profile,
+                                               mdp_cache_dir=None if args.no_mdp_cache else args.mdp_cache_dir,
+                                               sparse_table=args.sparse_table,
+                                               precision=args.precision,
+                                               n_steps_per_fit=args.n_steps_per_fit,
+                                               **checkpoint_params), cost)
+                            task_runs[group, index] = config, seed
+
+    def record_failure(group, index, error):
+        # The failed run is left incomplete, to be executed by the next sweep
+        print('Run %d of %s failed:\n%s' % (index, group[0] + '/' + group[1], error))
+        if store is not None:
+            config, seed = task_runs[group, index]
+            store.fail(config, seed, error)
+
+    start = time.time()
+    scheduler.run(on_task=save_task_result, on_group=save_group_results,
+                  on_error=record_failure)
+    end = time.time()
+    print("Executed in %f seconds!" %(end - start))
@@ -5,15 +5,12 @@ import numpy as np
 import warnings
 import time
 import random
-from joblib import Parallel, delayed
 from distutils.util import strtobool
 sys.path.append('..')
 sys.path.append('../..')
 from mushroom.core import Core
 from mushroom.environments.generators.taxi import generate_taxi
 from mushroom.environments.gym_env import Gym
-from mushroom.utils.callbacks import CollectDataset
-from mushroom.utils.dataset import parse_dataset
 from mushroom.utils.parameters import ExponentialDecayParameter, Parameter
 from mushroom.policy.td_policy import EpsGreedy, Boltzmann
 from mushroom.algorithms.value.td import QLearning, DoubleQLearning
@@ -23,13 +20,14 @@ from particle_q_learning import ParticleQLearning, ParticleDoubleQLearning
 from delayed_q_learning import DelayedQLearning
 
 
-from policy import BootPolicy, WeightedPolicy, VPIPolicy, UCBPolicy
+from policy import BootPolicy, WeightedPolicy, VPIPolicy, UCBPolicy, predict_heads
 from envs.knight_quest import KnightQuest
 from envs.chain import generate_chain
 from envs.loop import generate_loop
 from envs.river_swim import generate_river
 from envs.six_arms import generate_arms
-from utils.callbacks import CollectQs
+from utils.callbacks import CollectQs, ScoreAccumulator, evaluate_scores
+from utils.seeds import set_global_seeds
 import envs.knight_quest
 from gym.envs.registration import register
 
@@ -70,45 +68,10 @@ env_to_R = {
         "RiverSwim": 10000.,
         "SixArms": 6000.,
     }
-def set_global_seeds(i):
-    try:
-        import tensorflow as tf
-    except ImportError:
-        pass
-    else:
-        tf.set_random_seed(i)
-    np.random.seed(i)
-    random.seed(i)
-
-
-def compute_scores(dataset, gamma):
-    scores = list()
-    disc_scores = list()
-    lens = list()
-
-    score = 0.
-    disc_score = 0.
-    episode_steps = 0
-    n_episodes = 0
-    for i in range(len(dataset)):
-        score += dataset[i][2]
-        disc_score += dataset[i][2] * gamma ** episode_steps
-        episode_steps += 1
-        if dataset[i][-1]:
-            scores.append(score)
-            disc_scores.append(disc_score)
-            lens.append(episode_steps)
-            score = 0.
-            disc_score = 0.
-            episode_steps = 0
-            n_episodes += 1
-
-    if len(scores) > 0:
-        return len(dataset), np.min(scores), np.max(scores), np.mean(scores), np.std(scores), \
-               np.min(disc_scores), np.max(disc_scores), np.mean(disc_scores), \
-               np.std(disc_scores), np.mean(lens), n_episodes
-    else:
-        return len(dataset), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+# Relative duration of the runs, used to start the longest ones first
+env_to_cost = {
+        "Taxi": 5
+    }
 
 
 def experiment(algorithm, name, update_mode, update_type, policy, n_approximators, q_max, q_min, lr_exp,
@@ -191,24 +154,11 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
                 if quantiles[p] >= 1-delta:
                     particle_bound = p
                     break
-            def quantile_func(state, quantile):
-                q_list = list()
-                for i in range(n_approximators):
-                    q_list.append(q.predict(state, idx=i))
-                qs = np.array(q_list)
-                out = np.zeros(qs.shape[1])
-                out[:] = qs[particle_bound, :]
-                return out
-
-            def mu(state):
-                q_list = list()
-                for i in range(n_approximators):
-                    q_list.append(q.predict(state, idx=i))
-                qs = np.array(q_list)
-                return np.mean(qs, axis=0)
-
-            pi.set_quantile_func(quantile_func)
-            pi.set_mu(mu)
+            def scores_func(state):
+                qs = predict_heads(q, state)
+                return np.mean(qs, axis=0), qs[particle_bound, :].copy()
+
+            pi.set_scores_func(scores_func)
         epsilon_train = Parameter(0)
     elif algorithm == 'delayed-ql':
         algorithm_params = dict(
@@ -220,8 +170,8 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         pi = agent
 
     # Algorithm
-    collect_dataset = CollectDataset()
-    callbacks = [collect_dataset]
+    score_accumulator = ScoreAccumulator(mdp.info.gamma)
+    callbacks = [score_accumulator]
     if collect_qs:
         collect_qs_callback = CollectQs(agent.approximator)
         callbacks += [collect_qs_callback]
@@ -238,22 +188,21 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         if hasattr(pi, 'set_eval'):
             pi.set_eval(False)
         core.learn(n_steps=evaluation_frequency, n_steps_per_fit=1, quiet=True)
-        dataset = collect_dataset.get()
-        scores = compute_scores(dataset, mdp.info.gamma)
+        scores = score_accumulator.get_scores()
 
         # print('Train: ', scores)
         train_scores.append(scores)
 
-        collect_dataset.clean()
+        score_accumulator.clean()
         mdp.reset()
 
         if hasattr(pi, 'set_epsilon'):
             pi.set_epsilon(epsilon_test)
         if hasattr(pi, 'set_eval'):
             pi.set_eval(True)
-        dataset = core.evaluate(n_steps=test_samples, quiet=True)
+        scores = evaluate_scores(core, test_samples, mdp.info.gamma,
+                                 quiet=True)
         mdp.reset()
-        scores = compute_scores(dataset, mdp.info.gamma)
         # print('Evaluation: ', scores)
         test_scores.append(scores)
     if collect_qs:
@@ -291,15 +240,12 @@ def add_noise_experiment(alg,n_particles,envs,args):
                             out_dir = args.dir + '/' + env + '/' + alg
                             fun_args = [alg, env, args.update_mode, update_type, policy, n_particles, qs[1], qs[0],
                                     args.lr_exp, file_name, out_dir]
-                            out = Parallel(n_jobs=affinity)(
-                                delayed(experiment)(*(fun_args + [particle_list[i], R, 1, args.collect_qs if i == 0 else False, args.seed + i])) for
-                                i in range(args.n_experiments))
-
-                            if not os.path.exists(out_dir):
-                                os.makedirs(out_dir)
-                            file_name = 'results_noise_%s_%s_%s_%s_%s_coef=%s' % (
-                            policy, n_particles, update_type, args.lr_exp, time.time(),alpha)
-                            np.save(out_dir + '/' + file_name, out)
+                            group = (out_dir, 'results_noise_%s_%s_%s_%s_' % (
+                            policy, n_particles, update_type, args.lr_exp), '_coef=%s' % alpha)
+                            for i in range(args.n_experiments):
+                                scheduler.add(group, experiment,
+                                              fun_args + [particle_list[i], R, 1, args.collect_qs if i == 0 else False,
+                                                          args.seed + i], cost=env_to_cost.get(env, 1))
                             alpha+=delta_alpha
 
 def init_variations_experiment(alg,n_particles,envs,args):
@@ -324,15 +270,12 @@ def init_variations_experiment(alg,n_particles,envs,args):
                             out_dir = args.dir + '/' + env + '/' + alg
                             fun_args = [alg, env, args.update_mode, update_type, policy, n_particles, qs[1], qs[0],
                                     args.lr_exp, file_name, out_dir,particles,R,1]
-                            out = Parallel(n_jobs=affinity)(
-                                delayed(experiment)(*(fun_args + [args.collect_qs if i == 0 else False, args.seed + i])) for
-                                i in range(args.n_experiments))
-
-                            if not os.path.exists(out_dir):
-                                os.makedirs(out_dir)
-                            file_name = 'results_prior_%s_%s_%s_%s_%s_init=%s' % (
-                            policy, n_particles, update_type, args.lr_exp, time.time(),init)
-                            np.save(out_dir + '/' + file_name, out)
+                            group = (out_dir, 'results_prior_%s_%s_%s_%s_' % (
+                            policy, n_particles, update_type, args.lr_exp), '_init=%s' % init)
+                            for i in range(args.n_experiments):
+                                scheduler.add(group, experiment,
+                                              fun_args + [args.collect_qs if i == 0 else False, args.seed + i],
+                                              cost=env_to_cost.get(env, 1))
 
 def delayed_q_experiment(alg,envs,args):
 
@@ -350,14 +293,11 @@ def delayed_q_experiment(alg,envs,args):
                             file_name = 'qs_m=%s_%s' % (m, time.time())
                             fun_args = [alg, env, args.update_mode, 'delayed', 'delayed', 1, qs[1], qs[0],
                                     args.lr_exp, file_name, out_dir, np.ones(10), R, m]
-                            out = Parallel(n_jobs=affinity)(
-                                delayed(experiment)(*(fun_args + [args.collect_qs if i == 0 else False, args.seed + i])) for
-                                i in range(args.n_experiments))
-                            #out = [experiment(*(fun_args + [False, 0]))]
-                            if not os.path.exists(out_dir):
-                                os.makedirs(out_dir)
-                            file_name = 'results_delayed_m=%s_%s' % (m, time.time())
-                            np.save(out_dir + '/' + file_name, out)
+                            group = (out_dir, 'results_delayed_m=%s_' % m, '')
+                            for i in range(args.n_experiments):
+                                scheduler.add(group, experiment,
+                                              fun_args + [args.collect_qs if i == 0 else False, args.seed + i],
+                                              cost=env_to_cost.get(env, 1))
                             m += delta_m
 if __name__ == '__main__':
 
@@ -428,6 +368,7 @@ if __name__ == '__main__':
     n_experiment = args.n_experiments
 
     affinity = len(os.sched_getaffinity(0))
+    scheduler = SweepScheduler(n_workers=affinity)
     envs = ["Chain", "KnightQuest", "Loop", "RiverSwim", "SixArms","Taxi"]
     if args.name != '':
         envs = str.split(args.name,',')
@@ -445,6 +386,7 @@ if __name__ == '__main__':
         if args.name !='' and args.name in envs:
             envs = [args.name]
         delayed_q_experiment(alg, envs, args)
+    scheduler.run(on_task=save_task_result, on_group=save_group_results)
 
 
 
@@ -5,15 +5,12 @@ import numpy as np
 import warnings
 import time
 import random
-from joblib import Parallel, delayed
 from distutils.util import strtobool
 sys.path.append('..')
 sys.path.append('../..')
 from mushroom.core import Core
 from mushroom.environments.generators.taxi import generate_taxi
 from mushroom.environments.gym_env import Gym
-from mushroom.utils.callbacks import CollectDataset
-from mushroom.utils.dataset import parse_dataset
 from mushroom.utils.parameters import ExponentialDecayParameter, Parameter
 from mushroom.policy.td_policy import EpsGreedy, Boltzmann
 from mushroom.algorithms.value.td import QLearning, DoubleQLearning
@@ -28,7 +25,9 @@ from envs.chain import generate_chain
 from envs.loop import generate_loop
 from envs.river_swim import generate_river
 from envs.six_arms import generate_arms
-from utils.callbacks import CollectQs
+from utils.callbacks import CollectQs, ScoreAccumulator, evaluate_scores
+from utils.seeds import set_global_seeds
+from utils.scheduler import SweepScheduler, save_group_results, save_task_result
 
 policy_dict = {'eps-greedy': EpsGreedy,
                'boltzmann': Boltzmann,
@@ -37,47 +36,6 @@ policy_dict = {'eps-greedy': EpsGreedy,
                'vpi': VPIPolicy}
 
 
-def set_global_seeds(i):
-    try:
-        import tensorflow as tf
-    except ImportError:
-        pass
-    else:
-        tf.set_random_seed(i)
-    np.random.seed(i)
-    random.seed(i)
-
-
-def compute_scores(dataset, gamma):
-    scores = list()
-    disc_scores = list()
-    lens = list()
-
-    score = 0.
-    disc_score = 0.
-    episode_steps = 0
-    n_episodes = 0
-    for i in range(len(dataset)):
-        score += dataset[i][2]
-        disc_score += dataset[i][2] * gamma ** episode_steps
-        episode_steps += 1
-        if dataset[i][-1]:
-            scores.append(score)
-            disc_scores.append(disc_score)
-            lens.append(episode_steps)
-            score = 0.
-            disc_score = 0.
-            episode_steps = 0
-            n_episodes += 1
-
-    if len(scores) > 0:
-        return len(dataset), np.min(scores), np.max(scores), np.mean(scores), np.std(scores), \
-               np.min(disc_scores), np.max(disc_scores), np.mean(disc_scores), \
-               np.std(disc_scores), np.mean(lens), n_episodes
-    else:
-        return len(dataset), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-
-
 def experiment(algorithm, name, update_mode, update_type, policy, n_approximators, q_max, q_min, lr_exp, double,
                file_name, out_dir, collect_qs, seed):
     set_global_seeds(seed)
@@ -175,9 +133,9 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         raise ValueError()
 
     # Algorithm
-    collect_dataset = CollectDataset()
+    score_accumulator = ScoreAccumulator(mdp.info.gamma)
     collect_qs_callback = CollectQs(agent.approximator)
-    callbacks = [collect_dataset]
+    callbacks = [score_accumulator]
     if collect_qs:
         callbacks += [collect_qs_callback]
     core = Core(agent, mdp, callbacks)
@@ -193,22 +151,21 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         if hasattr(pi, 'set_eval'):
             pi.set_eval(False)
         core.learn(n_steps=evaluation_frequency, n_steps_per_fit=1, quiet=True)
-        dataset = collect_dataset.get()
-        scores = compute_scores(dataset, mdp.info.gamma)
+        scores = score_accumulator.get_scores()
 
         # print('Train: ', scores)
         train_scores.append(scores)
 
-        collect_dataset.clean()
+        score_accumulator.clean()
         mdp.reset()
 
         if hasattr(pi, 'set_epsilon'):
             pi.set_epsilon(epsilon_test)
         if hasattr(pi, 'set_eval'):
             pi.set_eval(True)
-        dataset = core.evaluate(n_steps=test_samples, quiet=True)
+        scores = evaluate_scores(core, test_samples, mdp.info.gamma,
+                                 quiet=True)
         mdp.reset()
-        scores = compute_scores(dataset, mdp.info.gamma)
         # print('Evaluation: ', scores)
         test_scores.append(scores)
     if collect_qs:
@@ -320,6 +277,7 @@ if __name__ == '__main__':
     delta_n=1
     max_n=args.max_n
     alg='particle-ql'
+    scheduler = SweepScheduler(n_workers=affinity)
     while n_particles<=max_n:
         for env in envs:
                 for policy in alg_to_policies[alg]:
@@ -334,13 +292,13 @@ if __name__ == '__main__':
                             out_dir = args.dir + '/' + env + '/' + alg
                             fun_args = [alg, env, args.update_mode, update_type, policy, n_particles, qs[1], qs[0],
                                     args.lr_exp, double, file_name, out_dir]
-                            out = Parallel(n_jobs=affinity)(
-                                delayed(experiment)(*(fun_args + [args.collect_qs if i == 0 else False, args.seed + i])) for
-                                i in range(n_experiment))
-
-                            if not os.path.exists(out_dir):
-                                os.makedirs(out_dir)
-                            file_name = 'results_%s_%s_%s_%s_double=%s_%s' % (
-                            policy, n_particles, update_type, args.lr_exp, double, time.time())
-                            np.save(out_dir + '/' + file_name, out)
+                            results_name = 'results_%s_%s_%s_%s_double=%s_' % (
+                            policy, n_particles, update_type, args.lr_exp, double)
+                            # The cost of a step grows with the number of particles
+                            cost = (5 if env == 'Taxi' else 1) * n_particles
+                            for i in range(n_experiment):
+                                scheduler.add((out_dir, results_name, ''), experiment,
+                                              fun_args + [args.collect_qs if i == 0 else False, args.seed + i],
+                                              cost=cost)
         n_particles+=delta_n
+    scheduler.run(on_task=save_task_result, on_group=save_group_results)
@@ -5,7 +5,10 @@ import matplotlib.pyplot as plt
 import numpy as np
 import glob
 import os 
+import sys
 import argparse
+sys.path.append('..')
+from utils.callbacks import load_qs
 parser = argparse.ArgumentParser()
 arg_graphs = parser.add_argument_group('Graphs')
 arg_graphs.add_argument("--particles", action='store_true')
@@ -53,7 +56,8 @@ for env in environments:
                     #print(paths)
                     for p in paths:
                         
-                        history = np.load(p)
+                        # Only the first state is shown, the others are not read
+                        history = load_qs(p, states=[0])
                         #print(history.shape)
                         timesteps = history.shape[0]
                         n_states=history.shape[2]
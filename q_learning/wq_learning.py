@@ -1,27 +1,39 @@
 import numpy as np
 from copy import deepcopy
 from mushroom.algorithms.value import TD
-from mushroom.utils.table import EnsembleTable
 from scipy.stats import norm
 import sys
+
+from utils.batch import learning_rates, random_argmax, visit_rounds
+from utils.table import DoubleEnsembleTable, SparseEnsembleTable, \
+    StackedEnsembleTable
+
+
 class Gaussian(TD):
     def __init__(self, policy, mdp_info, learning_rate, sigma_learning_rate=None, sigma_1_learning_rate=None, update_mode='deterministic',
-                 update_type='weighted', init_values=[0., 0., 500.], delta=0.1, q_max=None, minimize_wasserstein=True, clip_variance=True):
+                 update_type='weighted', init_values=[0., 0., 500.], delta=0.1, q_max=None, minimize_wasserstein=True, clip_variance=True,
+                 sparse=False, dtype=np.float64):
         self._update_mode = update_mode
         self._update_type = update_type
         self.delta = delta
 
         self.n_approximators = len(init_values)
-        self.Q = EnsembleTable(len(init_values), mdp_info.size)
+        if sparse:
+            self.Q = SparseEnsembleTable(len(init_values), mdp_info.size,
+                                         init_values=init_values, dtype=dtype)
+        else:
+            self.Q = StackedEnsembleTable(len(init_values), mdp_info.size,
+                                          dtype=dtype)
         if q_max is None:
             q_max = 1 / (1-mdp_info.gamma)
         if self.n_approximators == 3:
             q_max = init_values[0]
             self.sigma_b = init_values[-1]
-            self.q_max = q_max
+        self.q_max = q_max
 
-        for i in range(len(self.Q.model)):
-            self.Q.model[i].table = np.tile([init_values[i]], self.Q[i].shape)
+        if not sparse:
+            for i in range(len(self.Q.model)):
+                self.Q.model[i].table[:] = np.tile([init_values[i]], self.Q[i].shape)
 
         super(Gaussian, self).__init__(self.Q, policy, mdp_info,
                                        learning_rate)
@@ -32,18 +44,17 @@ class Gaussian(TD):
         self.minimize_wasserstein = minimize_wasserstein
         policy = np.zeros(self.mdp_info.size)
         self.standard_bound = norm.ppf(1 - self.delta, loc=0, scale=1)
-        for s in range(self.mdp_info.size[0]):
-            if self.n_approximators == 3:
-                means, sigmas1, sigmas2 = [x[[s]] for x in self.Q.model]
-                sigmas = sigmas1 + sigmas2
-            else:
-                means, sigmas = [x[[s]] for x in self.Q.model]
-            bounds = sigmas * self.standard_bound + means
-            bounds = np.clip(bounds, None, self.q_max)
-            actions = np.argwhere(bounds == np.max(bounds)).ravel()
-            n = len(actions)
-            for a in actions:
-                policy[s, a] = 1. / n
+        # The initial values, hence the initial policy, are the same in all
+        # the states, which are not read to keep a sparse table empty
+        if self.n_approximators == 3:
+            means, sigmas1, sigmas2 = [np.full(self.mdp_info.size[-1], float(v)) for v in init_values]
+            sigmas = sigmas1 + sigmas2
+        else:
+            means, sigmas = [np.full(self.mdp_info.size[-1], float(v)) for v in init_values]
+        bounds = sigmas * self.standard_bound + means
+        bounds = np.clip(bounds, None, self.q_max)
+        actions = np.argwhere(bounds == np.max(bounds)).ravel()
+        policy[:, actions] = 1. / len(actions)
         self.policy_matrix = policy
         self.last_update = (0,0)
         self.clip_variance = clip_variance
@@ -92,6 +103,117 @@ class GaussianQLearning(Gaussian):
                 print(sigma_list)
                 input()
 
+    @staticmethod
+    def _compute_prob_max_batch(means, sigmas):
+        # Same as _compute_prob_max for the (n_samples, n_actions) means and
+        # standard deviations of a batch of next states
+        n_actions = means.shape[1]
+        lower_limit = means - 8 * sigmas
+        upper_limit = means + 8 * sigmas
+        epsilon = 1e-5
+        _epsilon = 1e-25
+        n_trapz = 100
+        diagonal = np.arange(n_actions)
+
+        x = np.linspace(lower_limit, upper_limit, n_trapz, axis=1)
+        y = norm.pdf(x, loc=means[:, None], scale=sigmas[:, None] + _epsilon)
+        cdf = norm.cdf(x[:, :, :, None], loc=means[:, None, None],
+                       scale=sigmas[:, None, None] + _epsilon)
+        cdf[:, :, diagonal, diagonal] = 1
+        y *= cdf.prod(axis=3)
+        integrals = (upper_limit - lower_limit) / (2 * (n_trapz - 1)) * (
+                y[:, 0] + y[:, -1] + 2 * np.sum(y[:, 1:-1], axis=1))
+
+        # Degenerate distributions
+        cdf = norm.cdf(means[:, :, None], loc=means[:, None],
+                       scale=sigmas[:, None] + _epsilon)
+        cdf[:, diagonal, diagonal] = 1
+        integrals = np.where(sigmas < epsilon, cdf.prod(axis=2), integrals)
+
+        return integrals / np.sum(integrals, axis=1, keepdims=True)
+
+    def fit(self, dataset):
+        # Blocks of transitions are split in rounds of consecutive
+        # transitions that do not read the values updated in the round, whose
+        # updates are vectorized
+        if len(dataset) == 1 or not self._batch_supported():
+            for sample in dataset:
+                super(GaussianQLearning, self).fit([sample])
+        else:
+            for block in visit_rounds(dataset, self.mdp_info.size[-1]):
+                self._update_batch(*block)
+
+    def _batch_supported(self):
+        if not isinstance(self.Q, StackedEnsembleTable):
+            return False
+        if self.n_approximators == 3:
+            return self._update_type == 'optimistic'
+
+        return self._update_mode == 'deterministic' and \
+            self._update_type in ['mean', 'weighted', 'optimistic']
+
+    def _update_batch(self, state, action, reward, next_state, absorbing):
+        gamma = self.mdp_info.gamma
+        alpha = [learning_rates(a, state, action)
+                 for a in self.alpha[:self.n_approximators]]
+        valid = ~absorbing
+        mean = self.Q.table[0, state, action]
+        sigma = self.Q.table[1, state, action]
+        mean_next_all = self.Q.table[0, next_state[valid]]
+        mean_next = np.zeros_like(mean)
+        sigma_next = np.zeros_like(mean)
+        if self.n_approximators == 3:
+            # theoretical version
+            sigma_next_all = self.Q.table[2, next_state[valid]]
+            bounds = sigma_next_all * self.standard_bound + mean_next_all
+            best = random_argmax(bounds)
+            rows = np.arange(len(best))
+            mean_next[valid] = mean_next_all[rows, best]
+            sigma_next[valid] = sigma_next_all[rows, best]
+            if self.clip_variance:
+                sigma_next = np.minimum(self.q_max - mean / self.standard_bound, sigma_next)
+
+            self.Q.table[0, state, action] = np.where(
+                absorbing, mean + alpha[0] * (reward - mean),
+                mean + alpha[0] * (reward + gamma * mean_next - mean))
+            self.Q.table[1, state, action] = np.where(
+                absorbing, (1 - alpha[1]) * sigma,
+                sigma + alpha[1] * (gamma * sigma_next - sigma))
+            self.Q.table[2, state, action] = self.Q.table[1, state, action] + alpha[2] * self.sigma_b
+
+            # Policy of the updated states, as in _update
+            states = np.unique(state)
+            bounds = self.Q.table[2, states] * self.standard_bound + self.Q.table[0, states]
+            best = bounds == np.max(bounds, axis=1, keepdims=True)
+            self.policy_matrix[states] = best / np.sum(best, axis=1, keepdims=True)
+        else:
+            sigma_next_all = self.Q.table[1, next_state[valid]]
+            if self._update_type == 'weighted':
+                prob = GaussianQLearning._compute_prob_max_batch(mean_next_all, sigma_next_all)
+                mean_next[valid] = np.sum(mean_next_all * prob, axis=1)
+                if self.minimize_wasserstein:
+                    sigma_next[valid] = np.sum(prob * sigma_next_all, axis=1)
+                else:
+                    sigma_next[valid] = np.sum((sigma_next_all + (
+                            mean_next[valid, None] - mean_next_all) ** 2) * prob, axis=1)
+            else:
+                if self._update_type == 'optimistic':
+                    bounds = sigma_next_all * self.standard_bound + mean_next_all
+                    scores = np.clip(bounds, -self.q_max, self.q_max)
+                else:
+                    scores = mean_next_all
+                best = random_argmax(scores)
+                rows = np.arange(len(best))
+                mean_next[valid] = mean_next_all[rows, best]
+                sigma_next[valid] = sigma_next_all[rows, best]
+
+            self.Q.table[0, state, action] = np.where(
+                absorbing, mean + alpha[0] * (reward - mean),
+                mean + alpha[0] * (reward + gamma * mean_next - mean))
+            self.Q.table[1, state, action] = np.where(
+                absorbing, (1 - alpha[1]) * sigma,
+                sigma + alpha[1] * (gamma * sigma_next - sigma))
+
 
     def _update(self, state, action, reward, next_state, absorbing):
         if self.n_approximators == 3:
@@ -197,18 +319,13 @@ class GaussianDoubleQLearning(Gaussian):
     def __init__(self, policy, mdp_info, learning_rate, sigma_learning_rate=None, update_mode='deterministic',
                  update_type='weighted', init_values=(0., 500.), delta=0.1, minimize_wasserstein = True):
         super(GaussianDoubleQLearning, self).__init__(
-            policy, mdp_info, learning_rate, sigma_learning_rate, update_mode,
-            update_type, init_values, delta, minimize_wasserstein)
+            policy, mdp_info, learning_rate, sigma_learning_rate, update_mode=update_mode,
+            update_type=update_type, init_values=init_values, delta=delta,
+            minimize_wasserstein=minimize_wasserstein)
 
-        self.Qs = [EnsembleTable(2, mdp_info.size),
-                   EnsembleTable(2, mdp_info.size)]
-
-        for i in range(len(self.Qs[0])):
-            self.Qs[0][i].table = np.tile([init_values[i]], self.Q[i].shape)
-
-        for i in range(len(self.Qs[1])):
-            self.Qs[1][i].table = self.Qs[0][i].table.copy()
-            self.Q[i].table = self.Qs[0][i].table.copy()
+        self.Qs = DoubleEnsembleTable(self.Q)
+        self.Qs.table[:] = np.array(init_values)[None, :, None, None]
+        self.Qs.update_mean()
         self.alpha = [deepcopy(self.alpha), deepcopy(self.alpha)]
 
 
@@ -218,15 +335,13 @@ class GaussianDoubleQLearning(Gaussian):
         else:
             i_q = 1
 
-        mean, sigma = np.array([x[state, action] for x in self.Qs[i_q]])
+        mean, sigma = [x[state, action] for x in self.Qs[i_q].model]
         if absorbing:
-            self.Qs[i_q][0][state, action] = mean + self.alpha[i_q][0](state, action) * (
-                        reward - mean)
-            self.Qs[i_q][0][state, action] = (1 - self.alpha[i_q][1](state, action)) * sigma
-            self._update_Q(state, action)
+            mean = mean + self.alpha[i_q][0](state, action) * (reward - mean)
+            sigma = (1 - self.alpha[i_q][1](state, action)) * sigma
         else:
-            mean_next_all, sigma_next_all = [x[next_state] for x in self.Qs[i_q]]
-            mean_next_all_2, sigma_next_all_2 = [x[next_state] for x in self.Qs[1 - i_q]]
+            mean_next_all, sigma_next_all = self.Qs[i_q].predict_all(next_state)
+            mean_next_all_2, sigma_next_all_2 = self.Qs[1 - i_q].predict_all(next_state)
             if self._update_mode == 'deterministic':
                 if self._update_type == 'mean':
                     best = np.random.choice(np.argwhere(mean_next_all == np.max(mean_next_all)).ravel())
@@ -252,12 +367,9 @@ class GaussianDoubleQLearning(Gaussian):
             else:
                 raise NotImplementedError()
 
-            self.Qs[i_q][0][state, action] = mean + self.alpha[i_q][0](state, action) * (
+            mean = mean + self.alpha[i_q][0](state, action) * (
                     reward + self.mdp_info.gamma * mean_next - mean)
-            self.Qs[i_q][1][state, action] = sigma + self.alpha[i_q][1](state, action) * (
+            sigma = sigma + self.alpha[i_q][1](state, action) * (
                      self.mdp_info.gamma * sigma_next - sigma)
-            self._update_Q(state, action)
-    def _update_Q(self, state, action):
-        for idx in range(2):
-            self.Q[idx][state, action] = np.mean(
-                [q[idx][state, action] for q in self.Qs])
+
+        self.Qs.update(i_q, state, action, np.array([mean, sigma]))
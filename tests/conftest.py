@@ -0,0 +1,9 @@
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in [_ROOT, os.path.join(_ROOT, 'dqn'),
+             os.path.join(_ROOT, 'dqn', 'atari'),
+             os.path.join(_ROOT, 'q_learning')]:
+    if path not in sys.path:
+        sys.path.append(path)
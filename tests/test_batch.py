@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from envs.chain import generate_chain
+from parameter import LogarithmicDecayParameter
+from particle_q_learning import ParticleQLearning
+from policy import WeightedGaussianPolicy, WeightedPolicy
+from utils.batch import visit_rounds
+from wq_learning import GaussianQLearning
+
+
+def _transitions(n, n_states=5, n_actions=2, seed=0):
+    rng = np.random.RandomState(seed)
+
+    return [(np.array([rng.randint(n_states)]),
+             np.array([rng.randint(n_actions)]), rng.uniform(),
+             np.array([rng.randint(n_states)]), rng.uniform() < .05, False)
+            for _ in range(n)]
+
+
+def _agent(algorithm, update_type):
+    mdp = generate_chain(horizon=100, gamma=0.99)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    if algorithm == 'particle':
+        return ParticleQLearning(WeightedPolicy(10), mdp.info, learning_rate,
+                                 n_approximators=10, q_min=0, q_max=10,
+                                 update_type=update_type)
+
+    sigma_lr = LogarithmicDecayParameter(value=1., C=10., size=mdp.info.size)
+
+    return GaussianQLearning(WeightedGaussianPolicy(), mdp.info, learning_rate,
+                             sigma_learning_rate=sigma_lr,
+                             update_type=update_type, init_values=(5., 3.))
+
+
+def test_visit_rounds_keep_the_order_of_the_block():
+    dataset = _transitions(200)
+    rounds = list(visit_rounds(dataset, 2))
+
+    assert np.array_equal(np.concatenate([r[0] for r in rounds]),
+                          [d[0][0] for d in dataset])
+    for state, action, _, next_state, absorbing in rounds:
+        keys = state * 2 + action
+        assert len(np.unique(keys)) == len(keys)
+        for i in range(len(state)):
+            assert absorbing[i] or next_state[i] not in state[:i]
+
+
+@pytest.mark.parametrize('algorithm,update_type', [
+    ('particle', 'weighted'), ('particle', 'distributional'),
+    ('gaussian', 'weighted')])
+def test_batched_fit_matches_sequential_fit(algorithm, update_type):
+    dataset = _transitions(600)
+    sequential = _agent(algorithm, update_type)
+    for sample in dataset:
+        sequential.fit([sample])
+    batched = _agent(algorithm, update_type)
+    for i in range(0, len(dataset), 60):
+        batched.fit(dataset[i:i + 60])
+
+    assert np.allclose(batched.Q.table, sequential.Q.table)
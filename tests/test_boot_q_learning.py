@@ -0,0 +1,124 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from boot_q_learning import BootstrappedDoubleQLearning, \
+    BootstrappedQLearning
+from envs.chain import generate_chain
+from policy import BootPolicy
+
+
+def _transitions(n, n_states, n_actions, seed):
+    rng = np.random.RandomState(seed)
+    state = rng.randint(n_states, size=n)
+    # Half of the transitions are self-loops
+    next_state = np.where(rng.rand(n) < .5, state,
+                          rng.randint(n_states, size=n))
+
+    return [(np.array([state[i]]), np.array([rng.randint(n_actions)]),
+             rng.randn(), np.array([next_state[i]]), rng.rand() < .1)
+            for i in range(n)]
+
+
+def _update(table, alpha, mask, cross_update, gamma, state, action, reward,
+            next_state, absorbing):
+    # Update of the models one at a time, as in the original implementation
+    s, a = state[0], action[0]
+    q_current = table[:, s, a].copy()
+    for i in np.argwhere(mask).ravel():
+        if cross_update:
+            idx = np.random.randint(len(table))
+        else:
+            idx = i
+        q_next = np.max(table[idx, next_state[0]]) if not absorbing else 0.
+        table[i, s, a] = q_current[i] + alpha[i](state, action) * (
+            reward + gamma * q_next - q_current[i])
+
+
+@pytest.mark.parametrize('cross_update', [False, True])
+@pytest.mark.parametrize('sparse', [False, True])
+def test_update_matches_the_sequential_update(cross_update, sparse):
+    np.random.seed(0)
+    mdp = generate_chain(n=3)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    agent = BootstrappedQLearning(BootPolicy(5), mdp.info, learning_rate,
+                                  n_approximators=5, p=.6,
+                                  cross_update=cross_update, sparse=sparse)
+    if sparse:
+        # The initial values are drawn before the updates
+        for state in range(mdp.info.size[0]):
+            agent.Q.predict_all(np.array([state]))
+        table = agent.Q.to_dense()
+    else:
+        table = agent.Q.table.copy()
+    alpha = deepcopy(agent.alpha)
+    for transition in _transitions(300, 3, 2, 1):
+        mask = agent._mask.copy()
+        random_state = np.random.get_state()
+        agent._update(*transition)
+        next_random_state = np.random.get_state()
+        np.random.set_state(random_state)
+        _update(table, alpha, mask, cross_update, mdp.info.gamma,
+                *transition)
+        np.random.set_state(next_random_state)
+
+    if sparse:
+        assert np.allclose(agent.Q.to_dense(), table)
+    else:
+        assert np.allclose(agent.Q.table, table)
+
+
+def _double_update(tables, alpha, mask, cross_update, gamma, state, action,
+                   reward, next_state, absorbing):
+    # Update of two separate tables one model at a time, with the random
+    # draws in the order of BootstrappedDoubleQLearning: the estimate, the
+    # models of the cross updates, then the tie-breaking of all the models
+    s, a, ns = state[0], action[0], next_state[0]
+    i_q = 0 if np.random.uniform() < .5 else 1
+    models = np.argwhere(mask).ravel()
+    q_current = tables[i_q][models, s, a].copy()
+    alpha = [alpha[i_q][i](state, action) for i in models]
+    if not absorbing:
+        if cross_update:
+            idx = np.random.randint(len(mask), size=len(models))
+        else:
+            idx = models
+        u = np.random.uniform(size=(len(models), tables[0].shape[-1]))
+    for k, i in enumerate(models):
+        if absorbing:
+            q_next = 0.
+        else:
+            q_ss = tables[i_q][idx[k], ns]
+            a_n = np.argmax((1 + u[k]) * (q_ss == np.max(q_ss)))
+            q_next = tables[1 - i_q][idx[k], ns, a_n]
+        tables[i_q][i, s, a] = q_current[k] + alpha[k] * (
+            reward + gamma * q_next - q_current[k])
+
+
+@pytest.mark.parametrize('cross_update', [False, True])
+def test_double_update_matches_the_two_tables(cross_update):
+    np.random.seed(0)
+    mdp = generate_chain(n=3)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    agent = BootstrappedDoubleQLearning(BootPolicy(5), mdp.info,
+                                        learning_rate, n_approximators=5,
+                                        p=.6, cross_update=cross_update)
+    tables = [agent.Qs.table[i].copy() for i in range(2)]
+    alpha = deepcopy(agent.alpha)
+    for transition in _transitions(300, 3, 2, 1):
+        mask = agent._mask.copy()
+        random_state = np.random.get_state()
+        agent._update(*transition)
+        next_random_state = np.random.get_state()
+        np.random.set_state(random_state)
+        _double_update(tables, alpha, mask, cross_update, mdp.info.gamma,
+                       *transition)
+        np.random.set_state(next_random_state)
+
+    for i in range(2):
+        assert np.allclose(agent.Qs[i].table, tables[i])
+    assert np.allclose(agent.Q.table, np.mean(tables, axis=0))
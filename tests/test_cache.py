@@ -0,0 +1,45 @@
+import numpy as np
+
+from envs.cache import cache_key, cached_mdp
+from envs.chain import generate_chain
+from envs.gridworld import generate_gridworld_mdp
+
+
+def test_cached_mdp_loads_the_arrays_of_the_generated_mdp(tmp_path):
+    cache_dir = str(tmp_path)
+    mdp = cached_mdp(generate_chain, 5, cache_dir=cache_dir, horizon=100)
+    cached = cached_mdp(generate_chain, 5, cache_dir=cache_dir, horizon=100)
+
+    for a, b in [(mdp.p, cached.p), (mdp.r, cached.r), (mdp.mu, cached.mu)]:
+        assert isinstance(b, np.memmap)
+        assert not b.flags.writeable
+        assert np.array_equal(a, b)
+    assert cached.info.gamma == mdp.info.gamma
+    assert cached.info.horizon == 100
+
+
+def test_cached_mdp_loads_the_sparse_transitions(tmp_path):
+    cache_dir = str(tmp_path)
+    mdp = cached_mdp(generate_gridworld_mdp, cache_dir=cache_dir,
+                     shape=(4, 4), sparse=True)
+    cached = cached_mdp(generate_gridworld_mdp, cache_dir=cache_dir,
+                        shape=(4, 4), sparse=True)
+
+    for name in ['next_states', 'probs', 'rewards']:
+        assert isinstance(getattr(cached.p, name), np.memmap)
+        assert np.array_equal(getattr(mdp.p, name), getattr(cached.p, name))
+    assert np.array_equal(mdp.mu, cached.mu)
+
+
+def test_cache_key_depends_on_the_arguments():
+    key = cache_key(generate_chain, [5], dict(horizon=100))
+
+    assert key == cache_key(generate_chain, [5], dict(horizon=100))
+    assert key != cache_key(generate_chain, [6], dict(horizon=100))
+    assert key != cache_key(generate_chain, [5], dict(horizon=10))
+
+
+def test_cached_mdp_without_cache_dir_builds_the_mdp():
+    mdp = cached_mdp(generate_chain, 5, cache_dir=None)
+
+    assert not isinstance(mdp.p, np.memmap)
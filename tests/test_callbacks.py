@@ -0,0 +1,146 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from mushroom.core import Core
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from envs.chain import generate_chain
+from particle_q_learning import ParticleQLearning
+from policy import WeightedPolicy
+from utils.callbacks import CollectQs, CollectVs, ScoreAccumulator, \
+    evaluate_scores, load_qs
+from utils.checkpoint import get_state, set_state
+
+
+def _dataset(rewards, lasts):
+    return [(None, None, r, None, False, l) for r, l in zip(rewards, lasts)]
+
+
+def test_score_accumulator_matches_the_episodes_of_the_dataset():
+    accumulator = ScoreAccumulator(gamma=.5)
+    accumulator(_dataset([1., 2., 3., 4., 5., 6.],
+                         [False, True, False, False, True, False]))
+    scores = accumulator.get_scores()
+
+    returns = np.array([3., 12.])
+    disc_returns = np.array([1. + 2. * .5, 3. + 4. * .5 + 5. * .25])
+    assert scores[0] == 6
+    assert np.allclose(scores[1:5], [returns.min(), returns.max(),
+                                     returns.mean(), returns.std()])
+    assert np.allclose(scores[5:9], [disc_returns.min(), disc_returns.max(),
+                                     disc_returns.mean(), disc_returns.std()])
+    assert scores[9] == 2.5
+    assert scores[10] == 2
+
+
+def test_score_accumulator_without_episodes_has_the_same_layout():
+    accumulator = ScoreAccumulator()
+    accumulator(_dataset([1., 2.], [True, False]))
+    scores = accumulator.get_scores()
+    accumulator.clean()
+    accumulator(_dataset([1., 2.], [False, False]))
+    empty_scores = accumulator.get_scores()
+
+    assert len(empty_scores) == len(scores)
+    assert empty_scores[0] == 2
+    assert all(x == 0 for x in empty_scores[1:])
+
+
+def _build_core(seed):
+    np.random.seed(seed)
+    mdp = generate_chain(horizon=20, gamma=0.99)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    agent = ParticleQLearning(WeightedPolicy(10), mdp.info, learning_rate,
+                              n_approximators=10, q_min=0, q_max=40)
+
+    return Core(agent, mdp)
+
+
+def test_evaluate_scores_matches_the_dataset_of_the_core():
+    core = _build_core(0)
+    accumulator = ScoreAccumulator(core.mdp.info.gamma)
+    accumulator(core.evaluate(n_steps=300, quiet=True))
+
+    scores = evaluate_scores(_build_core(0), 300, core.mdp.info.gamma,
+                             quiet=True)
+
+    assert scores == accumulator.get_scores()
+
+
+class _Approximator(object):
+    def __init__(self):
+        self.table = np.zeros((3, 2))
+
+
+def _collect(approximator, collect_qs, start, stop):
+    for i in range(start, stop):
+        approximator.table[i % 3, i % 2] += 1.
+        collect_qs()
+
+
+def _run_collect_qs(path, deltas):
+    approximator = _Approximator()
+    collect_qs = CollectQs(approximator, path, n_steps=20, stride=2,
+                           deltas=deltas)
+    _collect(approximator, collect_qs, 0, 20)
+    collect_qs.close()
+
+    return load_qs(path)
+
+
+def _resume_collect_qs(path, deltas):
+    approximator = _Approximator()
+    collect_qs = CollectQs(approximator, path, n_steps=20, stride=2,
+                           deltas=deltas)
+    _collect(approximator, collect_qs, 0, 10)
+    state = deepcopy(get_state([approximator, collect_qs]))
+    # The steps after the checkpoint are lost with the interrupted run
+    _collect(approximator, collect_qs, 10, 13)
+    collect_qs.close()
+
+    approximator = _Approximator()
+    collect_qs = CollectQs(approximator, path, n_steps=20, stride=2,
+                           deltas=deltas, resume=True)
+    set_state([approximator, collect_qs], state)
+    _collect(approximator, collect_qs, 10, 20)
+    collect_qs.close()
+
+    return load_qs(path)
+
+
+@pytest.mark.parametrize('deltas', [False, True])
+def test_resumed_collect_qs_continues_the_file(tmp_path, deltas):
+    qs = _run_collect_qs(str(tmp_path / 'qs.npy'), deltas)
+    resumed_qs = _resume_collect_qs(str(tmp_path / 'resumed_qs.npy'), deltas)
+
+    assert qs.shape == (10, 1, 3, 2)
+    assert np.array_equal(qs, resumed_qs)
+
+
+@pytest.mark.parametrize('block', [1, 3, 8])
+def test_collect_qs_counts_the_steps_of_the_blocks(block):
+    approximator = _Approximator()
+    collect_qs = CollectQs(approximator, stride=4)
+    for i in range(0, 20, block):
+        collect_qs(dataset=[None] * min(block, 20 - i))
+
+    assert len(collect_qs.get_values()) == 5
+
+
+class _Agent(object):
+    def get_policy(self):
+        return None
+
+
+@pytest.mark.parametrize('block', [1, 3, 8])
+def test_collect_vs_counts_the_steps_of_the_blocks(block):
+    mdp = generate_chain()
+    collect_vs = CollectVs(mdp, _Agent(), lambda p, r, policy: [0.],
+                           frequency=4)
+    for i in range(0, 20, block):
+        n = min(block, 20 - i)
+        collect_vs([(np.array([0]), None, 0., None, False, False)] * n)
+
+    assert len(collect_vs.get_values()) == 5
@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+from mushroom.core import Core
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from envs.chain import generate_chain
+from particle_q_learning import ParticleQLearning
+from policy import WeightedPolicy
+from utils.callbacks import ScoreAccumulator
+from utils.checkpoint import get_rng_state, get_state, load_checkpoint, \
+    save_checkpoint, set_rng_state, set_state
+
+
+class _Holder(object):
+    def __init__(self):
+        self.values = [1, (2., np.zeros(3)), np.zeros(2), [3, 'a']]
+        self.named = dict(a=1.5, b=np.zeros(2), c=[4, 5])
+        self.rng = np.random.RandomState(0)
+        self.py_rng = random.Random(0)
+
+
+def test_set_state_restores_values_in_containers():
+    holder = _Holder()
+    holder.values[0] = 10
+    holder.values[1][1][:] = 1.
+    holder.values[3][0] = 30
+    holder.named['a'] = 2.5
+    holder.named['b'][:] = 3.
+    state = get_state(holder)
+
+    restored = _Holder()
+    b = restored.named['b']
+    set_state(restored, state)
+
+    assert restored.values[0] == 10
+    assert np.array_equal(restored.values[1][1], np.ones(3))
+    assert restored.values[3] == [30, 'a']
+    assert restored.named['a'] == 2.5
+    assert restored.named['b'] is b
+    assert np.array_equal(b, 3 * np.ones(2))
+
+
+def test_set_state_restores_random_generators():
+    holder = _Holder()
+    holder.rng.uniform(size=5)
+    holder.py_rng.random()
+    state = get_state(holder)
+    expected = holder.rng.uniform(size=5), holder.py_rng.random()
+
+    restored = _Holder()
+    set_state(restored, state)
+
+    assert np.array_equal(restored.rng.uniform(size=5), expected[0])
+    assert restored.py_rng.random() == expected[1]
+
+
+def test_get_state_skips_memmaps_and_skipped_objects(tmp_path):
+    path = str(tmp_path / 'p.npy')
+    np.save(path, np.ones((2, 2)))
+    holder = _Holder()
+    holder.p = np.load(path, mmap_mode='r')
+    holder.r = np.ones((2, 2))
+
+    state = get_state(holder, skip=[holder.r])
+
+    assert state[1]['p'] is None
+    assert state[1]['r'] is None
+
+
+def _build(seed):
+    np.random.seed(seed)
+    mdp = generate_chain(horizon=100, gamma=0.99)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    pi = WeightedPolicy(10)
+    agent = ParticleQLearning(pi, mdp.info, learning_rate, n_approximators=10,
+                              q_min=0, q_max=400)
+    accumulator = ScoreAccumulator(mdp.info.gamma)
+    core = Core(agent, mdp, [accumulator])
+
+    return core, [agent, pi, mdp, [accumulator]], [mdp.p, mdp.r, mdp.mu]
+
+
+def test_resumed_tabular_run_matches_uninterrupted_run(tmp_path):
+    path = str(tmp_path / 'checkpoint.npz')
+    core, objects, skip = _build(0)
+    core.learn(n_steps=500, n_steps_per_fit=1, quiet=True)
+    save_checkpoint(path, dict(objects=get_state(objects, skip=skip),
+                               rng=get_rng_state()))
+    core.learn(n_steps=500, n_steps_per_fit=1, quiet=True)
+
+    resumed_core, resumed_objects, _ = _build(1)
+    state, _ = load_checkpoint(path)
+    set_state(resumed_objects, state['objects'])
+    set_rng_state(state['rng'])
+    resumed_core.learn(n_steps=500, n_steps_per_fit=1, quiet=True)
+
+    assert np.array_equal(objects[0].Q.table, resumed_objects[0].Q.table)
+    assert objects[3][0].get_scores() == resumed_objects[3][0].get_scores()
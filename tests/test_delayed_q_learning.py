@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from mushroom.utils.parameters import Parameter
+
+from delayed_q_learning import DelayedQLearning
+from envs.chain import generate_chain
+
+
+def _dataset(n, n_states, n_actions, seed):
+    rng = np.random.RandomState(seed)
+
+    return [(np.array([rng.randint(n_states)]),
+             np.array([rng.randint(n_actions)]), rng.rand(),
+             np.array([rng.randint(n_states)]), rng.rand() < .05, False)
+            for _ in range(n)]
+
+
+def _agent(m):
+    mdp = generate_chain(n=4, gamma=.9)
+
+    return DelayedQLearning(mdp.info, Parameter(1.), m=m, epsilon=1.)
+
+
+@pytest.mark.parametrize('m', [1, 3, 10])
+@pytest.mark.parametrize('block', [7, 500, 20000])
+def test_block_update_matches_the_sequential_update(m, block):
+    dataset = _dataset(20000, 4, 2, m)
+    agent = _agent(m)
+    for i in range(0, len(dataset), block):
+        agent.fit(dataset[i:i + block])
+    reference = _agent(m)
+    for sample in dataset:
+        reference._update(*sample[:-1])
+
+    assert reference.last_t > 0
+    assert agent.update_count == reference.update_count
+    assert agent.last_t == reference.last_t
+    assert np.array_equal(agent.Q.table, reference.Q.table)
+    for name in ['U', 'l', 'b', 'LEARN', 'policy_matrix']:
+        assert np.array_equal(getattr(agent, name), getattr(reference, name))
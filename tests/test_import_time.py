@@ -0,0 +1,8 @@
+import pytest
+
+from benchmarks.import_time import MODULES, measure
+
+
+@pytest.mark.parametrize('folder,module', MODULES)
+def test_tabular_modules_do_not_import_tensorflow(folder, module):
+    assert not measure(folder, module)['tensorflow']
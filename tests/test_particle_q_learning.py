@@ -0,0 +1,106 @@
+import itertools
+from copy import deepcopy
+
+import numpy as np
+import pytest
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from envs.chain import generate_chain
+from particle_q_learning import ParticleDoubleQLearning, ParticleQLearning
+from policy import WeightedPolicy
+
+
+def _q_list(seed, n_approximators, n_actions):
+    rng = np.random.RandomState(seed)
+    # Rounded values, to have ties between and within the actions
+    return np.round(rng.randn(n_approximators, n_actions), 1)
+
+
+def _max_distribution(q_list):
+    # Distribution of the maximum of one particle drawn for each action
+    q_array = np.array(q_list)
+    maxima = [max(x) for x in itertools.product(*q_array.T)]
+    values, counts = np.unique(maxima, return_counts=True)
+
+    return values, counts / len(maxima)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_max_distribution_matches_the_enumeration(seed):
+    q_list = _q_list(seed, 4, 3)
+    values, pdf = ParticleQLearning._compute_max_distribution(q_list)
+    expected_values, expected_pdf = _max_distribution(q_list)
+
+    support = pdf > 0
+    assert np.isclose(pdf.sum(), 1.)
+    assert np.array_equal(values[support], expected_values)
+    assert np.allclose(pdf[support], expected_pdf)
+
+
+@pytest.mark.parametrize('seed', range(50))
+@pytest.mark.parametrize('n_approximators, n_actions', [(3, 2), (10, 4),
+                                                        (7, 5)])
+def test_projected_distribution_keeps_the_particles_and_the_mean(
+        seed, n_approximators, n_actions):
+    q_list = _q_list(seed, n_approximators, n_actions)
+    values, pdf = ParticleQLearning._compute_max_distribution(q_list)
+    particles = ParticleQLearning._project_distribution(values, pdf,
+                                                        n_approximators)
+
+    assert len(particles) == n_approximators
+    assert np.all(np.diff(particles) >= -1e-12)
+    assert np.isclose(np.mean(particles), np.sum(values * pdf))
+
+
+def _double_update(tables, alpha, update_type, gamma, state, action, reward,
+                   next_state, absorbing):
+    # Update of two separate tables, one model at a time
+    s, a = state[0], action[0]
+    i_q = 0 if np.random.uniform() < .5 else 1
+    q_current = tables[i_q][:, s, a].copy()
+    if absorbing:
+        q_next = np.zeros(len(q_current))
+    else:
+        q_next_all = tables[i_q][:, next_state[0]]
+        q_next_all_2 = tables[1 - i_q][:, next_state[0]]
+        if update_type == 'mean':
+            q_next_mean = np.mean(q_next_all, axis=0)
+            next_index = np.random.choice(np.argwhere(
+                q_next_mean == np.max(q_next_mean)).ravel())
+            q_next = q_next_all_2[:, next_index]
+        else:
+            prob = ParticleQLearning._compute_prob_max(q_next_all)
+            q_next = np.sum(q_next_all_2 * prob, axis=1)
+    for i in range(len(q_current)):
+        tables[i_q][i, s, a] = q_current[i] + alpha[i_q][i](state, action) * (
+            reward + gamma * q_next[i] - q_current[i])
+
+
+@pytest.mark.parametrize('update_type', ['mean', 'weighted'])
+def test_double_update_matches_the_two_tables(update_type):
+    np.random.seed(0)
+    mdp = generate_chain(n=3)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    agent = ParticleDoubleQLearning(WeightedPolicy(5), mdp.info,
+                                    learning_rate, n_approximators=5,
+                                    update_type=update_type, q_min=0,
+                                    q_max=10)
+    tables = [agent.Qs.table[i].copy() for i in range(2)]
+    alpha = deepcopy(agent.alpha)
+    rng = np.random.RandomState(1)
+    for _ in range(300):
+        transition = (np.array([rng.randint(3)]), np.array([rng.randint(2)]),
+                      rng.randn(), np.array([rng.randint(3)]),
+                      rng.rand() < .1)
+        random_state = np.random.get_state()
+        agent._update(*transition)
+        next_random_state = np.random.get_state()
+        np.random.set_state(random_state)
+        _double_update(tables, alpha, update_type, mdp.info.gamma,
+                       *transition)
+        np.random.set_state(next_random_state)
+
+    for i in range(2):
+        assert np.array_equal(agent.Qs[i].table, tables[i])
+    assert np.allclose(agent.Q.table, np.mean(tables, axis=0))
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from envs.chain import generate_chain
+from parameter import LogarithmicDecayParameter, set_count_dtype
+from particle_q_learning import ParticleQLearning
+from policy import WeightedGaussianPolicy, WeightedPolicy
+from wq_learning import GaussianQLearning
+
+
+def _transitions(mdp, n, seed=0):
+    rng = np.random.RandomState(seed)
+    n_states, n_actions = mdp.info.size
+    transitions = list()
+    state = mdp.reset()
+    for _ in range(n):
+        action = np.array([rng.randint(n_actions)])
+        next_state, reward, absorbing, _ = mdp.step(action)
+        transitions.append((state, action, reward, next_state, absorbing,
+                            False))
+        state = next_state
+
+    return transitions
+
+
+def _fit(algorithm, dtype, transitions, mdp):
+    # Same setup of q_learning/run.py with --precision
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    if dtype != np.float64:
+        set_count_dtype(learning_rate, np.int32)
+    if algorithm == 'particle':
+        agent = ParticleQLearning(WeightedPolicy(10), mdp.info, learning_rate,
+                                  n_approximators=10, q_min=0, q_max=400,
+                                  dtype=dtype)
+    else:
+        sigma_lr = LogarithmicDecayParameter(value=1., C=10.,
+                                             size=mdp.info.size)
+        if dtype != np.float64:
+            set_count_dtype(sigma_lr, np.int32)
+        agent = GaussianQLearning(WeightedGaussianPolicy(), mdp.info,
+                                  learning_rate, sigma_learning_rate=sigma_lr,
+                                  init_values=(200., 115.), dtype=dtype)
+    for sample in transitions:
+        agent.fit([sample])
+
+    return agent.Q.table
+
+
+@pytest.mark.parametrize('algorithm', ['particle', 'gaussian'])
+def test_float32_action_values_stay_close_to_float64(algorithm):
+    np.random.seed(0)
+    mdp = generate_chain(horizon=100, gamma=0.99)
+    transitions = _transitions(mdp, 2000)
+
+    q_64 = _fit(algorithm, np.float64, transitions, mdp)
+    q_32 = _fit(algorithm, np.float32, transitions, mdp)
+
+    assert q_32.dtype == np.float32
+    assert np.allclose(q_32, q_64, rtol=1e-4, atol=1e-3)
+
+
+def test_set_count_dtype_keeps_the_values_of_the_parameter():
+    parameter = ExponentialDecayParameter(value=1., decay_exp=.5, size=(3, 2))
+    int_parameter = set_count_dtype(
+        ExponentialDecayParameter(value=1., decay_exp=.5, size=(3, 2)),
+        np.int32)
+
+    assert int_parameter._n_updates.table.dtype == np.int32
+    for s, a in [(0, 1), (2, 0), (0, 1), (0, 1)]:
+        idx = np.array([s]), np.array([a])
+        assert int_parameter(*idx) == parameter(*idx)
+    assert np.array_equal(int_parameter._n_updates.table,
+                          parameter._n_updates.table)
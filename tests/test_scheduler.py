@@ -0,0 +1,62 @@
+import os
+
+from utils.result_store import ResultStore
+from utils.scheduler import SweepScheduler
+
+
+def _square(x):
+    return x ** 2
+
+
+def _fail(x):
+    raise ValueError('failed run %d' % x)
+
+
+def _pid(x):
+    return os.getpid()
+
+
+def _run(n_workers):
+    scheduler = SweepScheduler(n_workers=n_workers)
+    for x in range(3):
+        scheduler.add('a', _square, [x])
+    scheduler.add('b', _fail, [1])
+    scheduler.add('b', _square, [4])
+
+    errors = list()
+    results = scheduler.run(
+        on_error=lambda group, index, error: errors.append((group, index,
+                                                            error)))
+
+    return results, errors
+
+
+def test_failed_task_does_not_stop_the_sweep():
+    for n_workers in [1, 2]:
+        results, errors = _run(n_workers)
+
+        assert results == dict(a=[0, 1, 4], b=[None, 16])
+        assert len(errors) == 1
+        assert errors[0][:2] == ('b', 0)
+        assert 'failed run 1' in errors[0][2]
+
+
+def test_single_task_runs_in_the_current_process():
+    scheduler = SweepScheduler(n_workers=4)
+    scheduler.add('a', _pid, [0])
+
+    assert scheduler.run() == dict(a=[os.getpid()])
+
+
+def test_failure_is_recorded_and_the_run_left_incomplete(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    config = dict(name='Chain', algorithm='particle-ql')
+    key = store.start(config, 0)
+    store.append(key, 'test', 1, range(11))
+    store.fail(config, 0, 'Traceback: error')
+    store.fail(config, 1, 'Traceback: other error')
+
+    assert not store.is_completed(config, 0)
+    assert store.error(config, 0) == 'Traceback: error'
+    assert store.error(config, 1) == 'Traceback: other error'
+    assert len(store.scores(key, 'test')) == 1
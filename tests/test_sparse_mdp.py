@@ -0,0 +1,39 @@
+import numpy as np
+
+from envs.gridworld import generate_gridworld_mdp
+from value_iteration.value_iteration import ValueIteration, evaluate_policy
+
+
+def _mdps(shape=(4, 5)):
+    return generate_gridworld_mdp(shape=shape, gamma=.9), \
+        generate_gridworld_mdp(shape=shape, gamma=.9, sparse=True)
+
+
+def test_sparse_transitions_match_the_dense_matrices():
+    dense, sparse = _mdps()
+    p, r = sparse.p.to_dense()
+
+    assert np.allclose(p, dense.p)
+    assert np.allclose(r[p > 0], dense.r[p > 0])
+    assert np.array_equal(sparse.mu, dense.mu)
+
+
+def test_sparse_value_iteration_matches_the_dense_one():
+    dense, sparse = _mdps()
+    dense_vi = ValueIteration(dense, .9)
+    dense_vi.fit(tol=1e-10)
+    sparse_vi = ValueIteration(sparse, .9)
+    sparse_vi.fit(tol=1e-10)
+
+    assert np.allclose(sparse_vi.get_v_function(), dense_vi.get_v_function())
+    assert np.allclose(sparse_vi.get_q_function(), dense_vi.get_q_function())
+
+
+def test_sparse_policy_evaluation_matches_the_dense_one():
+    dense, sparse = _mdps()
+    rng = np.random.RandomState(0)
+    policy = rng.uniform(size=dense.p.shape[:2])
+    policy /= policy.sum(axis=1, keepdims=True)
+
+    assert np.allclose(evaluate_policy(sparse.p, sparse.r, policy, .9),
+                       evaluate_policy(dense.p, dense.r, policy, .9))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from synthetic import SyntheticAtari
+
+
+def _play(mdp):
+    mdp.reset()
+    n_steps = 0
+    absorbing = False
+    while not absorbing:
+        _, _, absorbing, info = mdp.step(np.array([0]))
+        n_steps += 1
+
+    return n_steps, info['lives']
+
+
+@pytest.mark.parametrize('n_lives', [0, 11])
+def test_lives_are_checked(n_lives):
+    with pytest.raises(ValueError):
+        SyntheticAtari(game_length=10, n_lives=n_lives)
+
+
+def test_game_is_over_with_the_last_life():
+    mdp = SyntheticAtari(game_length=10, n_lives=3, max_no_op_actions=0)
+
+    assert _play(mdp) == (9, 0)
+
+
+def test_lost_life_ends_the_episode_with_the_episode_end():
+    mdp = SyntheticAtari(game_length=10, n_lives=10, max_no_op_actions=0,
+                         ends_at_life=True)
+
+    assert [_play(mdp) for _ in range(10)] == \
+        [(1, n_lives) for n_lives in range(9, -1, -1)]
+    assert _play(mdp) == (1, 9)
@@ -0,0 +1,71 @@
+import numpy as np
+from mushroom.core import Core
+from mushroom.utils.parameters import ExponentialDecayParameter
+
+from envs.chain import generate_chain
+from particle_q_learning import ParticleQLearning
+from policy import WeightedPolicy
+from utils.table import DoubleEnsembleTable, SparseEnsembleTable, \
+    StackedEnsembleTable
+
+
+def test_sparse_table_to_dense_matches_the_stacked_table():
+    init_values = np.array([1., 2., 3.])
+    sparse = SparseEnsembleTable(3, (5, 2), init_values=init_values)
+    stacked = StackedEnsembleTable(3, (5, 2))
+    stacked.table[:] = init_values[:, None, None]
+    for i, s, a, v in [(0, 3, 1, 10.), (2, 3, 0, 20.), (1, 0, 1, 30.)]:
+        sparse.model[i][np.array([s]), np.array([a])] = v
+        stacked.model[i][np.array([s]), np.array([a])] = v
+
+    assert sparse.n_rows == 2
+    assert np.array_equal(sparse.to_dense(), stacked.table)
+    for i in range(3):
+        assert np.array_equal(sparse.model[i].to_dense(), stacked.table[i])
+
+
+def test_sparse_table_to_dense_is_a_copy():
+    sparse = SparseEnsembleTable(2, (4, 2),
+                                 init_fun=lambda n, m: np.ones((n, m)))
+    sparse.row(1)
+    table = sparse.to_dense()
+    table[:] = 5.
+
+    assert np.array_equal(sparse.row(1), np.ones((2, 2)))
+    # The states never accessed have no value with a random prior
+    assert np.all(np.isnan(sparse.to_dense()[:, [0, 2, 3]]))
+
+
+def _learn(sparse):
+    np.random.seed(0)
+    mdp = generate_chain(horizon=100, gamma=0.99)
+    learning_rate = ExponentialDecayParameter(value=1., decay_exp=.2,
+                                              size=mdp.info.size)
+    agent = ParticleQLearning(WeightedPolicy(10), mdp.info, learning_rate,
+                              n_approximators=10, q_min=0, q_max=400,
+                              sparse=sparse)
+    Core(agent, mdp).learn(n_steps=500, n_steps_per_fit=1, quiet=True)
+
+    return agent.Q
+
+
+def test_sparse_agent_matches_the_dense_one():
+    assert np.array_equal(_learn(True).to_dense(), _learn(False).table)
+
+
+def test_double_table_keeps_the_average_of_the_estimates():
+    mean = StackedEnsembleTable(3, (4, 2))
+    double = DoubleEnsembleTable(mean)
+    double.table[:] = np.random.RandomState(0).randn(*double.table.shape)
+    double.update_mean()
+    estimates = [double[i].table.copy() for i in range(2)]
+    for i_q, s, a, values, models in [
+            (0, 1, 0, [1., 2., 3.], slice(None)),
+            (1, 1, 0, [4., 5.], np.array([0, 2])),
+            (1, 3, 1, 6., 1)]:
+        double.update(i_q, np.array([s]), np.array([a]), values, models)
+        estimates[i_q][models, s, a] = values
+
+    for i in range(2):
+        assert np.array_equal(double[i].table, estimates[i])
+    assert np.allclose(mean.table, np.mean(estimates, axis=0))
@@ -0,0 +1,66 @@
+import numpy as np
+from mushroom.utils.dataset import parse_dataset
+
+
+def visit_rounds(dataset, n_actions):
+    """
+    Split a block of transitions of a tabular MDP in rounds of consecutive
+    transitions whose updates can be vectorized with the same result as the
+    sequential updates. A round ends before the first transition whose
+    state-action pair is already in the round, or whose next state has
+    been updated earlier in the round (the action values of an absorbing
+    next state are not read).
+
+    Args:
+        dataset (list): the block of transitions;
+        n_actions (int): the number of actions of the MDP.
+
+    Returns:
+        The generator of the (states, actions, rewards, next_states,
+        absorbing) arrays of the transitions of each round.
+
+    """
+    state, action, reward, next_state, absorbing, _ = parse_dataset(dataset)
+    state = state.ravel().astype(int)
+    action = action.ravel().astype(int)
+    next_state = next_state.ravel().astype(int)
+    absorbing = absorbing.astype(bool)
+    keys = state * n_actions + action
+
+    start = 0
+    pairs = set()
+    states = set()
+    for i in range(len(keys) + 1):
+        if i == len(keys) or keys[i] in pairs or \
+                not absorbing[i] and next_state[i] in states:
+            idx = slice(start, i)
+            yield state[idx], action[idx], reward[idx], next_state[idx], \
+                absorbing[idx]
+            start = i
+            pairs.clear()
+            states.clear()
+        if i < len(keys):
+            pairs.add(keys[i])
+            states.add(state[i])
+
+
+def learning_rates(alpha, states, actions):
+    """
+    Returns:
+        The values of the learning rate in the given distinct state-action
+        pairs, updating its visits.
+
+    """
+    return np.array([alpha(s, a) for s, a in zip(states, actions)])
+
+
+def random_argmax(values):
+    """
+    Returns:
+        The index of the maximum of each row of a 2D array, ties being broken
+        uniformly at random.
+
+    """
+    ties = values == np.max(values, axis=1, keepdims=True)
+
+    return np.argmax((1 + np.random.uniform(size=values.shape)) * ties, axis=1)
@@ -1,50 +1,240 @@
 from copy import deepcopy
+import json
+import os
 import numpy as np
 from mushroom.utils.table import EnsembleTable
+from tqdm import tqdm
 
 class CollectQs:
     """
     This callback can be used to collect the action values in all states at the
     current time step.
 
+    By default, the tables are copied in a list in memory. If a path is given,
+    the action values are written instead in a preallocated memory-mapped
+    array on disk, with shape (n_snapshots, n_heads, n_states, n_actions),
+    taking one snapshot every ``stride`` steps. With ``deltas``, only the
+    first snapshot is stored as an array, followed by the action values of
+    the (state, action) pairs that changed between two consecutive
+    snapshots. The values can be loaded lazily with ``load_qs``. The
+    callback can be checkpointed with the other objects of the run, and
+    a resumed run continues to write the file from the checkpointed
+    snapshot.
+
     """
-    def __init__(self, approximator):
+    def __init__(self, approximator, path=None, n_steps=None, stride=1,
+                 dtype=np.float32, deltas=False, resume=False):
         """
         Constructor.
 
         Args:
             approximator ([Table, EnsembleTable]): the approximator to use to
-                predict the action values.
+                predict the action values;
+            path (str, None): the path of the ``.npy`` file where the action
+                values are written;
+            n_steps (int, None): the number of steps of the run, used to
+                preallocate the file. Required if ``path`` is given;
+            stride (int, 1): number of steps between two snapshots;
+            dtype (np.dtype, np.float32): the type of the values written to
+                the file;
+            deltas (bool, False): whether to write only the action values
+                that changed since the previous snapshot;
+            resume (bool, False): whether to keep the snapshots already
+                written to ``path``, when the state of the callback is
+                restored from a checkpoint.
 
         """
         self._approximator = approximator
+        self._path = path
+        self._stride = stride
+        self._dtype = np.dtype(dtype)
+        self._deltas = deltas
 
         self._qs = list()
+        self._n_steps = 0
+        self._n_snapshots = 0
+        if path is not None:
+            assert n_steps is not None
+            resume = resume and os.path.exists(path)
+            tables = self._tables()
+            if deltas:
+                if not resume:
+                    np.save(path, tables.astype(self._dtype))
+                self._last = tables.copy()
+                # The file of the deltas is opened at the first write, when
+                # the number of records of a resumed run is known
+                self._deltas_file = None
+                self._n_records = 0
+                self._delta_type = _delta_type(tables.shape[0], self._dtype)
+            elif resume:
+                self._memmap = np.load(path, mmap_mode='r+')
+            else:
+                n_snapshots = (n_steps + stride - 1) // stride
+                self._memmap = np.lib.format.open_memmap(
+                    path, mode='w+', dtype=self._dtype,
+                    shape=(n_snapshots,) + tables.shape)
+
+    def _tables(self):
+        if isinstance(self._approximator, EnsembleTable):
+            # The stacked and sparse ensembles build all the tables at once
+            if hasattr(self._approximator, 'to_dense'):
+                return self._approximator.to_dense()
+            if hasattr(self._approximator, 'table'):
+                return self._approximator.table
+            return np.array([m.table for m in self._approximator.model])
+
+        return self._approximator.table[None]
 
     def __call__(self, **kwargs):
         """
-        Add action values to the action-values list.
+        Add action values to the action-values list. A snapshot is taken
+        at the first step and every ``stride`` steps. When the agent is
+        fitted on blocks of steps, the snapshots of the steps of a block are
+        taken after the block.
 
         Args:
-            **kwargs (dict): empty dictionary.
+            **kwargs (dict): dictionary with the ``dataset`` of the steps since
+                the last call. Without it, a single step.
 
         """
-        if isinstance(self._approximator, EnsembleTable):
-            qs = list()
-            for m in self._approximator.model:
-                qs.append(m.table)
-            self._qs.append(deepcopy(qs))
+        dataset = kwargs.get('dataset')
+        n_steps = self._n_steps + (1 if dataset is None else len(dataset))
+        n_new = (n_steps + self._stride - 1) // self._stride - \
+            (self._n_steps + self._stride - 1) // self._stride
+        self._n_steps = n_steps
+        if n_new == 0:
+            return
+
+        if self._path is None:
+            if isinstance(self._approximator, EnsembleTable):
+                qs = list()
+                for m in self._approximator.model:
+                    qs.append(m.to_dense() if hasattr(m, 'to_dense')
+                              else m.table)
+                self._qs += [deepcopy(qs)] * n_new
+            else:
+                self._qs += [deepcopy(self._approximator.table)] * n_new
+        elif self._deltas:
+            tables = self._tables()
+            changed = np.argwhere(np.any(tables != self._last, axis=0))
+            if len(changed) > 0:
+                records = np.empty(len(changed), dtype=self._delta_type)
+                records['t'] = self._n_snapshots
+                records['s'] = changed[:, 0]
+                records['a'] = changed[:, 1]
+                records['q'] = tables[:, changed[:, 0], changed[:, 1]].T
+                self._open_deltas().write(records.tobytes())
+                self._n_records += len(records)
+                self._last[:, changed[:, 0], changed[:, 1]] = \
+                    tables[:, changed[:, 0], changed[:, 1]]
+        else:
+            self._memmap[self._n_snapshots:self._n_snapshots + n_new] = \
+                self._tables()
+        self._n_snapshots += n_new
+
+    def _open_deltas(self):
+        if self._deltas_file is None:
+            # The records written after the checkpoint are dropped
+            self._deltas_file = open(self._path + '.deltas', 'ab')
+            self._deltas_file.truncate(
+                self._n_records * self._delta_type.itemsize)
+
+        return self._deltas_file
+
+    def close(self):
+        """
+        Flush the action values written on disk and save the number of
+        snapshots taken, which is needed by ``load_qs``.
+
+        """
+        if self._path is None:
+            return
+
+        if self._deltas:
+            self._open_deltas().close()
         else:
-            self._qs.append(deepcopy(self._approximator.table))
+            self._memmap.flush()
+        with open(self._path + '.json', 'w') as f:
+            json.dump(dict(n_snapshots=self._n_snapshots, stride=self._stride,
+                           deltas=self._deltas), f)
 
     def get_values(self):
         """
         Returns:
-             The current action-values list.
+             The current action-values list, or the snapshots written to the
+             memory-mapped file.
 
         """
+        if self._path is not None and not self._deltas:
+            return self._memmap[:self._n_snapshots]
+
         return self._qs
 
+
+def _delta_type(n_heads, dtype):
+    return np.dtype([('t', np.int64), ('s', np.int32), ('a', np.int32),
+                     ('q', dtype, (n_heads,))])
+
+
+def load_qs(path, states=None):
+    """
+    Load the action values written by ``CollectQs``.
+
+    Args:
+        path (str): the path of the file;
+        states (list, None): the states to load. By default, all the states.
+
+    Returns:
+        The (n_snapshots, n_heads, n_states, n_actions) array of the action
+        values. Files saved as a whole array are loaded as they are.
+        Without deltas, it is a read-only memory map of the file, so only
+        the parts which are accessed are read from disk. With deltas, only
+        the values of the requested states are rebuilt.
+
+    """
+    if not os.path.exists(path + '.json'):
+        # Action values saved as a whole array
+        qs = np.load(path, mmap_mode='r')
+
+        return qs if states is None else qs[:, :, states]
+
+    with open(path + '.json') as f:
+        metadata = json.load(f)
+    n_snapshots = metadata['n_snapshots']
+
+    if not metadata['deltas']:
+        qs = np.load(path, mmap_mode='r')[:n_snapshots]
+
+        return qs if states is None else qs[:, :, states]
+
+    first = np.load(path)
+    if states is None:
+        states = np.arange(first.shape[1])
+    states = np.asarray(states)
+    first = first[:, states]
+
+    delta_type = _delta_type(first.shape[0], first.dtype)
+    if os.path.getsize(path + '.deltas') == 0:
+        records = np.empty(0, dtype=delta_type)
+    else:
+        records = np.memmap(path + '.deltas', mode='r', dtype=delta_type)
+    records = records[np.isin(records['s'], states)]
+
+    qs = np.empty((n_snapshots,) + first.shape, dtype=first.dtype)
+    qs[:] = first
+    steps = np.arange(n_snapshots)
+    for i, s in enumerate(states):
+        for a in range(first.shape[2]):
+            r = records[(records['s'] == s) & (records['a'] == a)]
+            if len(r) == 0:
+                continue
+            # Each snapshot takes the last value written up to its time
+            idx = np.searchsorted(r['t'], steps, side='right') - 1
+            valid = idx >= 0
+            qs[valid, :, i, a] = r['q'][idx[valid]]
+
+    return qs
+
 class CollectVs:
     """
     This callback can be used to collect the regret
@@ -55,7 +245,10 @@ class CollectVs:
         Constructor.
 
         Args:
-
+            frequency (int, 10000): number of steps between two evaluations
+                of the policy. When the agent is fitted on blocks of steps,
+                the evaluations of the steps of a block are made after the
+                block.
 
         """
         self.evaluate_policy = evaluate_policy
@@ -74,20 +267,23 @@ class CollectVs:
 
     def __call__(self, dataset):
         """
-        Add action values to the action-values list.
+        Evaluate the policy, every ``frequency`` steps.
 
         Args:
-            **kwargs (dict): empty dictionary.
+            dataset (list): the steps since the last call.
 
         """
-        if self.collect:
-            self.count += 1
-        if self.count % self.frequency == 0 and self.collect:
+        if not self.collect:
+            return
+
+        self.count += len(dataset)
+        n_new = self.count // self.frequency
+        if n_new > 0:
             v_func = list(self.evaluate_policy(self.mdp.p, self.mdp.r, self.agent.get_policy()))
 
             state = dataset[0][0][0]
-            self._vs.append(np.array(v_func+[state]))
-            self.count = 0
+            self._vs += [np.array(v_func+[state])] * n_new
+            self.count -= n_new * self.frequency
 
     def get_values(self):
         """
@@ -96,3 +292,137 @@ class CollectVs:
 
         """
         return self._vs
+
+
+class ScoreAccumulator:
+    """
+    This callback can be used to compute the scores of the episodes while the
+    steps are collected, without keeping the dataset. The return, the
+    discounted return and the length of the running episode are updated at
+    each step, and only the three values of each completed episode are
+    stored.
+
+    """
+    def __init__(self, gamma=1.):
+        """
+        Constructor.
+
+        Args:
+            gamma (float, 1.): the discount factor of the discounted returns.
+
+        """
+        self._gamma = gamma
+
+        self.clean()
+
+    def __call__(self, dataset):
+        """
+        Add the steps of a dataset.
+
+        Args:
+            dataset (list): the steps collected since the last call.
+
+        """
+        for sample in dataset:
+            self.add(sample[2], sample[-1])
+
+    def add(self, reward, last, stream=0):
+        """
+        Add a step.
+
+        Args:
+            reward (float): the reward of the step;
+            last (bool): whether the step is the last of its episode;
+            stream (int, 0): index of the environment of the step, when the
+                steps of several environments are interleaved.
+
+        """
+        score, disc_score, discount, length = self._running.get(
+            stream, (0., 0., 1., 0))
+        score += reward
+        disc_score += reward * discount
+        discount *= self._gamma
+        length += 1
+        self._n_steps += 1
+
+        if last:
+            self._episodes.append((score, disc_score, length))
+            self._running.pop(stream, None)
+        else:
+            self._running[stream] = (score, disc_score, discount, length)
+
+    def merge(self, accumulator):
+        """
+        Add the completed episodes of another accumulator.
+
+        Args:
+            accumulator (ScoreAccumulator): the other accumulator.
+
+        """
+        self._n_steps += accumulator._n_steps
+        self._episodes += accumulator._episodes
+
+    def get_scores(self):
+        """
+        Returns:
+            The number of steps and the minimum, maximum, mean and standard
+            deviation of the returns and of the discounted returns of the
+            completed episodes, followed by their mean length and number.
+            Without completed episodes, all the values but the number of
+            steps are zero.
+
+        """
+        if len(self._episodes) == 0:
+            scores = disc_scores = lens = np.zeros(1)
+        else:
+            scores, disc_scores, lens = [np.array(x)
+                                         for x in zip(*self._episodes)]
+
+        return self._n_steps, np.min(scores), np.max(scores), \
+            np.mean(scores), np.std(scores), np.min(disc_scores), \
+            np.max(disc_scores), np.mean(disc_scores), np.std(disc_scores), \
+            np.mean(lens), len(self._episodes)
+
+    def clean(self):
+        self._n_steps = 0
+        self._episodes = list()
+        self._running = dict()
+
+
+def evaluate_scores(core, n_steps, gamma=1., render=False, quiet=False):
+    """
+    Evaluate the agent of a core for a number of steps, computing the scores
+    of the episodes as the steps are collected instead of returning the
+    dataset.
+
+    Args:
+        core (Core): the core of the agent and of the environment. A
+            VectorCore moves all its environments;
+        n_steps (int): the number of steps;
+        gamma (float, 1.): the discount factor of the discounted returns;
+        render (bool, False): whether to render the environment;
+        quiet (bool, False): whether to hide the progress bar.
+
+    Returns:
+        The scores of the completed episodes, as returned by
+        ``ScoreAccumulator.get_scores``.
+
+    """
+    accumulator = ScoreAccumulator(gamma)
+    if hasattr(core.mdp, 'n_envs'):
+        core.evaluate(n_steps=n_steps, render=render, quiet=quiet,
+                      accumulator=accumulator)
+
+        return accumulator.get_scores()
+
+    # The steps are taken by the core itself, so that its preprocessing and
+    # end of the episodes are the same as in Core.evaluate
+    core.reset()
+    for _ in tqdm(range(n_steps), dynamic_ncols=True, disable=quiet,
+                  leave=False):
+        sample = core._step(render)
+        accumulator.add(sample[2], sample[-1])
+        if sample[-1]:
+            core.reset()
+
+    return accumulator.get_scores()
@@ -0,0 +1,239 @@
+import functools
+import numbers
+import os
+import pickle
+import random
+import types
+import zipfile
+
+import numpy as np
+
+
+_STATE_ENTRY = '__state__'
+_SKIPPED_TYPES = (types.FunctionType, types.MethodType,
+                  types.BuiltinFunctionType, types.ModuleType,
+                  functools.partial, type)
+_LEAF_TYPES = (np.ndarray, np.generic, numbers.Number, str, bytes, type(None))
+_RNG_TYPES = (np.random.RandomState, np.random.Generator, random.Random)
+
+
+def _is_leaf(value):
+    if isinstance(value, _LEAF_TYPES):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_leaf(v) for v in value)
+    if isinstance(value, dict):
+        return all(_is_leaf(v) for v in value.values())
+
+    return False
+
+
+def _get_rng(obj):
+    if isinstance(obj, np.random.RandomState):
+        return obj.get_state()
+    if isinstance(obj, np.random.Generator):
+        return obj.bit_generator.state
+
+    return obj.getstate()
+
+
+def _set_rng(obj, state):
+    if isinstance(obj, np.random.RandomState):
+        obj.set_state(state)
+    elif isinstance(obj, np.random.Generator):
+        obj.bit_generator.state = state
+    else:
+        obj.setstate(state)
+
+
+def get_state(obj, skip=None, _visited=None):
+    """
+    Collect the state of an object, i.e. the numeric values and the arrays
+    reachable from its attributes, without pickling the object itself.
+    Functions, modules and classes are not part of the state, so objects
+    holding closures (e.g. the score functions of the UCB policies) can
+    be checkpointed. Objects reachable more than once are visited once.
+    Memory-mapped arrays are on disk and are not part of the state, while
+    the random generators held by the objects (e.g. the ``np_random`` of the
+    gym environments) are.
+
+    Args:
+        obj (object): the object, or a list of objects;
+        skip (list, None): objects whose state is not collected, e.g. the
+            transition and reward arrays of an MDP rebuilt from its
+            configuration.
+
+    Returns:
+        The state of the object, to be restored with ``set_state``.
+
+    """
+    visited = set() if _visited is None else _visited
+    if _visited is None and skip is not None:
+        visited.update(id(o) for o in skip)
+
+    if id(obj) in visited or isinstance(obj, _SKIPPED_TYPES + (np.memmap,)):
+        return None
+    if _is_leaf(obj):
+        return 'value', obj
+    visited.add(id(obj))
+
+    if isinstance(obj, _RNG_TYPES):
+        return 'rng', _get_rng(obj)
+    if isinstance(obj, (list, tuple)):
+        return 'list', [get_state(v, _visited=visited) for v in obj]
+    if isinstance(obj, dict):
+        return 'dict', {k: get_state(v, _visited=visited)
+                        for k, v in obj.items()}
+    if not hasattr(obj, '__dict__'):
+        return None
+
+    return 'object', {k: get_state(v, _visited=visited)
+                      for k, v in vars(obj).items()}
+
+
+def _restore_value(current, value):
+    if isinstance(current, np.ndarray) and isinstance(value, np.ndarray) and \
+            current.shape == value.shape and current.dtype == value.dtype and \
+            current.flags.writeable:
+        current[...] = value
+
+        return current
+    if isinstance(current, list) and isinstance(value, list) and \
+            len(current) == len(value):
+        current[:] = [_restore_value(c, v) for c, v in zip(current, value)]
+
+        return current
+    if isinstance(current, dict) and isinstance(value, dict):
+        current.update({k: _restore_value(current.get(k), v)
+                        for k, v in value.items()})
+
+        return current
+
+    return value
+
+
+def set_state(obj, state):
+    """
+    Restore the state collected by ``get_state`` in an object built in the
+    same way as the original one. Arrays are copied in place, so that the
+    views on them (e.g. the heads of a StackedEnsembleTable) are preserved.
+    The values held by tuples cannot be replaced and are restored only when
+    they are arrays or objects.
+
+    Args:
+        obj (object): the object, or the list of objects;
+        state (tuple): the state of the object.
+
+    """
+    kind, value = state
+    if kind == 'rng':
+        _set_rng(obj, value)
+    elif kind == 'list':
+        for i, s in enumerate(value):
+            if s is None:
+                continue
+            if s[0] != 'value':
+                set_state(obj[i], s)
+            elif isinstance(obj, list):
+                obj[i] = _restore_value(obj[i], s[1])
+            else:
+                _restore_value(obj[i], s[1])
+    elif kind == 'dict':
+        for k, s in value.items():
+            if s is None:
+                continue
+            if s[0] == 'value':
+                obj[k] = _restore_value(obj.get(k), s[1])
+            elif k in obj:
+                set_state(obj[k], s)
+    elif kind == 'object':
+        for k, s in value.items():
+            if s is None:
+                continue
+            if s[0] == 'value':
+                setattr(obj, k, _restore_value(getattr(obj, k, None), s[1]))
+            else:
+                set_state(getattr(obj, k), s)
+
+
+def get_rng_state():
+    """
+    Returns:
+        The state of the numpy and python random number generators.
+
+    """
+    return dict(numpy=np.random.get_state(), python=random.getstate())
+
+
+def set_rng_state(state):
+    np.random.set_state(state['numpy'])
+    random.setstate(state['python'])
+
+
+def _write_array(archive, name, value):
+    with archive.open(name + '.npy', 'w', force_zip64=True) as f:
+        if isinstance(value, np.ndarray):
+            np.lib.format.write_array(f, value, allow_pickle=False)
+        else:
+            # A list of arrays with the same shape is written as their stack,
+            # one array at a time, without building the stack in memory
+            header = dict(descr=np.lib.format.dtype_to_descr(value[0].dtype),
+                          fortran_order=False,
+                          shape=(len(value),) + value[0].shape)
+            np.lib.format.write_array_header_2_0(f, header)
+            for v in value:
+                f.write(np.ascontiguousarray(v).tobytes())
+
+
+def save_checkpoint(path, state, arrays=None):
+    """
+    Atomically write a checkpoint. The checkpoint is an uncompressed npz
+    archive with one entry for each array and one entry for the pickled
+    state. It is first written to a temporary file, which then replaces the
+    previous checkpoint, so that an interrupted run always leaves a
+    complete checkpoint.
+
+    Args:
+        path (str): the path of the checkpoint;
+        state (dict): picklable state, e.g. counters, scores and the output
+            of ``get_state`` and ``get_rng_state``;
+        arrays (dict, None): large arrays to store in binary format. A list
+            of arrays with the same shape and type is stored as an array
+            stacking them.
+
+    """
+    folder = os.path.dirname(path)
+    if folder != '' and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    arrays = dict() if arrays is None else arrays
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED,
+                             allowZip64=True) as archive:
+            for name, value in arrays.items():
+                _write_array(archive, name, value)
+            _write_array(archive, _STATE_ENTRY, np.frombuffer(
+                pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL),
+                dtype=np.uint8))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Load a checkpoint written by ``save_checkpoint``.
+
+    Args:
+        path (str): the path of the checkpoint.
+
+    Returns:
+        The state and the dictionary of the arrays of the checkpoint.
+
+    """
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files if k != _STATE_ENTRY}
+        state = pickle.loads(data[_STATE_ENTRY].tobytes())
+
+    return state, arrays
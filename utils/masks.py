@@ -0,0 +1,84 @@
+import numpy as np
+
+
+class MaskStream(object):
+    """
+    Stream of the bootstrap masks of an ensemble, i.e. of the binary vectors
+    selecting the models updated with a transition. Each element of a mask is
+    an independent Bernoulli draw with probability p, as with one
+    ``np.random.binomial(1, p, n_approximators)`` call per transition, but
+    the masks are drawn in large blocks, so that the random generator is not
+    called at each step.
+
+    """
+    def __init__(self, n_approximators, p, block_size=4096):
+        """
+        Constructor.
+
+        Args:
+            n_approximators (int): the number of models of the ensemble;
+            p (float): the probability of updating a model with a transition;
+            block_size (int, 4096): the number of masks drawn at once.
+
+        """
+        self._n_approximators = n_approximators
+        self._p = p
+        self._block_size = block_size
+
+        self._block = np.zeros((0, n_approximators), dtype=np.uint8)
+        self._idx = 0
+
+    def sample(self, n):
+        """
+        Args:
+            n (int): the number of masks.
+
+        Returns:
+            The (n, n_approximators) uint8 array of the next masks.
+
+        """
+        if self._idx + n > len(self._block):
+            new = np.random.binomial(
+                1, self._p, size=(max(n, self._block_size),
+                                  self._n_approximators)).astype(np.uint8)
+            self._block = np.concatenate((self._block[self._idx:], new))
+            self._idx = 0
+
+        masks = self._block[self._idx:self._idx + n]
+        self._idx += n
+
+        return masks
+
+    def next(self):
+        """
+        Returns:
+            The next mask.
+
+        """
+        return self.sample(1)[0]
+
+
+def pack_masks(masks):
+    """
+    Args:
+        masks (np.ndarray): the (n, n_approximators) binary masks.
+
+    Returns:
+        The (n, ceil(n_approximators / 8)) uint8 array of the masks packed
+        as bits.
+
+    """
+    return np.packbits(np.asarray(masks) != 0, axis=1)
+
+
+def unpack_masks(packed, n_approximators):
+    """
+    Args:
+        packed (np.ndarray): the masks packed by ``pack_masks``;
+        n_approximators (int): the number of models of the ensemble.
+
+    Returns:
+        The (n, n_approximators) uint8 array of the binary masks.
+
+    """
+    return np.unpackbits(packed, axis=1)[:, :n_approximators]
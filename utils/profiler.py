@@ -0,0 +1,187 @@
+import json
+import time
+
+import numpy as np
+
+
+# Methods timed by ``instrument``, as (attribute, phase) pairs
+_MDP_METHODS = [('step', 'env_step')]
+_AGENT_METHODS = [('draw_action', 'draw_action'), ('fit', 'fit'),
+                  ('_update', 'update'), ('_compute_prob_max', 'prob_max'),
+                  ('_next_q', 'target'), ('_update_target', 'target_update')]
+_REPLAY_METHODS = [('add', 'replay_add'), ('get', 'replay_get')]
+_NET_METHODS = [('predict', 'session_predict'), ('fit', 'session_fit')]
+
+
+class _Phase(object):
+    def __init__(self):
+        self.n_calls = 0
+        self.samples = list()
+
+
+class Profiler(object):
+    """
+    Opt-in profiler of the phases of a run. The methods of the objects of the
+    run (e.g. the step of the environment or the fit of the agent) are
+    replaced on the instances by wrappers counting all the calls and timing
+    only one call every ``sample_interval``, so that the overhead on the hot
+    path is an increment of a counter. At the end of each epoch, the mean,
+    median and 99th percentile of the sampled latencies of each phase are
+    collected, together with the number of calls and the estimated total
+    time. Nested phases (e.g. ``prob_max`` inside ``fit``) are timed
+    inclusively.
+
+    """
+    def __init__(self, sample_interval=100):
+        """
+        Constructor.
+
+        Args:
+            sample_interval (int, 100): number of calls between two timed
+                calls of a method.
+
+        """
+        self._sample_interval = sample_interval
+        self._phases = dict()
+        self._epochs = list()
+        self._epoch_start = time.perf_counter()
+
+    def _get_phase(self, name):
+        if name not in self._phases:
+            self._phases[name] = _Phase()
+
+        return self._phases[name]
+
+    def wrap(self, fun, name, sample_interval=None):
+        """
+        Args:
+            fun (function): the function to time;
+            name (str): the phase of the function;
+            sample_interval (int, None): number of calls between two timed
+                calls, by default the one of the profiler. Coarse phases,
+                such as the evaluation, can be timed at each call.
+
+        Returns:
+            The function timing one call of ``fun`` every
+            ``sample_interval``.
+
+        """
+        phase = self._get_phase(name)
+        interval = self._sample_interval if sample_interval is None \
+            else sample_interval
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            phase.n_calls += 1
+            if phase.n_calls % interval != 0:
+                return fun(*args, **kwargs)
+
+            start = perf_counter()
+            out = fun(*args, **kwargs)
+            phase.samples.append(perf_counter() - start)
+
+            return out
+
+        return wrapper
+
+    def wrap_method(self, obj, method, name, sample_interval=None):
+        """
+        Replace a method of an object with its timed version. Nothing is done
+        if the object does not have the method.
+
+        """
+        fun = getattr(obj, method, None)
+        if fun is not None and callable(fun):
+            setattr(obj, method, self.wrap(fun, name, sample_interval))
+
+    def end_epoch(self, epoch, **info):
+        """
+        Collect the statistics of the phases since the previous epoch and
+        reset them.
+
+        Args:
+            epoch (int): the epoch;
+            **info: other values to save with the statistics of the epoch
+                (e.g. the size of the replay memory).
+
+        Returns:
+            The dictionary of the statistics of the epoch.
+
+        """
+        now = time.perf_counter()
+        phases = dict()
+        for name, phase in self._phases.items():
+            if phase.n_calls == 0:
+                continue
+            samples = np.array(phase.samples)
+            mean = np.mean(samples) if len(samples) > 0 else np.nan
+            phases[name] = dict(
+                n_calls=phase.n_calls,
+                n_samples=len(samples),
+                mean=mean,
+                p50=np.percentile(samples, 50) if len(samples) > 0 else np.nan,
+                p99=np.percentile(samples, 99) if len(samples) > 0 else np.nan,
+                total=mean * phase.n_calls
+            )
+            phase.n_calls = 0
+            phase.samples = list()
+
+        stats = dict(epoch=epoch, time=now - self._epoch_start, phases=phases,
+                     **info)
+        self._epochs.append(stats)
+        self._epoch_start = now
+
+        return stats
+
+    def save(self, path):
+        """
+        Save the statistics of all the epochs collected so far as JSON.
+
+        """
+        with open(path, 'w') as f:
+            json.dump(self._epochs, f, indent=1, default=float)
+
+
+def _models(approximator):
+    model = getattr(approximator, 'model', None)
+
+    return model if isinstance(model, list) else [model]
+
+
+def instrument(profiler, core, agent=None, mdp=None):
+    """
+    Time the hot path of a run: the learning phase, the step of the
+    environment, the action selection, the fit of the agent and its update,
+    target and probability-of-max computations, the replay memory, the
+    session calls of the networks and the callbacks of the core.
+
+    Args:
+        profiler (Profiler): the profiler;
+        core (Core): the core of the run. Its callbacks are replaced by
+            their timed version, without changing the original list;
+        agent (Agent, None): the agent, by default the one of the core;
+        mdp (Environment, None): the environment, by default the one of the
+            core.
+
+    """
+    agent = core.agent if agent is None else agent
+    mdp = core.mdp if mdp is None else mdp
+
+    profiler.wrap_method(core, 'learn', 'learn', 1)
+    for method, name in _MDP_METHODS:
+        profiler.wrap_method(mdp, method, name)
+    for method, name in _AGENT_METHODS:
+        profiler.wrap_method(agent, method, name)
+    replay_memory = getattr(agent, '_replay_memory', None)
+    if replay_memory is not None:
+        for method, name in _REPLAY_METHODS:
+            profiler.wrap_method(replay_memory, method, name)
+    for approximator in [getattr(agent, 'approximator', None),
+                         getattr(agent, 'target_approximator', None)]:
+        for net in _models(approximator):
+            # Only the networks run a session, not the tables
+            if hasattr(net, '_session'):
+                for method, name in _NET_METHODS:
+                    profiler.wrap_method(net, method, name)
+
+    core.callbacks = [profiler.wrap(c, 'callbacks') for c in core.callbacks]
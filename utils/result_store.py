@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+
+SCORE_COLUMNS = ('n_steps', 'min', 'max', 'mean', 'std', 'disc_min',
+                 'disc_max', 'disc_mean', 'disc_std', 'mean_length',
+                 'n_episodes')
+
+
+def task_key(config, seed):
+    """
+    Args:
+        config (dict): the configuration of an experiment. Values that are
+            not JSON serializable are hashed by their string representation;
+        seed (int): the seed of the experiment.
+
+    Returns:
+        The hash identifying the run of a configuration with a seed.
+
+    """
+    s = json.dumps(dict(config=config, seed=int(seed)), sort_keys=True,
+                   default=str)
+
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
+class ResultStore:
+    """
+    SQLite store of the scores of the experiments. Each run is identified by
+    the hash of its configuration and seed, and the scores of each epoch are
+    appended as soon as they are computed, one row for the learning phase
+    and one for the evaluation phase, with the values returned by
+    ``ScoreAccumulator.get_scores`` as named columns. The runs of a sweep can write to the
+    same store from different processes.
+
+    """
+    def __init__(self, path):
+        """
+        Constructor.
+
+        Args:
+            path (str): the path of the database.
+
+        """
+        self._path = path
+        self._connection = None
+        self._pid = None
+
+        folder = os.path.dirname(path)
+        if folder != '' and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        columns = ', '.join('%s REAL' % c for c in SCORE_COLUMNS)
+        with self._connect() as c:
+            c.execute('CREATE TABLE IF NOT EXISTS tasks (key TEXT PRIMARY '
+                      'KEY, config TEXT, seed INTEGER, completed INTEGER, '
+                      'started REAL, ended REAL, error TEXT)')
+            # Stores created before the errors were recorded
+            task_columns = [r[1] for r in
+                            c.execute('PRAGMA table_info(tasks)')]
+            if 'error' not in task_columns:
+                c.execute('ALTER TABLE tasks ADD COLUMN error TEXT')
+            c.execute('CREATE TABLE IF NOT EXISTS scores (key TEXT, phase '
+                      'TEXT, epoch INTEGER, %s, PRIMARY KEY (key, phase, '
+                      'epoch))' % columns)
+
+    def _connect(self):
+        # Connections cannot be shared with the forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self._path, timeout=60.)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def start(self, config, seed):
+        """
+        Register the start of a run. The scores of a previous incomplete run
+        of the same configuration and seed are kept, and overwritten epoch by
+        epoch.
+
+        Args:
+            config (dict): the configuration of the experiment;
+            seed (int): the seed of the experiment.
+
+        Returns:
+            The key of the run.
+
+        """
+        key = task_key(config, seed)
+        with self._connect() as c:
+            c.execute('INSERT OR REPLACE INTO tasks (key, config, seed, '
+                      'completed, started) VALUES (?, ?, ?, 0, ?)',
+                      (key, json.dumps(config, sort_keys=True, default=str),
+                       int(seed), time.time()))
+
+        return key
+
+    def append(self, key, phase, epoch, scores):
+        """
+        Add the scores of an epoch of a run.
+
+        Args:
+            key (str): the key of the run;
+            phase (str): the phase of the scores, e.g. 'train' or 'test';
+            epoch (int): the epoch;
+            scores (tuple): the scores returned by
+                ``ScoreAccumulator.get_scores``.
+
+        """
+        values = [float(x) for x in scores[:len(SCORE_COLUMNS)]]
+        with self._connect() as c:
+            c.execute('INSERT OR REPLACE INTO scores VALUES (?, ?, ?, %s)' %
+                      ', '.join('?' * len(SCORE_COLUMNS)),
+                      [key, phase, int(epoch)] + values)
+
+    def complete(self, key):
+        with self._connect() as c:
+            c.execute('UPDATE tasks SET completed = 1, ended = ? WHERE key = '
+                      '?', (time.time(), key))
+
+    def fail(self, config, seed, error):
+        """
+        Record the failure of a run, which is left incomplete, so that it is
+        executed again by the next sweep. The scores of its completed epochs
+        are kept.
+
+        Args:
+            config (dict): the configuration of the experiment;
+            seed (int): the seed of the experiment;
+            error (str): the description of the error, e.g. its traceback.
+
+        """
+        key = task_key(config, seed)
+        with self._connect() as c:
+            c.execute('INSERT OR IGNORE INTO tasks (key, config, seed, '
+                      'completed) VALUES (?, ?, ?, 0)',
+                      (key, json.dumps(config, sort_keys=True, default=str),
+                       int(seed)))
+            c.execute('UPDATE tasks SET completed = 0, ended = ?, error = ? '
+                      'WHERE key = ?', (time.time(), error, key))
+
+    def error(self, config, seed):
+        """
+        Returns:
+            The error of the last failure of a run, or None.
+
+        """
+        row = self._connect().execute(
+            'SELECT error FROM tasks WHERE key = ?',
+            (task_key(config, seed),)).fetchone()
+
+        return None if row is None else row[0]
+
+    def is_completed(self, config, seed):
+        row = self._connect().execute(
+            'SELECT completed FROM tasks WHERE key = ?',
+            (task_key(config, seed),)).fetchone()
+
+        return row is not None and row[0] == 1
+
+    def scores(self, key, phase):
+        """
+        Args:
+            key (str): the key of the run;
+            phase (str): the phase of the scores.
+
+        Returns:
+            The list of the score tuples of each epoch, in the layout of
+            ``ScoreAccumulator.get_scores``.
+
+        """
+        rows = self._connect().execute(
+            'SELECT %s FROM scores WHERE key = ? AND phase = ? ORDER BY '
+            'epoch' % ', '.join(SCORE_COLUMNS), (key, phase)).fetchall()
+
+        return [tuple(r) for r in rows]
+
+    def configs(self, completed=True):
+        """
+        Args:
+            completed (bool, True): whether to consider only the completed
+                runs.
+
+        Returns:
+            The list of the distinct configurations in the store.
+
+        """
+        query = 'SELECT DISTINCT config FROM tasks'
+        if completed:
+            query += ' WHERE completed = 1'
+
+        return [json.loads(r[0]) for r in
+                self._connect().execute(query).fetchall()]
+
+    def query(self, column='mean', phase='test', completed=True, **config):
+        """
+        Aggregate a score of the runs matching a (partial) configuration.
+
+        Args:
+            column (str, 'mean'): the score to return, one of
+                ``SCORE_COLUMNS``;
+            phase (str, 'test'): the phase of the scores;
+            completed (bool, True): whether to consider only the completed
+                runs;
+            **config: the values of the configuration to match, e.g.
+                ``algorithm='particle-ql', name='Chain'``.
+
+        Returns:
+            The seeds of the matching runs and the (n_runs, n_epochs) array
+            of the scores. Runs with fewer epochs are padded with nan.
+
+        """
+        assert column in SCORE_COLUMNS
+
+        query = 'SELECT key, config, seed FROM tasks'
+        if completed:
+            query += ' WHERE completed = 1'
+        query += ' ORDER BY seed'
+        runs = [(k, s) for k, c, s in self._connect().execute(query)
+                if all(json.loads(c).get(n) == v for n, v in config.items())]
+
+        values = list()
+        for key, _ in runs:
+            values.append([r[0] for r in self._connect().execute(
+                'SELECT %s FROM scores WHERE key = ? AND phase = ? ORDER BY '
+                'epoch' % column, (key, phase))])
+
+        n_epochs = max([len(v) for v in values] + [0])
+        out = np.full((len(values), n_epochs), np.nan)
+        for i, v in enumerate(values):
+            out[i, :len(v)] = v
+
+        return np.array([s for _, s in runs]), out
+
+
+def load_scores(path, config, seed):
+    """
+    Load the scores of a completed run in the format returned by the
+    experiments, i.e. the lists of the learning and evaluation scores.
+
+    """
+    store = ResultStore(path)
+    key = task_key(config, seed)
+
+    return store.scores(key, 'train'), store.scores(key, 'test')
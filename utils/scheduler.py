@@ -0,0 +1,170 @@
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+class SweepScheduler:
+    """
+    Scheduler of the runs of a sweep. The whole grid of configurations is
+    expanded in (configuration, seed) tasks, which are executed by a single
+    pool of processes kept alive for the whole sweep. The tasks are
+    submitted from the longest to the shortest expected one, and each free
+    worker takes the next waiting task, so that the slow runs start first and
+    the short ones fill the cores that would stay idle at the end of the
+    sweep. A task raising an exception does not stop the sweep: the error
+    is reported and the task has no result.
+
+    """
+    def __init__(self, n_workers=None):
+        """
+        Constructor.
+
+        Args:
+            n_workers (int, None): maximum number of worker processes. By
+                default, one for each available core. No more workers than
+                tasks are started and, with one worker, the tasks are
+                executed in the current process.
+
+        """
+        if n_workers is None:
+            n_workers = len(os.sched_getaffinity(0))
+        self._n_workers = n_workers
+        self._tasks = list()
+        self._groups = dict()
+
+    def add(self, group, fun, args, kwargs=None, cost=1.):
+        """
+        Add a task to the sweep.
+
+        Args:
+            group (object): hashable key of the configuration of the task;
+            fun (function): the function to execute;
+            args (list): the positional arguments of the function;
+            kwargs (dict, None): the keyword arguments of the function;
+            cost (float, 1.): expected cost of the task, used to order the
+                tasks. Only the ratios between the costs matter.
+
+        Returns:
+            The index of the task in its group.
+
+        """
+        if group not in self._groups:
+            self._groups[group] = 0
+        index = self._groups[group]
+        self._groups[group] += 1
+
+        kwargs = dict() if kwargs is None else kwargs
+        self._tasks.append((cost, len(self._tasks), group, index, fun, args,
+                            kwargs))
+
+        return index
+
+    def run(self, on_task=None, on_group=None, on_error=None):
+        """
+        Execute all the tasks of the sweep.
+
+        Args:
+            on_task (function, None): function called with the group, the
+                index of the task in the group and its result as soon as a
+                task ends;
+            on_group (function, None): function called with the group and
+                the list of the results of its tasks, in the order in which
+                they were added, as soon as all the tasks of a group end.
+                The result of a failed task is None;
+            on_error (function, None): function called with the group, the
+                index of the task in the group and the formatted traceback
+                when a task raises an exception. By default, the traceback
+                is printed.
+
+        Returns:
+            The dictionary of the results of each group, if ``on_group`` is
+            not given.
+
+        """
+        tasks = sorted(self._tasks, key=lambda t: (-t[0], t[1]))
+        pending = dict((g, n) for g, n in self._groups.items())
+        results = dict((g, [None] * n) for g, n in self._groups.items())
+        out = dict()
+
+        def done(group, index, result):
+            if on_task is not None:
+                on_task(group, index, result)
+            end(group, index, result)
+
+        def fail(group, index, error):
+            error = ''.join(traceback.format_exception(type(error), error,
+                                                       error.__traceback__))
+            if on_error is not None:
+                on_error(group, index, error)
+            else:
+                print('Task %d of %s failed:\n%s' % (index, group, error))
+            end(group, index, None)
+
+        def end(group, index, result):
+            results[group][index] = result
+            pending[group] -= 1
+            if pending[group] == 0:
+                if on_group is not None:
+                    on_group(group, results.pop(group))
+                else:
+                    out[group] = results.pop(group)
+
+        n_workers = min(self._n_workers, len(tasks))
+        if n_workers <= 1:
+            for _, _, group, index, fun, args, kwargs in tasks:
+                try:
+                    result = fun(*args, **kwargs)
+                except Exception as e:
+                    fail(group, index, e)
+                else:
+                    done(group, index, result)
+        else:
+            with ProcessPoolExecutor(n_workers,
+                                     mp_context=mp.get_context('fork')) as ex:
+                futures = dict()
+                for _, _, group, index, fun, args, kwargs in tasks:
+                    f = ex.submit(fun, *args, **kwargs)
+                    futures[f] = (group, index)
+                for f in as_completed(futures):
+                    group, index = futures.pop(f)
+                    try:
+                        result = f.result()
+                    except Exception as e:
+                        fail(group, index, e)
+                    else:
+                        done(group, index, result)
+
+        self._tasks = list()
+        self._groups = dict()
+
+        return out
+
+
+def save_task_result(group, index, result):
+    """
+    Save the result of a task as soon as it ends, in the ``tasks`` subfolder
+    of the output folder of its group. The group has to be a
+    (out_dir, head, tail) tuple, as for ``save_group_results``.
+
+    """
+    out_dir, head, tail = group
+    folder = os.path.join(out_dir, 'tasks')
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    np.save(os.path.join(folder, '%stask=%d%s' % (head, index, tail)), result)
+
+
+def save_group_results(group, results):
+    """
+    Save the results of all the tasks of a group in the output folder of the
+    group, named as ``head`` followed by the current time and ``tail``.
+
+    """
+    out_dir, head, tail = group
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    np.save(out_dir + '/' + head + str(time.time()) + tail, results)
@@ -0,0 +1,21 @@
+import random
+import sys
+
+import numpy as np
+
+
+def set_global_seeds(i):
+    """
+    Seed the numpy and python random number generators and TensorFlow. To
+    keep the start of the tabular runs fast, TensorFlow is seeded only if it
+    is already imported.
+
+    Args:
+        i (int): the seed.
+
+    """
+    tf = sys.modules.get('tensorflow')
+    if tf is not None:
+        tf.set_random_seed(i)
+    np.random.seed(i)
+    random.seed(i)
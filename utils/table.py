@@ -0,0 +1,311 @@
+import sys
+
+import numpy as np
+from mushroom.utils.table import EnsembleTable
+
+
+class StackedEnsembleTable(EnsembleTable):
+    """
+    Ensemble of tables whose values are stored in a single
+    (n_models, n_states, n_actions) array. The table of each model is a view
+    of the stacked array, so the ensemble can be used as a standard
+    EnsembleTable, while the action values of all the models in a state can
+    be read with a single indexing operation.
+
+    """
+    def __init__(self, n_models, shape, dtype=np.float64, table=None):
+        """
+        Constructor.
+
+        Args:
+            n_models (int): number of models in the ensemble;
+            shape (np.ndarray): shape of the table of each model;
+            dtype (type, np.float64): type of the action values;
+            table (np.ndarray, None): the (n_models, n_states, n_actions)
+                array storing the action values, e.g. a view of a larger
+                array. By default, a new array of zeros.
+
+        """
+        super(StackedEnsembleTable, self).__init__(n_models, shape)
+
+        if table is None:
+            table = np.zeros((n_models,) + tuple(shape), dtype=dtype)
+        self.table = table
+        for i, m in enumerate(self.model):
+            m.table = self.table[i]
+
+    def predict_all(self, state):
+        """
+        Predict the action values of all the models in a state.
+
+        Args:
+            state (np.ndarray): the state.
+
+        Returns:
+            The (n_models, n_actions) array of action values.
+
+        """
+        return self.table[:, int(np.ravel(state)[0])]
+
+
+class DoubleEnsembleTable(object):
+    """
+    The two estimates of the double estimator of an ensemble, stored in a
+    single (2, n_models, n_states, n_actions) array, together with their
+    average. Each estimate is a StackedEnsembleTable view of the array. The
+    average is the table read by the policy and it is kept up to date at
+    each update, in the entries that changed, so that the policy reads it
+    without copies. Since the average is materialized, three tables are
+    stored, as with two separate estimates and the table of their average.
+
+    """
+    def __init__(self, mean):
+        """
+        Constructor.
+
+        Args:
+            mean (StackedEnsembleTable): the table of the average of the
+                estimates.
+
+        """
+        n_models = len(mean.model)
+        shape = mean.table.shape[1:]
+
+        self.mean = mean
+        self.table = np.zeros((2,) + mean.table.shape, dtype=mean.table.dtype)
+        self.estimates = [StackedEnsembleTable(n_models, shape,
+                                               table=self.table[i])
+                          for i in range(2)]
+
+    def __getitem__(self, idx):
+        return self.estimates[idx]
+
+    def __len__(self):
+        return len(self.estimates)
+
+    def update(self, estimate, state, action, values, models=slice(None)):
+        """
+        Set the action values of a state-action pair in some models of an
+        estimate, and their average.
+
+        Args:
+            estimate (int): the index of the estimate;
+            state (np.ndarray): the state;
+            action (np.ndarray): the action;
+            values (np.ndarray): the new action values of the models;
+            models (np.ndarray, slice(None)): the indexes of the models.
+
+        """
+        s = int(np.ravel(state)[0])
+        a = int(np.ravel(action)[0])
+        self.table[estimate, models, s, a] = values
+        self.mean.table[models, s, a] = np.mean(self.table[:, models, s, a],
+                                                 axis=0)
+
+    def update_mean(self):
+        """
+        Set the average to the one of the whole estimates, e.g. after their
+        initialization.
+
+        """
+        self.mean.table[:] = np.mean(self.table, axis=0)
+
+
+def _row_index(args):
+    # Same indexing of the mushroom tables: the state, optionally followed by
+    # the action, either as one-element arrays or as integers
+    if not isinstance(args, tuple):
+        args = tuple(np.ravel(args))
+    idx = tuple(a[0] if isinstance(a, np.ndarray) else a for a in args)
+
+    return int(idx[0]), idx[1:]
+
+
+class _SparseTable(object):
+    """
+    Table of a model of a ``SparseEnsembleTable``, with the interface of the
+    mushroom ``Table``.
+
+    """
+    def __init__(self, ensemble, idx):
+        self._ensemble = ensemble
+        self._idx = idx
+
+    def __getitem__(self, args):
+        state, idx = _row_index(args)
+
+        return self._ensemble.row(state)[self._idx][idx]
+
+    def __setitem__(self, args, value):
+        state, idx = _row_index(args)
+        self._ensemble.row(state)[self._idx][idx] = value
+
+    def fit(self, x, y):
+        self[x] = y
+
+    def predict(self, *z):
+        if z[0].ndim == 1:
+            z = [np.expand_dims(z_i, axis=0) for z_i in z]
+        state = z[0]
+        if len(z) == 2:
+            values = [self[state[i], z[1][i]] for i in range(len(state))]
+        else:
+            values = [self[state[i], :] for i in range(len(state))]
+
+        return values[0] if len(values) == 1 else np.array(values)
+
+    def to_dense(self):
+        """
+        Returns:
+            The dense (n_states, n_actions) copy of the table, as built by
+            ``SparseEnsembleTable.to_dense``.
+
+        """
+        return self._ensemble.to_dense(self._idx)
+
+    @property
+    def n_actions(self):
+        return self.shape[-1]
+
+    @property
+    def shape(self):
+        return self._ensemble.shape
+
+
+class SparseEnsembleTable(EnsembleTable):
+    """
+    Ensemble of tables storing only the rows of the states that have been
+    accessed, for large or unknown state spaces. The action values of all the
+    models in a state are initialized from the prior the first time the
+    state is read or written, and stored in a single growing
+    (n_rows, n_models, n_actions) array. The ensemble and its models have
+    the interface of EnsembleTable and Table, so agents and policies can use
+    it unchanged.
+
+    """
+    def __init__(self, n_models, shape, init_values=None, init_fun=None,
+                 dtype=np.float64):
+        """
+        Constructor.
+
+        Args:
+            n_models (int): number of models in the ensemble;
+            shape (np.ndarray): shape of the table of each model;
+            init_values (np.ndarray, None): the initial value of each model,
+                e.g. the linspace of the particles or the (mean, sigma) of
+                the Gaussian prior. By default, zero;
+            init_fun (function, None): function returning the
+                (n_models, n_actions) initial values of a new row, used
+                instead of ``init_values`` for random priors, e.g. the
+                bootstrapped draws;
+            dtype (type, np.float64): type of the action values.
+
+        """
+        super(SparseEnsembleTable, self).__init__(0, shape)
+
+        self._shape = tuple(shape)
+        self._n_models = n_models
+        if init_values is None:
+            init_values = np.zeros(n_models)
+        self._init_values = np.array(init_values, dtype=float)
+        self._init_fun = init_fun
+
+        self._index = dict()
+        self._rows = np.empty((16, n_models, self._shape[-1]), dtype=dtype)
+        self.model.extend(_SparseTable(self, i) for i in range(n_models))
+
+    def row(self, state):
+        """
+        Args:
+            state (int): the state.
+
+        Returns:
+            The (n_models, n_actions) view of the action values of all the
+            models in the state, initialized from the prior at the first
+            access.
+
+        """
+        i = self._index.get(state)
+        if i is None:
+            i = len(self._index)
+            if i == len(self._rows):
+                rows = np.empty((2 * len(self._rows),) + self._rows.shape[1:],
+                                dtype=self._rows.dtype)
+                rows[:i] = self._rows
+                self._rows = rows
+            if self._init_fun is not None:
+                self._rows[i] = self._init_fun(self._n_models, self._shape[-1])
+            else:
+                self._rows[i] = self._init_values[:, None]
+            self._index[state] = i
+
+        return self._rows[i]
+
+    def predict_all(self, state):
+        """
+        Predict the action values of all the models in a state.
+
+        Args:
+            state (np.ndarray): the state.
+
+        Returns:
+            The (n_models, n_actions) array of action values.
+
+        """
+        return self.row(int(np.ravel(state)[0]))
+
+    def to_dense(self, model=None):
+        """
+        Build a dense copy of the tables, e.g. to save them. It takes the
+        memory of the dense tables, and writing to it does not change the
+        ensemble. The states never accessed have the initial values, or nan
+        with a random prior.
+
+        Args:
+            model (int, None): the index of the model whose table is built. By
+                default, the tables of all the models.
+
+        Returns:
+            The (n_states, n_actions) table of the model, or the
+            (n_models, n_states, n_actions) tables.
+
+        """
+        models = slice(None) if model is None else model
+        init_values = np.full(self._n_models, np.nan) \
+            if self._init_fun is not None else self._init_values
+        init_values = init_values[models]
+        table = np.empty(np.shape(init_values) + self._shape,
+                         dtype=self._rows.dtype)
+        table[:] = np.reshape(init_values, np.shape(init_values) +
+                              (1,) * len(self._shape))
+        if len(self._index) > 0:
+            states = np.fromiter(self._index.keys(), dtype=int)
+            rows = np.fromiter(self._index.values(), dtype=int)
+            table[..., states, :] = np.moveaxis(self._rows[rows][:, models],
+                                                0, -2)
+
+        return table
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def n_rows(self):
+        """
+        Returns:
+            The number of states accessed so far.
+
+        """
+        return len(self._index)
+
+    @property
+    def nbytes(self):
+        """
+        Returns:
+            The approximate memory footprint of the table in bytes: the
+            allocated rows and the index of the states.
+
+        """
+        return self._rows.nbytes + sys.getsizeof(self._index) + \
+            len(self._index) * 2 * sys.getsizeof(0)
@@ -1,5 +1,44 @@
 import numpy as np
 import gym
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+
+from envs.sparse_mdp import SparseTransitions
+
+
+def evaluate_policy(P, R, policy, gamma):
+    """
+    Compute the value function of a stochastic policy solving the Bellman
+    equation.
+
+    Args:
+        P: the (S, A, S) transition matrix, or the ``SparseTransitions``;
+        R (np.ndarray): the (S, A, S) reward matrix, or the (S, A, k) rewards
+            of the ``SparseTransitions``;
+        policy (np.ndarray): the (S, A) probabilities of the actions;
+        gamma (float): the discount factor.
+
+    Returns:
+        The value function of the policy.
+
+    """
+    policy = np.asarray(policy, dtype=np.float64)
+    S = policy.shape[0]
+    if isinstance(P, SparseTransitions):
+        s, a, _ = np.indices(P.next_states.shape)
+        P_pi = sparse.csr_matrix(
+            ((policy[s, a] * P.probs).ravel(), (s.ravel(),
+                                                P.next_states.ravel())),
+            shape=(S, S))
+        R_pi = np.sum(policy * np.sum(P.probs * R, axis=-1), axis=1)
+
+        return spsolve(sparse.identity(S, format='csc') - gamma * P_pi.tocsc(),
+                       R_pi)
+
+    P_pi = np.einsum('sa,sat->st', policy, P)
+    R_pi = np.sum(policy * np.sum(P * R, axis=-1), axis=1)
+
+    return np.linalg.solve(np.eye(S) - gamma * P_pi, R_pi)
 
 class ValueIteration(object):
 
@@ -12,6 +51,9 @@ class ValueIteration(object):
         self.horizon = horizon
 
     def fit(self, tol=1e-6, max_iter=10000):
+        if isinstance(self.env.p, SparseTransitions):
+            return self._fit_sparse(tol, max_iter)
+
         nS, nA = self.nS, self.nA
         P = self.env.p
         R = self.env.r
@@ -50,6 +92,29 @@ class ValueIteration(object):
         self.V = V
         self.policy = policy
 
+    def _fit_sparse(self, tol, max_iter):
+        # The sweeps update all the states at once from the values of the
+        # previous sweep
+        P = self.env.p
+        gamma = self.discount_factor
+        V = np.zeros(self.nS)
+        Q = np.zeros((self.nS, self.nA))
+
+        ite = 0
+        delta = np.inf
+        while ite < max_iter and (self.horizon is None or ite < self.horizon) and delta > tol:
+            Q = np.sum(P.probs * (P.rewards + gamma * V[P.next_states]),
+                       axis=-1)
+            v = np.max(Q, axis=1)
+            delta = np.max(np.abs(V - v))
+            V = v
+
+            ite += 1
+
+        self.Q = Q
+        self.V = V
+        self.policy = dict(enumerate(np.argmax(Q, axis=1)))
+
     def get_v_function(self):
         return self.V
 